@@ -0,0 +1,327 @@
+"""End-to-end throughput of the bot's handlers against a fake Discord layer.
+
+Drives ``main.on_message`` with Tupperbox-proxied roll messages, then the
+❌ reaction handler and ``tul!edit`` on the proxied results, at a fixed
+concurrency. Every Discord call the handlers make goes to in-memory fakes
+that sleep for a configurable simulated API latency; the history goes to a
+temporary SQLite database. Reports throughput, latency percentiles, rows
+written and the per-stage ``metrics`` histograms.
+
+Needs the bot's own dependencies (discord.py, d20, python-dotenv). Run from
+the repository root::
+
+    python benchmarks/bench_e2e.py --messages 2000 --concurrency 50 \\
+        --latency 0.05
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import metrics  # noqa: E402
+
+TUPPERBOX_ID = main.TUPPERBOX_USER_ID
+TUPPER_ERROR = main.TUPPER_EDIT_ERROR
+
+ROLL_CONTENTS = [
+    "I swing at it [[1d20+5]]",
+    "Careful now [[2d20f2t12c1]]",
+    "Damage: [[2d6+3 slashing]] and [[1d20]]",
+    "Searching the room [[3d20t10]] while [[4cd]] go off",
+    "[[1d20+7 perception]]",
+]
+
+_ids = itertools.count(10**17)
+
+
+class FakeAPI:
+    """Simulated Discord round trip: ``latency`` seconds, ±50% jitter."""
+
+    def __init__(self, latency: float, rng: random.Random):
+        self.latency = latency
+        self.rng = rng
+        self.calls = 0
+
+    async def call(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * self.rng.uniform(0.5, 1.5))
+
+
+class FakeMessage:
+    def __init__(self, channel, content, author, webhook_id=None,
+                 reference=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = content
+        self.author = author
+        self.webhook_id = webhook_id
+        self.reference = reference
+        self.created_at = datetime.now(timezone.utc)
+        self.jump_url = (
+            f"https://discord.com/channels/{channel.guild.id}/"
+            f"{channel.id}/{self.id}"
+        )
+
+    async def delete(self):
+        await self.channel.api.call()
+        self.channel.messages.pop(self.id, None)
+
+
+class FakeTextChannel:
+    # No ``parent`` attribute: the handlers use hasattr() to spot threads.
+    def __init__(self, guild, api):
+        self.id = next(_ids)
+        self.guild = guild
+        self.api = api
+        self.name = f"channel-{self.id % 1000}"
+        self.mention = f"<#{self.id}>"
+        self.messages = {}
+        self.hooks = []
+
+    async def send(self, content=None, **kwargs):
+        await self.api.call()
+        message = FakeMessage(self, content, self.guild.bot_user)
+        self.messages[message.id] = message
+        return message
+
+    async def fetch_message(self, message_id):
+        await self.api.call()
+        return self.messages[message_id]
+
+    async def webhooks(self):
+        await self.api.call()
+        return list(self.hooks)
+
+    async def create_webhook(self, name):
+        await self.api.call()
+        webhook = FakeWebhook(name, self, self.api, self.guild.bot_user)
+        self.hooks.append(webhook)
+        return webhook
+
+
+class FakeThread(FakeTextChannel):
+    def __init__(self, guild, api, parent):
+        super().__init__(guild, api)
+        self.parent = parent
+
+
+class FakeWebhook:
+    registry = {}  # id -> FakeWebhook, for bot.fetch_webhook
+
+    def __init__(self, name, channel, api, user=None):
+        self.id = next(_ids)
+        self.name = name
+        self.token = "token"
+        self.channel = channel
+        self.api = api
+        self.user = user
+        FakeWebhook.registry[self.id] = self
+
+    def _target(self, thread):
+        return thread if thread is not None else self.channel
+
+    async def send(self, content, username=None, avatar_url=None,
+                   thread=None):
+        await self.api.call()
+        target = self._target(thread)
+        author = SimpleNamespace(
+            id=self.id, name=username, display_name=username, bot=True,
+            avatar=avatar_url,
+        )
+        message = FakeMessage(target, content, author, webhook_id=self.id)
+        target.messages[message.id] = message
+        return message
+
+    async def edit_message(self, message_id, content, thread=None):
+        await self.api.call()
+        self._target(thread).messages[message_id].content = content
+
+    async def delete_message(self, message_id, thread=None):
+        await self.api.call()
+        self._target(thread).messages.pop(message_id, None)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
+
+
+def report(label, latencies, elapsed):
+    latencies = sorted(latencies)
+    rate = len(latencies) / elapsed if elapsed else 0.0
+    print(
+        f"{label:<10} {len(latencies):>7} ops {rate:>9.1f}/s  "
+        f"p50 {percentile(latencies, 0.5) * 1e3:8.1f}  "
+        f"p95 {percentile(latencies, 0.95) * 1e3:8.1f}  "
+        f"p99 {percentile(latencies, 0.99) * 1e3:8.1f} ms"
+    )
+
+
+async def drive(coroutines, concurrency):
+    """Run ``coroutines`` at most ``concurrency`` at a time; returns
+    (per-op latencies, wall time)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(coroutine):
+        async with semaphore:
+            start = time.perf_counter()
+            await coroutine
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(c) for c in coroutines))
+    return latencies, time.perf_counter() - started
+
+
+def install_fakes(api, channels, bot_user):
+    bot = main.bot
+    bot._application = SimpleNamespace(name="InlineRoller")
+    bot._connection.user = bot_user
+    by_id = {channel.id: channel for channel in channels}
+    bot.get_channel = by_id.get
+
+    async def fetch_channel(channel_id):
+        await api.call()
+        return by_id[channel_id]
+
+    async def fetch_webhook(webhook_id):
+        await api.call()
+        return FakeWebhook.registry[webhook_id]
+
+    bot.fetch_channel = fetch_channel
+    bot.fetch_webhook = fetch_webhook
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    api = FakeAPI(args.latency, rng)
+    bot_user = SimpleNamespace(id=next(_ids), name="InlineRoller", bot=True)
+    guild = SimpleNamespace(id=next(_ids), bot_user=bot_user)
+
+    dump = FakeTextChannel(guild, api)
+    channels = [FakeTextChannel(guild, api) for _ in range(args.channels)]
+    threads = [
+        FakeThread(guild, api, rng.choice(channels))
+        for _ in range(args.threads)
+    ]
+    rooms = channels + threads
+    install_fakes(api, [dump] + rooms, bot_user)
+    await main.bot._async_setup_hook()  # gives the bot its event loop
+
+    tupperbox = FakeWebhook("Tupperhook", channels[0], api)
+    await main.save_server_config(guild.id, {
+        **main.DEFAULT_CONFIG, "dump_channel_id": dump.id,
+    })
+    main.history_sink.start()
+
+    characters = [
+        SimpleNamespace(id=next(_ids), name=f"char{n}",
+                        display_name=f"Character {n}", bot=True, avatar=None)
+        for n in range(20)
+    ]
+    rolls = [
+        FakeMessage(rng.choice(rooms), rng.choice(ROLL_CONTENTS),
+                    rng.choice(characters), webhook_id=tupperbox.id)
+        for _ in range(args.messages)
+    ]
+    print(f"{args.messages} messages, concurrency {args.concurrency}, "
+          f"simulated API latency {args.latency * 1e3:.0f} ms")
+    latencies, elapsed = await drive(
+        (main.on_message(message) for message in rolls), args.concurrency
+    )
+    report("rolls", latencies, elapsed)
+
+    def proxied():
+        return [
+            message for room in rooms for message in room.messages.values()
+            if message.webhook_id is not None
+            and message.webhook_id != tupperbox.id
+        ]
+
+    player = SimpleNamespace(id=next(_ids), name="player", bot=False)
+    if args.edits:
+        targets = rng.sample(proxied(), min(args.edits, len(proxied())))
+
+        async def edit(target):
+            command = FakeMessage(
+                target.channel, "tul!edit edited text", player,
+                reference=SimpleNamespace(
+                    message_id=target.id, resolved=target,
+                    cached_message=None,
+                ),
+            )
+
+            async def tupperbox_error():
+                await api.call()
+                main.bot.dispatch("message", FakeMessage(
+                    target.channel, TUPPER_ERROR,
+                    SimpleNamespace(id=TUPPERBOX_ID, bot=True),
+                ))
+
+            await asyncio.gather(
+                main.edit_by_tul_edit(command), tupperbox_error()
+            )
+
+        latencies, elapsed = await drive(
+            (edit(target) for target in targets), args.concurrency
+        )
+        report("edits", latencies, elapsed)
+
+    if args.reactions:
+        targets = rng.sample(proxied(), min(args.reactions, len(proxied())))
+        latencies, elapsed = await drive(
+            (main.on_reaction_add(SimpleNamespace(message=target, emoji="❌"),
+                                  player)
+             for target in targets),
+            args.concurrency,
+        )
+        report("reactions", latencies, elapsed)
+
+    await main.history_sink.close()
+    with main.database.lock:
+        rows = main.database.connect().execute(
+            "SELECT COUNT(*) FROM history_dice"
+        ).fetchone()[0]
+    print(f"history rows written: {rows}  simulated API calls: {api.calls}")
+    print(f"\n{'stage':<28} {'count':>8} {'p50':>8} {'p95':>8} {'p99':>8} ms")
+    for stage, count, p50, p95, p99 in metrics.summary():
+        print(f"{stage:<28} {count:>8} {p50 * 1e3:8.2f} {p95 * 1e3:8.2f} "
+              f"{p99 * 1e3:8.2f}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="simulated API latency in seconds")
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=5)
+    parser.add_argument("--reactions", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        main.database.configure(os.path.join(directory, "bench.db"))
+        asyncio.run(run(args))
+        main.database.close()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,64 @@
+"""Compare batch Modiphius scoring with the original per-die loop.
+
+Run from the repository root::
+
+    python benchmarks/bench_modiphius_batch.py
+
+Uses NumPy when it is installed, the pure-Python tables otherwise.
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modiphius  # noqa: E402
+
+
+def loop_evaluate_test(dice, focus, target, comp):
+    """The scoring loop ``evaluate_test`` used before the lookup tables."""
+    successes = 0
+    complications = 0
+    for die in dice:
+        if die <= target:
+            successes += 1
+        if die <= focus:
+            successes += 1
+        if die >= comp:
+            complications += 1
+    return successes, complications
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{label:<44} {seconds * 1e3:10.3f} ms")
+    return seconds
+
+
+def main():
+    engine = "NumPy" if modiphius.numpy is not None else "pure Python"
+    print(f"Batch engine: {engine}")
+    rng = random.Random(1)
+    for n, count in [(1_000, 2), (10_000, 5), (1, 100_000)]:
+        rows = [[rng.randint(1, 20) for _ in range(count)] for _ in range(n)]
+        array = rows
+        if modiphius.numpy is not None:
+            array = modiphius.numpy.array(rows)
+
+        def loop():
+            for row in rows:
+                loop_evaluate_test(row, 3, 12, 19)
+
+        def batch():
+            modiphius.evaluate_tests(array, 3, 12, 19)
+
+        print(f"-- {n} tests x {count} dice")
+        old = bench("per-test loop", loop, 3)
+        new = bench("evaluate_tests", batch, 3)
+        print(f"{'speed-up':<44} {old / new:10.1f} x")
+
+
+if __name__ == "__main__":
+    main()
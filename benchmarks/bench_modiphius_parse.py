@@ -0,0 +1,74 @@
+"""Compare ``modiphius.classify`` with the original two-parser check.
+
+Run from the repository root::
+
+    python benchmarks/bench_modiphius_parse.py
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modiphius  # noqa: E402
+
+TEST_PREFIX_PATTERN = re.compile(r"^(\d+)d20(.*)$")
+TEST_FIELD_PATTERN = re.compile(r"([ftc])(\d+)")
+CHALLENGE_PATTERN = re.compile(r"^(\d+)cd$")
+
+
+def old_parse_test(expr):
+    """``parse_test`` as it was before ``classify``."""
+    prefix = TEST_PREFIX_PATTERN.match(expr.strip())
+    if prefix is None:
+        return None
+    count = int(prefix.group(1))
+    rest = prefix.group(2)
+    fields = {}
+    pos = 0
+    for field in TEST_FIELD_PATTERN.finditer(rest):
+        if field.start() != pos:
+            return None
+        letter = field.group(1)
+        if letter in fields:
+            return None
+        fields[letter] = int(field.group(2))
+        pos = field.end()
+    if pos != len(rest) or "t" not in fields:
+        return None
+    return {
+        "count": count,
+        "focus": fields.get("f", 1),
+        "target": fields["t"],
+        "comp": 20 - fields.get("c", 0),
+    }
+
+
+def old_classify(expr):
+    """What ``roll`` did per expression: try a test, then a challenge."""
+    test = old_parse_test(expr)
+    if test is not None:
+        return test
+    match = CHALLENGE_PATTERN.match(expr.strip())
+    return {"count": int(match.group(1))} if match else None
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{label:<44} {seconds * 1e9:10.0f} ns")
+    return seconds
+
+
+def main():
+    for expr in ["1d20+5", "2d20+3 attack", "8d6", "2d20f3t12c1", "6cd"]:
+        print(f"-- {expr!r}")
+        old = bench("parse_test + parse_challenge",
+                    lambda: old_classify(expr), 200_000)
+        new = bench("classify", lambda: modiphius.classify(expr), 200_000)
+        print(f"{'speed-up':<44} {old / new:10.1f} x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Roll-engine microbenchmarks with a stored baseline and regression check.
+
+Times the Modiphius parsers, scorers and formatters, full
+``modiphius.roll``, inline-roll scanning and (when d20 is installed)
+representative ``d20`` rolls at small, typical and extreme sizes, then
+compares each against ``baseline.json`` next to this file. Exits with
+status 1 if any benchmark is slower than its baseline by more than its
+tolerance, or has no baseline to compare against.
+
+Times are stored relative to a fixed pure-Python calibration loop. Each
+benchmark is timed in ``ROUNDS`` rounds, each paired with a calibration
+timing, and the median ratio is kept, so clock-speed drift and one-off
+stalls cancel out, and a baseline recorded on one machine is still
+meaningful on another. Sub-microsecond cases wobble more than that, so
+they get the wider ``SMALL_TOLERANCE``. Baselines are kept per scoring
+engine (NumPy or pure Python), since ``modiphius`` switches to NumPy for
+big pools when it is installed; with no baseline at all for the engine in
+use the check is skipped.
+
+Run from the repository root::
+
+    python benchmarks/microbench.py                  # check
+    python benchmarks/microbench.py --update-baseline
+    python benchmarks/microbench.py -k evaluate --tolerance 0.5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import inline  # noqa: E402
+import modiphius  # noqa: E402
+
+try:
+    import d20
+except ImportError:  # d20 benchmarks are skipped
+    d20 = None
+
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+DEFAULT_TOLERANCE = 0.30
+# Cases whose baseline is below SMALL_CASE (relative units; about 2 µs here)
+# are allowed this much instead, unless --tolerance is higher.
+SMALL_CASE = 0.008
+SMALL_TOLERANCE = 0.60
+# Paired (calibration, benchmark) timings per case; the median ratio wins.
+ROUNDS = 7
+# Each timing runs for at least this long.
+MIN_TIME = 0.1
+
+_rng = random.Random(20)
+
+
+def _dice(count: int, sides: int) -> list:
+    return [_rng.randint(1, sides) for _ in range(count)]
+
+
+def _message(rolls: int) -> str:
+    return " and then ".join(
+        f"I try [[{_rng.choice(['1d20+5', '2d20f2t12c1', '4cd'])}]]"
+        for _ in range(rolls)
+    )
+
+
+def calibrate() -> int:
+    """Fixed interpreter workload every result is divided by."""
+    total = 0
+    for i in range(2000):
+        total += i * i % 7
+    return total
+
+
+def benchmarks() -> dict:
+    """name -> zero-argument callable."""
+    dice2, dice5, dice1000 = _dice(2, 20), _dice(5, 20), _dice(1000, 20)
+    cd4, cd1000 = _dice(4, 6), _dice(1000, 6)
+    short, typical, extreme = _message(1), _message(4), _message(200)
+    typical_rolls = inline.scan(typical)
+    typical_replacements = ["【 12 】"] * len(typical_rolls)
+
+    cases = {
+        "parse_test/typical": lambda: modiphius.parse_test("2d20f3t12c1"),
+        "parse_test/miss": lambda: modiphius.parse_test("1d20+5"),
+        "parse_challenge/typical": lambda: modiphius.parse_challenge("6cd"),
+        "parse_challenge/miss": lambda: modiphius.parse_challenge("1d20+5"),
+        "evaluate_test/small": lambda: modiphius.evaluate_test(
+            dice2, 3, 12, 19),
+        "evaluate_test/typical": lambda: modiphius.evaluate_test(
+            dice5, 3, 12, 19),
+        "evaluate_test/extreme": lambda: modiphius.evaluate_test(
+            dice1000, 3, 12, 19),
+        "evaluate_challenge/typical": lambda: modiphius.evaluate_challenge(
+            cd4),
+        "evaluate_challenge/extreme": lambda: modiphius.evaluate_challenge(
+            cd1000),
+        "format_test_full/typical": lambda: modiphius.format_test_full(
+            "5d20f3t12c1", dice5, 3, 12, 19, 4, 1),
+        "format_test_full/extreme": lambda: modiphius.format_test_full(
+            "1000d20f3t12c1", dice1000, 3, 12, 19, 900, 80),
+        "format_test_inline": lambda: modiphius.format_test_inline(4, 1),
+        "format_challenge_full/typical": lambda: (
+            modiphius.format_challenge_full("4cd", cd4, 3, 1)),
+        "roll/test": lambda: modiphius.roll("2d20f2t12c1"),
+        "roll/challenge": lambda: modiphius.roll("4cd"),
+        "roll/extreme": lambda: modiphius.roll("1000d20t10"),
+        "roll/miss": lambda: modiphius.roll("1d20+5"),
+        "find_inline_roll/small": lambda: inline.find_inline_roll(short),
+        "find_inline_roll/typical": lambda: inline.find_inline_roll(typical),
+        "find_inline_roll/extreme": lambda: inline.find_inline_roll(extreme),
+        "splice/typical": lambda: inline.splice(
+            typical, typical_rolls, typical_replacements),
+    }
+    if d20 is not None:
+        cases.update({
+            "d20.roll/small": lambda: d20.roll("1d20+5"),
+            "d20.roll/typical": lambda: d20.roll(
+                "4d6kh3+2 ability", allow_comments=True),
+            "d20.roll/exploding": lambda: d20.roll("8d6e6"),
+            "d20.roll/extreme": lambda: d20.roll("500d6"),
+        })
+    return cases
+
+
+def _loops(timer: timeit.Timer) -> int:
+    """Calls per timing so one timing lasts at least ``MIN_TIME``."""
+    number = 1
+    while timer.timeit(number) < MIN_TIME:
+        number *= 2
+    return number
+
+
+def measure(func):
+    """``(relative, seconds)`` per call: the median over ``ROUNDS`` of the
+    benchmark's time divided by a calibration time taken right before."""
+    calibration = timeit.Timer(calibrate)
+    benchmark = timeit.Timer(func)
+    calibration_loops = _loops(calibration)
+    loops = _loops(benchmark)
+    samples = []
+    for _ in range(ROUNDS):
+        unit = calibration.timeit(calibration_loops) / calibration_loops
+        seconds = benchmark.timeit(loops) / loops
+        samples.append((seconds / unit, seconds))
+    return sorted(samples)[len(samples) // 2]
+
+
+def tolerance_for(expected: float, tolerance: float) -> float:
+    if expected < SMALL_CASE:
+        return max(tolerance, SMALL_TOLERANCE)
+    return tolerance
+
+
+def engine() -> str:
+    return "numpy" if modiphius.numpy is not None else "python"
+
+
+def load_baseline() -> dict:
+    try:
+        with open(BASELINE_PATH) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(stored: dict) -> None:
+    with open(BASELINE_PATH, "w") as file:
+        json.dump(stored, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="record this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown, e.g. 0.3 for 30%%")
+    parser.add_argument("-k", dest="filter", default="",
+                        help="only run benchmarks whose name contains this")
+    args = parser.parse_args()
+
+    stored = load_baseline()
+    if engine() not in stored and not args.update_baseline:
+        # Times on one engine say nothing about the other's.
+        print(f"No baseline recorded for the {engine()} engine; nothing to "
+              "check. Record one with --update-baseline.")
+        return 0
+    baseline = stored.get(engine(), {})
+    results = {}
+    regressions = []
+    missing = []
+    print(f"engine: {engine()}")
+    print(f"{'benchmark':<32} {'time':>10} {'relative':>9} {'baseline':>9}")
+    for name, func in benchmarks().items():
+        if args.filter not in name:
+            continue
+        relative, seconds = measure(func)
+        results[name] = round(relative, 6)
+        expected = baseline.get(name)
+        if expected is None:
+            verdict = "      new"
+            missing.append(name)
+        else:
+            change = relative / expected - 1
+            verdict = f"{change:+8.0%}"
+            if change > tolerance_for(expected, args.tolerance):
+                verdict += "  REGRESSION"
+                regressions.append(name)
+        print(f"{name:<32} {seconds * 1e6:8.2f}µs {relative:9.4f} {verdict}")
+
+    if args.update_baseline:
+        stored[engine()] = {**baseline, **results}
+        save_baseline(stored)
+        print(f"Baseline for {engine()} written to {BASELINE_PATH}.")
+        return 0
+    status = 0
+    if missing:
+        # A case without a baseline could never fail the gate.
+        print(f"No baseline for {', '.join(missing)}; record one with "
+              "--update-baseline.")
+        status = 1
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond tolerance: "
+              f"{', '.join(regressions)}")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Small in-process caches shared by the bot's hot paths.
+
+Everything here is plain Python and runs on the event loop thread, so there
+is no locking. Entries are evicted least-recently-used once ``maxsize`` is
+reached, and optionally expire after ``ttl`` seconds.
+"""
+
+import time
+from collections import OrderedDict
+
+# Returned by ``TTLCache.get`` on a miss so that ``None`` can be cached as a
+# legitimate (negative) value.
+MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire ``ttl`` seconds after insert.
+
+    ``ttl=None`` disables expiry, leaving a plain LRU. ``hits`` and
+    ``misses`` count ``get`` outcomes so callers can report a hit rate.
+    """
+
+    def __init__(self, maxsize: int, ttl: float = None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, count=False) is not MISSING
+
+    def get(self, key, default=MISSING, count: bool = True):
+        entry = self._data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at is None or expires_at > self.clock():
+                self._data.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return value
+            del self._data[key]
+        if count:
+            self.misses += 1
+        return default
+
+    def set(self, key, value, ttl: float = MISSING) -> None:
+        """Store ``value``; ``ttl`` overrides the default for this key."""
+        if ttl is MISSING:
+            ttl = self.ttl
+        expires_at = None if ttl is None else self.clock() + ttl
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate(),
+        }
@@ -0,0 +1,104 @@
+"""Static cost estimates for inline rolls, checked before anything is rolled.
+
+``estimate`` predicts from a parsed expression how many dice a roll will
+throw, how much evaluation work it is and roughly how many characters its
+breakdown will take in the dump channel. ``admit`` turns that into a
+decision against a guild's limits: roll normally, roll but post only the
+totals (``SUMMARY``), or refuse (``REJECT``). Estimates are made once per
+distinct expression (``roller.parse`` caches them), so checking every roll
+costs nothing extra.
+"""
+
+from collections import namedtuple
+
+Cost = namedtuple("Cost", ["dice", "work", "output"])
+
+FULL = "full"
+SUMMARY = "summary"
+REJECT = "reject"
+
+# Nothing above this many dice is rolled, whatever a guild allows.
+HARD_MAX_DICE = 10_000
+# d20's default RollContext refuses to roll more than this many dice.
+D20_MAX_ROLLS = 1000
+# Breakdowns longer than this are summarised: with the header they would not
+# fit in one 2000-character Discord message.
+MAX_OUTPUT = 1500
+
+# Operators that can roll extra dice. Each is assumed to re-roll the whole
+# pool once, which is generous for the usual ``e6``/``ro1`` style.
+REROLL_OPS = {"e", "ra", "rr", "ro"}
+
+# Fixed text around a Modiphius result: header, decode and outcome lines.
+MODIPHIUS_OVERHEAD = 120
+
+
+def estimate(kind: str, params) -> Cost:
+    """Estimate a roll from ``roller.ParsedRoll`` fields ``kind``/``params``.
+    """
+    if kind == "test":
+        count = params["count"]
+        return Cost(count, count, MODIPHIUS_OVERHEAD + 4 * count)
+    if kind == "challenge":
+        count = params["count"]
+        return Cost(count, count, MODIPHIUS_OVERHEAD + 3 * count)
+    return _estimate_node(params)
+
+
+def _estimate_node(node) -> Cost:
+    """Walk a ``d20.parse`` tree; nodes are told apart by class name."""
+    kind = type(node).__name__
+    if kind in ("Expression", "Parenthetical", "AnnotatedNumber"):
+        inner = _estimate_node(node.roll if kind == "Expression"
+                               else node.value)
+        return Cost(inner.dice, inner.work + 1, inner.output + 2)
+    if kind == "Literal":
+        return Cost(0, 1, len(str(node.value)))
+    if kind == "UnOp":
+        inner = _estimate_node(node.value)
+        return Cost(inner.dice, inner.work + 1, inner.output + 1)
+    if kind == "BinOp":
+        left = _estimate_node(node.left)
+        right = _estimate_node(node.right)
+        return Cost(left.dice + right.dice, left.work + right.work + 1,
+                    left.output + right.output + 3)
+    if kind in ("OperatedDice", "OperatedSet"):
+        inner = _estimate_node(node.value)
+        dice = inner.dice
+        for operation in node.operations:
+            if operation.op in REROLL_OPS:
+                dice += inner.dice
+        # Every operator is applied to every die in the pool.
+        work = inner.work + dice * len(node.operations)
+        per_die = inner.output / inner.dice if inner.dice else 0
+        output = inner.output + int(per_die * (dice - inner.dice))
+        return Cost(dice, work, output)
+    if kind == "Dice":
+        num = int(node.num)
+        size = 100 if node.size == "%" else int(node.size)
+        return Cost(num, num, num * (len(str(size)) + 2) + 8)
+    if kind == "NumberSet":
+        dice = work = output = 0
+        for value in node.values:
+            part = _estimate_node(value)
+            dice += part.dice
+            work += part.work
+            output += part.output + 2
+        return Cost(dice, work + 1, output + 2)
+    # Unknown node: count it as one unit so new syntax is never free.
+    return Cost(0, 1, 1)
+
+
+def admit(kind: str, cost: Cost, max_dice: int, mode: str) -> str:
+    """``FULL``, ``SUMMARY`` or ``REJECT`` for a roll costing ``cost``.
+
+    ``max_dice`` and ``mode`` (``SUMMARY`` or ``REJECT``) come from the
+    guild's settings and apply to rolls over its dice limit or too long to
+    show; the hard caps reject whatever the guild chose.
+    """
+    hard_cap = D20_MAX_ROLLS if kind == "d20" else HARD_MAX_DICE
+    if cost.dice > hard_cap:
+        return REJECT
+    if cost.dice <= max_dice and cost.output <= MAX_OUTPUT:
+        return FULL
+    return SUMMARY if mode == SUMMARY else REJECT
@@ -0,0 +1,515 @@
+"""Exact outcome distributions for d20-library roll expressions.
+
+``analyze`` takes the tree ``d20.parse`` returns, rewrites it into a
+hashable key (nested tuples), checks the key against size limits, and then
+solves it bottom-up:
+
+* a plain pool of dice is the n-fold convolution of one die's distribution
+  (NumPy ``convolve`` when available, a pure-Python loop otherwise);
+* ``kh``/``kl``/``ph``/``pl`` pools use an order-statistic DP over faces;
+* ``mi``/``ma``/``ro``/``rr`` and value-based ``k``/``p`` become a
+  per-die transform before summing;
+* ``+``/``-`` convolve, other arithmetic combines outcomes pairwise.
+
+Solutions are memoised per key, so shared building blocks such as ``1d20``
+or ``4d6kh3`` are solved once per process. Exploding dice, ``ra`` and
+non-integer arithmetic have no exact answer here and raise ``Unsupported``;
+oversized expressions raise ``TooComplex`` before any solving starts.
+"""
+
+import functools
+import math
+import operator
+from collections import namedtuple
+
+try:
+    import numpy
+except ImportError:  # convolutions fall back to pure Python
+    numpy = None
+
+MAX_DICE = 1000  # dice in a single pool
+MAX_SIDES = 10000
+MAX_SUPPORT = 100_000  # distinct totals any subexpression may span
+# Rough multiply-add budget for one analysis; NumPy gets a bigger one.
+PYTHON_MAX_WORK = 2_000_000
+MAX_WORK = 200_000_000 if numpy is not None else PYTHON_MAX_WORK
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# A distribution over the integers ``offset .. offset + len(probs) - 1``.
+Dist = namedtuple("Dist", ["offset", "probs"])
+
+Analysis = namedtuple("Analysis", [
+    "dist", "mean", "stdev", "minimum", "maximum", "percentiles",
+    "crit", "fumble",
+])
+
+BINARY_OPS = {
+    "*": operator.mul,
+    "//": operator.floordiv,
+    "%": operator.mod,
+    "==": lambda a, b: int(a == b),
+    "!=": lambda a, b: int(a != b),
+    "<": lambda a, b: int(a < b),
+    ">": lambda a, b: int(a > b),
+    "<=": lambda a, b: int(a <= b),
+    ">=": lambda a, b: int(a >= b),
+}
+
+# Set operators applied to each die independently.
+PER_DIE_OPS = ("mi", "ma", "ro", "rr")
+
+
+class DistError(ValueError):
+    """An expression ``analyze`` won't solve; the message is user-facing."""
+
+
+class Unsupported(DistError):
+    pass
+
+
+class TooComplex(DistError):
+    pass
+
+
+# --- AST -> key -----------------------------------------------------------
+
+def to_key(node) -> tuple:
+    """Rewrite a ``d20.parse`` tree into nested tuples.
+
+    Nodes are told apart by class name, which keeps this module free of a
+    hard dependency on d20's AST classes.
+    """
+    kind = type(node).__name__
+    if kind in ("Expression", "Parenthetical", "AnnotatedNumber"):
+        inner = node.roll if kind == "Expression" else node.value
+        return to_key(inner)
+    if kind == "Literal":
+        if isinstance(node.value, float) and not node.value.is_integer():
+            raise Unsupported("Fractional numbers can't be analysed exactly.")
+        return ("lit", int(node.value))
+    if kind == "UnOp":
+        inner = to_key(node.value)
+        return inner if node.op == "+" else ("neg", inner)
+    if kind == "BinOp":
+        if node.op not in BINARY_OPS and node.op not in ("+", "-"):
+            raise Unsupported(f"The `{node.op}` operator isn't supported.")
+        return ("bin", node.op, to_key(node.left), to_key(node.right))
+    if kind in ("OperatedDice", "OperatedSet"):
+        base = to_key(node.value)
+        ops = tuple(_op_key(op) for op in node.operations)
+        if not ops:
+            return base
+        if base[0] == "dice":
+            return ("dice", base[1], base[2], base[3] + ops)
+        raise Unsupported("Operations on sets aren't supported.")
+    if kind == "Dice":
+        size = 100 if node.size == "%" else int(node.size)
+        return ("dice", int(node.num), size, ())
+    if kind == "NumberSet":
+        return ("set", tuple(to_key(value) for value in node.values))
+    raise Unsupported(f"`{kind}` isn't supported.")
+
+
+def _op_key(op) -> tuple:
+    return (op.op, tuple((sel.cat, int(sel.num)) for sel in op.sels))
+
+
+# --- limits ---------------------------------------------------------------
+
+def _matches(selector, value: int) -> bool:
+    cat, num = selector
+    if cat is None:
+        return value == num
+    if cat == "<":
+        return value < num
+    if cat == ">":
+        return value > num
+    raise Unsupported("Only value selectors work with this operator.")
+
+
+def _split_ops(ops):
+    """Split dice operators into (per-die ops, final keep/drop op or None)."""
+    per_die = []
+    for index, (op, sels) in enumerate(ops):
+        if op in PER_DIE_OPS:
+            per_die.append((op, sels))
+        elif op in ("k", "p"):
+            if index != len(ops) - 1:
+                raise Unsupported(
+                    "Only one keep/drop, as the last operation, is supported."
+                )
+            return per_die, (op, sels)
+        elif op in ("e", "ra"):
+            raise Unsupported(
+                "Exploding dice have no exact distribution — try `;;sim`."
+            )
+        else:
+            raise Unsupported(f"The `{op}` operation isn't supported.")
+    return per_die, None
+
+
+def _order_keep(num: int, keep):
+    """``(kept, highest)`` for an ``h``/``l`` keep/drop, else None."""
+    if keep is None:
+        return None
+    op, sels = keep
+    if len(sels) != 1 or sels[0][0] not in ("h", "l"):
+        return None
+    cat, count = sels[0]
+    count = min(max(count, 0), num)
+    if op == "k":
+        return count, cat == "h"
+    return num - count, cat == "l"  # dropping lowest keeps highest
+
+
+def _plan(key):
+    """Return ``(low, high, work)`` bounds for ``key`` or raise TooComplex."""
+    kind = key[0]
+    if kind == "lit":
+        return key[1], key[1], 0
+    if kind == "neg":
+        low, high, work = _plan(key[1])
+        return -high, -low, work
+    if kind == "set":
+        low = high = work = 0
+        for value in key[1]:
+            v_low, v_high, v_work = _plan(value)
+            work += v_work + (high - low + 1) * (v_high - v_low + 1)
+            low, high = low + v_low, high + v_high
+        return _checked(low, high, work)
+    if kind == "dice":
+        _, num, size, ops = key
+        if num > MAX_DICE or size > MAX_SIDES:
+            raise TooComplex(
+                f"Pools are limited to {MAX_DICE} dice of up to "
+                f"{MAX_SIDES} sides."
+            )
+        if num < 0 or size < 1:
+            raise Unsupported("That dice pool can't be rolled.")
+        per_die, keep = _split_ops(ops)
+        order = _order_keep(num, keep)
+        face_low, face_high = 1, size
+        for op, sels in per_die:
+            if op == "mi":
+                face_low = max(face_low, sels[0][1])
+                face_high = max(face_high, sels[0][1])
+            elif op == "ma":
+                face_low = min(face_low, sels[0][1])
+                face_high = min(face_high, sels[0][1])
+        if keep is not None and order is None:
+            face_low = min(face_low, 0)  # dropped dice count as 0
+        kept = order[0] if order else num
+        low, high = kept * face_low, kept * face_high
+        support = high - low + 1
+        if order and kept == 0:
+            work = 0
+        elif order and kept < num:
+            work = size * num * num * (kept * face_high + 1)
+            # keep_extreme is pure Python whether or not NumPy is around.
+            if work > PYTHON_MAX_WORK:
+                raise TooComplex(
+                    "That keep/drop pool is too big to solve exactly."
+                )
+        else:  # keeping every die is a plain sum
+            work = num * support * size
+        return _checked(low, high, work)
+    if kind == "bin":
+        _, op, left, right = key
+        l_low, l_high, l_work = _plan(left)
+        r_low, r_high, r_work = _plan(right)
+        work = l_work + r_work + (l_high - l_low + 1) * (r_high - r_low + 1)
+        if op == "+":
+            low, high = l_low + r_low, l_high + r_high
+        elif op == "-":
+            low, high = l_low - r_high, l_high - r_low
+        elif op == "*":
+            corners = [a * b for a in (l_low, l_high) for b in (r_low, r_high)]
+            low, high = min(corners), max(corners)
+        elif op in ("//", "%"):
+            if right[0] != "lit" or right[1] <= 0:
+                raise Unsupported(
+                    f"`{op}` needs a positive whole number on its right."
+                )
+            if op == "//":
+                low, high = l_low // right[1], l_high // right[1]
+            else:
+                low, high = 0, right[1] - 1
+        else:  # comparison
+            low, high = 0, 1
+        return _checked(low, high, work)
+    raise Unsupported("That expression isn't supported.")
+
+
+def _checked(low: int, high: int, work: int):
+    if high - low + 1 > MAX_SUPPORT:
+        raise TooComplex("That expression has too many possible totals.")
+    if work > MAX_WORK:
+        raise TooComplex("That expression is too big to solve exactly.")
+    return low, high, work
+
+
+# --- distribution arithmetic ----------------------------------------------
+
+def _trim(offset: int, probs) -> Dist:
+    start = 0
+    end = len(probs)
+    while start < end - 1 and probs[start] == 0:
+        start += 1
+    while end > start + 1 and probs[end - 1] == 0:
+        end -= 1
+    return Dist(offset + start, tuple(probs[start:end]))
+
+
+def _from_mapping(outcomes: dict) -> Dist:
+    low = min(outcomes)
+    probs = [0.0] * (max(outcomes) - low + 1)
+    for value, prob in outcomes.items():
+        probs[value - low] += prob
+    return _trim(low, probs)
+
+
+def _convolve(a, b) -> list:
+    if numpy is not None:
+        return numpy.convolve(a, b).tolist()
+    out = [0.0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                out[i + j] += x * y
+    return out
+
+
+def add(a: Dist, b: Dist) -> Dist:
+    return _trim(a.offset + b.offset, _convolve(a.probs, b.probs))
+
+
+def negate(a: Dist) -> Dist:
+    return Dist(-(a.offset + len(a.probs) - 1), a.probs[::-1])
+
+
+def combine(a: Dist, b: Dist, func) -> Dist:
+    outcomes = {}
+    for i, x in enumerate(a.probs):
+        if not x:
+            continue
+        for j, y in enumerate(b.probs):
+            if y:
+                value = func(a.offset + i, b.offset + j)
+                outcomes[value] = outcomes.get(value, 0.0) + x * y
+    return _from_mapping(outcomes)
+
+
+def sum_of(die: Dist, count: int) -> Dist:
+    """Distribution of the sum of ``count`` independent copies of ``die``."""
+    result = Dist(0, (1.0,))
+    power = die
+    while count:
+        if count & 1:
+            result = add(result, power)
+        count >>= 1
+        if count:
+            power = add(power, power)
+    return result
+
+
+def _die(size: int, per_die) -> dict:
+    """One die's value -> probability after the per-die operators."""
+    faces = {face: 1 / size for face in range(1, size + 1)}
+    for op, sels in per_die:
+        if op in ("mi", "ma"):
+            bound = sels[0][1]
+            clamp = max if op == "mi" else min
+            clamped = {}
+            for face, prob in faces.items():
+                value = clamp(face, bound)
+                clamped[value] = clamped.get(value, 0.0) + prob
+            faces = clamped
+        else:
+            hit = sum(p for f, p in faces.items()
+                      if any(_matches(sel, f) for sel in sels))
+            kept = {f: p for f, p in faces.items()
+                    if not any(_matches(sel, f) for sel in sels)}
+            if op == "rr":
+                if not kept:
+                    raise Unsupported("That reroll would never stop.")
+                faces = {f: p / (1 - hit) for f, p in kept.items()}
+            else:  # "ro": a matching die is rolled again, once
+                faces = {f: kept.get(f, 0.0) + hit * p
+                         for f, p in faces.items()}
+    return faces
+
+
+def keep_extreme(faces: dict, num: int, kept: int, highest: bool) -> Dist:
+    """Sum of the ``kept`` highest (or lowest) of ``num`` dice.
+
+    Faces are visited from the kept end; the state is (dice placed so far,
+    sum of the kept ones). Choosing ``c`` dice for a face weighs
+    ``C(remaining, c) * p**c``, which multiplies out to the multinomial.
+    As soon as ``kept`` dice are placed the rest no longer matter, so the
+    state is closed off with the remaining faces' total probability.
+    """
+    order = sorted((f for f, p in faces.items() if p), reverse=highest)
+    done = {}
+    states = {(0, 0): 1.0}
+    remaining_mass = sum(faces[f] for f in order)
+    for face in order:
+        prob = faces[face]
+        remaining_mass = max(remaining_mass - prob, 0.0)
+        step = {}
+        for (placed, total), weight in states.items():
+            left = num - placed
+            for count in range(left + 1):
+                chance = weight * math.comb(left, count) * prob ** count
+                if not chance:
+                    continue
+                new_total = total + min(count, kept - placed) * face
+                new_placed = placed + count
+                if new_placed >= kept:
+                    rest = remaining_mass ** (num - new_placed) \
+                        if num > new_placed else 1.0
+                    done[new_total] = done.get(new_total, 0.0) + chance * rest
+                else:
+                    key = (new_placed, new_total)
+                    step[key] = step.get(key, 0.0) + chance
+        states = step
+    return _from_mapping(done)
+
+
+@functools.lru_cache(maxsize=1024)
+def solve(key) -> Dist:
+    """Exact distribution for a key from ``to_key``; memoised per key."""
+    kind = key[0]
+    if kind == "lit":
+        return Dist(key[1], (1.0,))
+    if kind == "neg":
+        return negate(solve(key[1]))
+    if kind == "set":
+        result = Dist(0, (1.0,))
+        for value in key[1]:
+            result = add(result, solve(value))
+        return result
+    if kind == "dice":
+        _, num, size, ops = key
+        per_die, keep = _split_ops(ops)
+        faces = _die(size, per_die)
+        order = _order_keep(num, keep)
+        if order is not None:
+            kept, highest = order
+            if kept == 0:
+                return Dist(0, (1.0,))
+            if kept < num:
+                return keep_extreme(faces, num, kept, highest)
+        elif keep is not None:  # keep/drop by value: dropped dice add 0
+            op, sels = keep
+            valued = {}
+            for face, prob in faces.items():
+                hit = any(_matches(sel, face) for sel in sels)
+                value = face if hit == (op == "k") else 0
+                valued[value] = valued.get(value, 0.0) + prob
+            faces = valued
+        return sum_of(_from_mapping(faces), num)
+    _, op, left, right = key
+    if op == "+":
+        return add(solve(left), solve(right))
+    if op == "-":
+        return add(solve(left), negate(solve(right)))
+    return combine(solve(left), solve(right), BINARY_OPS[op])
+
+
+# --- summaries ------------------------------------------------------------
+
+def _leftmost_dice(key):
+    """The dice key d20 checks for crits: the leftmost pool, if any."""
+    while key[0] != "dice":
+        if key[0] == "bin":
+            key = key[2]
+        elif key[0] == "neg":
+            key = key[1]
+        elif key[0] == "set" and key[1]:
+            key = key[1][0]
+        else:
+            return None
+    return key
+
+
+def _crit_dice(key):
+    """The leftmost pool if d20 checks it for crits (one d20 kept)."""
+    dice = _leftmost_dice(key)
+    if dice is None or dice[2] != 20:
+        return None
+    _, keep = _split_ops(dice[3])
+    order = _order_keep(dice[1], keep)
+    kept = order[0] if order else (dice[1] if keep is None else None)
+    return dice if kept == 1 else None
+
+
+def checks_crits(key) -> bool:
+    """Whether d20 reports crits for ``key``, e.g. ``1d20+5``, ``2d20kh1``."""
+    try:
+        return _crit_dice(key) is not None
+    except Unsupported:
+        return False
+
+
+def _crit_odds(key):
+    """(crit, fumble) chances, or (None, None) when d20 wouldn't check."""
+    dice = _crit_dice(key)
+    if dice is None:
+        return None, None
+    dist = solve(dice)
+    return probability(dist, 20), probability(dist, 1)
+
+
+def probability(dist: Dist, value: int) -> float:
+    index = value - dist.offset
+    return dist.probs[index] if 0 <= index < len(dist.probs) else 0.0
+
+
+def analyze(node) -> Analysis:
+    """Solve a ``d20.parse`` tree; raises ``DistError`` subclasses."""
+    key = to_key(node)
+    _plan(key)
+    dist = solve(key)
+    total = sum(dist.probs)
+    values = range(dist.offset, dist.offset + len(dist.probs))
+    mean = sum(v * p for v, p in zip(values, dist.probs)) / total
+    variance = sum((v - mean) ** 2 * p
+                   for v, p in zip(values, dist.probs)) / total
+    percentiles = {}
+    cumulative = 0.0
+    targets = iter(PERCENTILES)
+    target = next(targets)
+    for value, prob in zip(values, dist.probs):
+        cumulative += prob / total
+        while target is not None and cumulative >= target / 100 - 1e-12:
+            percentiles[target] = value
+            target = next(targets, None)
+    crit, fumble = _crit_odds(key)
+    return Analysis(
+        dist=dist,
+        mean=mean,
+        stdev=math.sqrt(variance),
+        minimum=dist.offset,
+        maximum=dist.offset + len(dist.probs) - 1,
+        percentiles=percentiles,
+        crit=crit,
+        fumble=fumble,
+    )
+
+
+def format_analysis(analysis: Analysis) -> list:
+    """``(name, value)`` embed fields for an ``Analysis``."""
+    fields = [
+        ("Average", f"{analysis.mean:.2f} ± {analysis.stdev:.2f}"),
+        ("Range", f"{analysis.minimum} – {analysis.maximum}"),
+        ("Percentiles", " · ".join(
+            f"p{p} **{v}**" for p, v in analysis.percentiles.items()
+        )),
+    ]
+    if analysis.crit is not None:
+        fields.append((
+            "Natural 20 / 1",
+            f"💥 {analysis.crit:.2%} · 💀 {analysis.fumble:.2%}",
+        ))
+    return fields
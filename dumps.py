@@ -0,0 +1,83 @@
+"""Coalescing of dump-channel posts during bursts of rolls.
+
+``DumpCoalescer.post`` sends a breakdown to a dump channel and returns the
+message it ended up in. A channel with nothing in flight is sent to at
+once, so a lone roll pays no extra latency. Breakdowns that arrive while a
+send to the same channel is in flight wait for it, then go out together as
+one message (up to ``limit`` characters, in arrival order); every waiting
+roll gets that combined message, and so a jump link to its breakdown. A
+burst of N rolls becomes a handful of sends instead of N, which keeps the
+dump channel under its rate limit.
+"""
+
+import asyncio
+
+# Discord's message length limit.
+MESSAGE_LIMIT = 2000
+
+
+class DumpCoalescer:
+    def __init__(self, limit: int = MESSAGE_LIMIT, separator: str = "\n"):
+        self.limit = limit
+        self.separator = separator
+        self._pending = {}  # channel id -> [(text, future), ...]
+        self._senders = {}  # channel id -> the task draining _pending
+        self.posts = 0
+        self.sends = 0
+
+    async def post(self, channel, text: str):
+        """Send ``text`` to ``channel``; returns the (shared) ``Message``."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(channel.id, []).append((text, future))
+        self.posts += 1
+        if channel.id not in self._senders:
+            self._senders[channel.id] = asyncio.create_task(
+                self._drain(channel)
+            )
+        return await future
+
+    def _take_batch(self, pending: list) -> list:
+        """Pop the longest prefix of ``pending`` that fits in one message.
+
+        The first entry is always taken, even if it is too long on its own;
+        the send then fails for that roll alone.
+        """
+        size = len(pending[0][0])
+        count = 1
+        while count < len(pending):
+            size += len(self.separator) + len(pending[count][0])
+            if size > self.limit:
+                break
+            count += 1
+        batch = pending[:count]
+        del pending[:count]
+        return batch
+
+    async def _drain(self, channel) -> None:
+        pending = self._pending[channel.id]
+        batch = []
+        try:
+            while pending:
+                batch = self._take_batch(pending)
+                content = self.separator.join(text for text, _ in batch)
+                self.sends += 1
+                try:
+                    message = await channel.send(content)
+                except Exception as error:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(error)
+                    continue
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(message)
+        finally:
+            # Only reached with entries left if the task was cancelled.
+            for _, future in batch + pending:
+                if not future.done():
+                    future.cancel()
+            del self._pending[channel.id]
+            del self._senders[channel.id]
+
+    def stats(self) -> dict:
+        return {"posts": self.posts, "sends": self.sends}
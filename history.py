@@ -0,0 +1,202 @@
+"""Background writer for the roll history table.
+
+Rolls are queued as compact ``HistoryRecord`` tuples and written by one
+task, in batches, on a worker thread, so recording history never blocks the
+event loop. A batch is flushed once ``batch_size`` records are waiting or
+``flush_interval`` seconds after its first record, whichever comes first.
+"""
+
+import asyncio
+import datetime
+import functools
+import logging
+import re
+import time
+from collections import namedtuple
+
+from repository import RollHistoryRepository
+
+log = logging.getLogger(__name__)
+
+AGE_PATTERN = re.compile(r"^(\d+)([smhdw])$")
+DATE_PATTERN = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+CHANNEL_MENTION_PATTERN = re.compile(r"^<#(\d+)>$")
+AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+# Queued by HistorySink.close: the writer flushes its batch and exits.
+_STOP = object()
+
+# Only the columns ``history_dice`` stores; never a whole discord.Message.
+HistoryRecord = namedtuple("HistoryRecord", [
+    "guild_id", "character_name", "dice_roll", "result", "expression",
+    "crit", "room_name", "channel_id", "message_id", "created_at",
+])
+
+
+class HistorySink:
+    """Bounded queue of ``HistoryRecord`` drained by a batching writer.
+
+    ``submit`` waits when the queue is full, which is the backpressure: the
+    counters record how often that happened and how deep the queue got.
+    """
+
+    def __init__(self, repository: RollHistoryRepository = None,
+                 maxsize: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 1.0):
+        self.repository = repository or RollHistoryRepository()
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = None
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.blocked = 0  # submits that had to wait for room
+        self.high_water = 0  # deepest the queue has been
+        self._task = None
+        self._writing = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self.queue = asyncio.Queue(maxsize=self.maxsize)
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, record: HistoryRecord) -> None:
+        if self.queue.full():
+            self.blocked += 1
+        await self.queue.put(record)
+        self.enqueued += 1
+        self.high_water = max(self.high_water, self.queue.qsize())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            record = await self.queue.get()
+            if record is _STOP:
+                return
+            batch = [record]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                if not self.queue.empty():
+                    record = self.queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        record = await asyncio.wait_for(
+                            self.queue.get(), timeout
+                        )
+                    except asyncio.TimeoutError:
+                        break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            await self._write(batch)
+
+    async def _write(self, batch) -> None:
+        # Shielded so a shutdown cancel can't drop a batch already dequeued;
+        # the outcome is counted when the thread finishes either way.
+        writing = asyncio.ensure_future(
+            asyncio.to_thread(self.repository.add_histories, batch)
+        )
+        writing.add_done_callback(
+            functools.partial(self._written, len(batch))
+        )
+        self._writing = writing
+        await asyncio.gather(asyncio.shield(writing), return_exceptions=True)
+
+    def _written(self, count: int, writing: asyncio.Future) -> None:
+        if writing.cancelled():
+            return
+        error = writing.exception()
+        if error is not None:
+            self.failed += count
+            log.error("Failed to write %d history records", count,
+                      exc_info=error)
+            return
+        self.written += count
+        self.batches += 1
+
+    async def close(self) -> None:
+        """Stop the writer and flush every record still queued.
+
+        The writer is told to stop through the queue, so it first writes
+        the batch it is holding; records submitted while it stops are
+        written here.
+        """
+        if self._task is None:
+            return
+        await self.queue.put(_STOP)
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self._writing is not None:
+            await asyncio.gather(self._writing, return_exceptions=True)
+        batch = []
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        if batch:
+            await self._write(batch)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "blocked": self.blocked,
+            "high_water": self.high_water,
+        }
+
+
+def _parse_time(value: str, now: float, end_of_day: bool) -> int:
+    """``7d``-style age or ``YYYY-MM-DD`` (UTC) -> unix timestamp."""
+    age = AGE_PATTERN.match(value)
+    if age is not None:
+        return int(now) - int(age.group(1)) * AGE_UNITS[age.group(2)]
+    date = DATE_PATTERN.match(value)
+    if date is not None:
+        try:
+            start = datetime.datetime(
+                *(int(part) for part in date.groups()),
+                tzinfo=datetime.timezone.utc,
+            )
+        except ValueError:
+            raise ValueError(f"`{value}` is not a valid date.")
+        return int(start.timestamp()) + (86399 if end_of_day else 0)
+    raise ValueError(
+        f"`{value}` isn't a time — use an age like `3h`/`7d` "
+        "or a date like `2024-05-01`."
+    )
+
+
+def parse_history_query(text: str, now: float = None) -> dict:
+    """Split ``;;history`` arguments into filters for ``get_history_page``.
+
+    ``<#channel>`` filters by channel, ``since:``/``until:`` take an age
+    (``3h``, ``7d``, ``2w``) or a UTC date, and whatever is left is the
+    character name. Raises ``ValueError`` with a user-facing message.
+    """
+    now = time.time() if now is None else now
+    filters = {
+        "character_name": None, "channel_id": None,
+        "since": None, "until": None,
+    }
+    name_parts = []
+    for token in text.split():
+        channel = CHANNEL_MENTION_PATTERN.match(token)
+        key, _, value = token.partition(":")
+        if channel is not None:
+            filters["channel_id"] = int(channel.group(1))
+        elif key.lower() in ("since", "until") and value:
+            key = key.lower()
+            filters[key] = _parse_time(value, now, end_of_day=key == "until")
+        else:
+            name_parts.append(token)
+    if name_parts:
+        filters["character_name"] = " ".join(name_parts)
+    return filters
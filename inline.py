@@ -0,0 +1,61 @@
+"""Finding ``[[ ]]`` inline rolls in a message and splicing in results.
+
+``scan`` walks the message once and returns the span of every roll;
+``splice`` rebuilds the message from the original text and one replacement
+per span in a single join, so a message with ``k`` rolls costs O(n) rather
+than a rescan and copy per roll. Because replacements go by position, two
+identical expressions each get their own result.
+
+Bracket edge cases:
+
+* Each ``]]`` closes the nearest ``[[`` before it (after the previous
+  roll), so ``[[a [[1d6]]`` rolls ``1d6`` and leaves ``[[a `` as text,
+  and ``[[[1d6]]]`` rolls ``1d6`` inside literal single brackets.
+* A ``[[`` with no ``]]`` after it, or a ``]]`` with no ``[[`` before it,
+  is left as text.
+* Expressions spanning a line break, and empty or blank ones (``[[ ]]``),
+  are not rolls and are left as text.
+"""
+
+from collections import namedtuple
+
+# ``content[start:end]`` is the whole ``[[expression]]``.
+InlineRoll = namedtuple("InlineRoll", ["start", "end", "expression"])
+
+OPEN = "[["
+CLOSE = "]]"
+
+
+def scan(content: str) -> list:
+    """Every inline roll in ``content``, in order, as ``InlineRoll`` spans."""
+    rolls = []
+    pos = 0
+    while True:
+        close = content.find(CLOSE, pos)
+        if close == -1:
+            return rolls
+        start = content.rfind(OPEN, pos, close)
+        if start != -1:
+            expression = content[start + len(OPEN):close]
+            if expression.strip() and "\n" not in expression:
+                rolls.append(
+                    InlineRoll(start, close + len(CLOSE), expression)
+                )
+        pos = close + len(CLOSE)
+
+
+def find_inline_roll(content: str) -> list:
+    """The expressions of ``scan(content)``."""
+    return [roll.expression for roll in scan(content)]
+
+
+def splice(content: str, rolls, replacements) -> str:
+    """``content`` with each roll's span replaced by its replacement."""
+    parts = []
+    pos = 0
+    for roll, replacement in zip(rolls, replacements):
+        parts.append(content[pos:roll.start])
+        parts.append(replacement)
+        pos = roll.end
+    parts.append(content[pos:])
+    return "".join(parts)
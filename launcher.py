@@ -0,0 +1,263 @@
+"""Runs the bot as several worker processes, each owning a range of shards.
+
+Each worker is ``python main.py`` with ``SHARD_COUNT``, its ``SHARD_IDS``
+and a ``HEARTBEAT_FILE`` in its environment, and runs its range as one
+``AutoShardedBot``; every worker shares the SQLite database. Workers are
+started one after another, each once the previous one reports ready, so
+their gateway logins don't trip Discord's identify rate limit.
+
+The launcher restarts a worker that exits (backing off if it keeps
+crashing) or stops writing heartbeats, prints every worker's per-shard
+latency every ``STATUS_INTERVAL`` seconds, and on SIGHUP restarts the
+workers one at a time, waiting for each to be ready before moving on.
+SIGTERM or Ctrl+C stops them all.
+
+Discord sends DMs only to shard 0, so each worker also gets a local port
+(``RELAY_PORT`` + its index) and its peers' ports, over which the shard-0
+worker forwards 📝 edit replies to the worker holding the session; see
+``relay``. Run from the repository root::
+
+    SHARD_COUNT=8 WORKERS=4 python launcher.py
+"""
+
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import time
+
+import shards
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MAIN = os.path.join(HERE, "main.py")
+DEFAULT_HEARTBEAT_DIR = os.path.join(HERE, "run")
+DEFAULT_RELAY_PORT = 47800
+
+# Longest a (re)started worker gets to report all of its shards ready.
+READY_TIMEOUT = 300
+# Grace period between SIGTERM and SIGKILL when stopping a worker.
+STOP_TIMEOUT = 30
+# First delay before restarting a crashed worker; doubled per crash in a
+# row, up to RESTART_DELAY * 2 ** MAX_BACKOFF.
+RESTART_DELAY = 5
+MAX_BACKOFF = 6
+STATUS_INTERVAL = 60
+POLL_INTERVAL = 1
+
+
+def log(text: str) -> None:
+    print(f"[launcher] {text}", flush=True)
+
+
+class Worker:
+    def __init__(self, index: int, shard_ids: list, shard_count: int,
+                 heartbeat_dir: str, relay_ports: list = (),
+                 relay_token: str = ""):
+        self.index = index
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.relay_ports = list(relay_ports)  # every worker's, by index
+        self.relay_token = relay_token
+        self.heartbeat_path = os.path.join(
+            heartbeat_dir, f"worker-{index}.json"
+        )
+        self.process = None
+        self.started_at = None
+        self.crashes = 0  # in a row; reset once the worker is healthy
+        self.restart_at = None  # when a crashed worker is due to restart
+
+    @property
+    def label(self) -> str:
+        first, last = self.shard_ids[0], self.shard_ids[-1]
+        shard_range = str(first) if first == last else f"{first}-{last}"
+        return f"worker {self.index} (shards {shard_range})"
+
+    def environment(self) -> dict:
+        env = dict(os.environ)
+        env["SHARD_COUNT"] = str(self.shard_count)
+        env["SHARD_IDS"] = shards.format_shard_ids(self.shard_ids)
+        env["HEARTBEAT_FILE"] = self.heartbeat_path
+        if self.relay_ports:
+            env["EDIT_RELAY_PORT"] = str(self.relay_ports[self.index])
+            env["EDIT_RELAY_PEERS"] = ",".join(
+                str(port) for index, port in enumerate(self.relay_ports)
+                if index != self.index
+            )
+            env["EDIT_RELAY_TOKEN"] = self.relay_token
+        # Each worker needs its own metrics port and file.
+        if env.get("METRICS_PORT"):
+            env["METRICS_PORT"] = str(int(env["METRICS_PORT"]) + self.index)
+        if env.get("METRICS_FILE"):
+            root, extension = os.path.splitext(env["METRICS_FILE"])
+            env["METRICS_FILE"] = f"{root}-{self.index}{extension}"
+        return env
+
+    def start(self) -> None:
+        self.process = subprocess.Popen(
+            [sys.executable, MAIN], env=self.environment(), cwd=HERE
+        )
+        self.started_at = time.time()
+        self.restart_at = None
+        log(f"{self.label} started, pid {self.process.pid}")
+
+    def running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def terminate(self) -> None:
+        if self.running():
+            self.process.terminate()
+
+    def wait(self) -> None:
+        if self.process is None:
+            return
+        try:
+            self.process.wait(STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            log(f"{self.label} ignored SIGTERM; killing it")
+            self.process.kill()
+            self.process.wait()
+
+    def stop(self) -> None:
+        self.terminate()
+        self.wait()
+
+    def heartbeat(self):
+        return shards.read_heartbeat(self.heartbeat_path)
+
+    def healthy(self) -> bool:
+        return self.running() and shards.is_healthy(
+            self.heartbeat(), pid=self.process.pid
+        )
+
+    def hung(self) -> bool:
+        """Running, but silent: no heartbeat READY_TIMEOUT after starting,
+        or none for HEARTBEAT_TIMEOUT since the last one."""
+        heartbeat = self.heartbeat()
+        now = time.time()
+        if heartbeat is None or heartbeat.get("pid") != self.process.pid:
+            return now - self.started_at > READY_TIMEOUT
+        return now - heartbeat["time"] > shards.HEARTBEAT_TIMEOUT
+
+
+class Launcher:
+    def __init__(self, workers: list):
+        self.workers = workers
+        self.stopping = False
+        self.restart_requested = False
+
+    def wait_ready(self, worker: Worker) -> bool:
+        deadline = time.time() + READY_TIMEOUT
+        while not self.stopping and time.time() < deadline:
+            if not worker.running():
+                return False
+            if worker.healthy():
+                return True
+            time.sleep(POLL_INTERVAL)
+        return False
+
+    def start_all(self) -> None:
+        for worker in self.workers:
+            if self.stopping:
+                return
+            worker.start()
+            if not self.wait_ready(worker) and not self.stopping:
+                log(f"{worker.label} is not ready; starting the next anyway")
+
+    def rolling_restart(self) -> None:
+        log("rolling restart")
+        for worker in self.workers:
+            if self.stopping:
+                return
+            worker.stop()
+            worker.start()
+            if not self.wait_ready(worker):
+                if not self.stopping:
+                    log(f"{worker.label} did not come back ready; "
+                        "rolling restart stopped")
+                return
+        log("rolling restart done")
+
+    def check(self, worker: Worker) -> None:
+        """Restart ``worker`` if it has exited or hung."""
+        now = time.time()
+        if worker.running():
+            if worker.hung():
+                log(f"{worker.label} stopped sending heartbeats; restarting")
+                worker.stop()
+                worker.start()
+            elif worker.crashes and worker.healthy():
+                worker.crashes = 0
+            return
+        if worker.restart_at is None:
+            delay = RESTART_DELAY * 2 ** min(worker.crashes, MAX_BACKOFF)
+            worker.crashes += 1
+            worker.restart_at = now + delay
+            log(f"{worker.label} exited with status "
+                f"{worker.process.returncode}; restarting in {delay}s")
+        elif now >= worker.restart_at:
+            worker.start()
+
+    def report(self) -> None:
+        for worker in self.workers:
+            pid = worker.process.pid if worker.running() else "-"
+            log(f"{worker.label} pid {pid}: "
+                f"{shards.describe(worker.heartbeat())}")
+
+    def supervise(self) -> None:
+        next_report = time.time() + STATUS_INTERVAL
+        while not self.stopping:
+            if self.restart_requested:
+                self.restart_requested = False
+                self.rolling_restart()
+                continue
+            for worker in self.workers:
+                self.check(worker)
+            if time.time() >= next_report:
+                self.report()
+                next_report = time.time() + STATUS_INTERVAL
+            time.sleep(POLL_INTERVAL)
+
+    def stop_all(self) -> None:
+        for worker in self.workers:
+            worker.terminate()
+        for worker in self.workers:
+            worker.wait()
+
+    def request_stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def request_restart(self, signum, frame) -> None:
+        self.restart_requested = True
+
+
+def main() -> None:
+    worker_count = int(os.getenv("WORKERS") or os.cpu_count() or 1)
+    shard_count = int(os.getenv("SHARD_COUNT") or worker_count)
+    heartbeat_dir = os.getenv("HEARTBEAT_DIR", DEFAULT_HEARTBEAT_DIR)
+    os.makedirs(heartbeat_dir, exist_ok=True)
+    ranges = shards.shard_ranges(shard_count, worker_count)
+    relay_port = int(os.getenv("RELAY_PORT") or DEFAULT_RELAY_PORT)
+    relay_ports = [relay_port + index for index in range(len(ranges))]
+    relay_token = secrets.token_hex(16)
+
+    launcher = Launcher([
+        Worker(index, shard_ids, shard_count, heartbeat_dir, relay_ports,
+               relay_token)
+        for index, shard_ids in enumerate(ranges)
+    ])
+    signal.signal(signal.SIGTERM, launcher.request_stop)
+    signal.signal(signal.SIGINT, launcher.request_stop)
+    if hasattr(signal, "SIGHUP"):  # not on Windows
+        signal.signal(signal.SIGHUP, launcher.request_restart)
+    log(f"{shard_count} shards over {len(launcher.workers)} workers")
+    try:
+        launcher.start_all()
+        launcher.supervise()
+    finally:
+        log("stopping workers")
+        launcher.stop_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,192 @@
 import discord
 import d20
+import dist
+import dumps
+import functools
+import inline
 import re
+import relay
+import time
+import roller
+import sessions
+import shards
+import signal
 import os
 import json
+import metrics
 import asyncio
+import cost
 import modiphius
-from repository import ConfigRepository, RollHistoryRepository
+import odds
+import simulate
+from collections import namedtuple
+from cache import MISSING, TTLCache
+from history import HistoryRecord, HistorySink, parse_history_query
+from repository import (
+    ConfigRepository, RollHistoryRepository, RollStatsRepository, database
+)
+from stats import format_stats
 from discord.ext import commands
 from dotenv import load_dotenv
 
+STARTED = time.perf_counter()
+
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
 
-intents = discord.Intents.all()
+# "full" requests every intent with discord.py's default caches. "lean"
+# requests only what the handlers use and caches no members, so large guilds
+# are neither chunked at startup nor kept in memory.
+GATEWAY_PROFILE = os.getenv("GATEWAY_PROFILE", "full").lower()
+# Messages kept in discord.py's cache; 0 disables it. Reactions only reach
+# on_reaction_add for cached messages.
+MAX_MESSAGES = os.getenv("MAX_MESSAGES")
 command_prefix = ";;"
 
-bot = commands.Bot(
-    command_prefix=[command_prefix], intents=intents, help_command=None
+# Set by launcher.py: this process runs SHARD_IDS out of SHARD_COUNT shards
+# and reports on them in HEARTBEAT_FILE. SHARD_COUNT alone runs every shard
+# in this one process.
+SHARD_COUNT = os.getenv("SHARD_COUNT")
+SHARD_IDS = os.getenv("SHARD_IDS")
+HEARTBEAT_FILE = os.getenv("HEARTBEAT_FILE")
+# Also set by launcher.py. DMs only reach the worker running shard 0, so 📝
+# edit replies are forwarded between workers over these local ports.
+EDIT_RELAY_PORT = os.getenv("EDIT_RELAY_PORT")
+EDIT_RELAY_PEERS = [
+    int(port) for port in os.getenv("EDIT_RELAY_PEERS", "").split(",")
+    if port
+]
+EDIT_RELAY_TOKEN = os.getenv("EDIT_RELAY_TOKEN", "")
+
+
+def gateway_options(profile: str, max_messages: str = None) -> dict:
+    """Keyword arguments for the bot's constructor for ``profile``."""
+    if profile == "full":
+        options = {"intents": discord.Intents.all()}
+    elif profile == "lean":
+        options = {
+            "intents": discord.Intents(
+                guilds=True,  # channel and thread cache, bot.guilds
+                guild_messages=True,
+                message_content=True,
+                guild_reactions=True,
+                webhooks=True,
+                dm_messages=True,  # replies to 📝 edit sessions
+            ),
+            "member_cache_flags": discord.MemberCacheFlags.none(),
+            "chunk_guilds_at_startup": False,
+        }
+    else:
+        raise ValueError(
+            f"GATEWAY_PROFILE must be 'full' or 'lean', not {profile!r}"
+        )
+    if max_messages:
+        options["max_messages"] = int(max_messages) or None
+    return options
+
+
+def shard_options(shard_count: str = None, shard_ids: str = None) -> dict:
+    options = {}
+    if shard_count:
+        options["shard_count"] = int(shard_count)
+    if shard_ids:
+        options["shard_ids"] = shards.parse_shard_ids(shard_ids)
+    return options
+
+
+# Seconds since STARTED at which the gateway connected and became ready,
+# and the RSS at ready; filled in once, by the first connect and ready.
+startup = {}
+
+# Roll history is queued here and written in batches off the event loop.
+history_sink = HistorySink()
+
+# Optional metrics exposition: a local Prometheus endpoint and/or a file
+# rewritten every METRICS_FILE_INTERVAL seconds.
+METRICS_PORT = os.getenv("METRICS_PORT")
+METRICS_FILE = os.getenv("METRICS_FILE")
+METRICS_FILE_INTERVAL = 15
+
+
+async def write_metrics_file(path: str) -> None:
+    while True:
+        await asyncio.to_thread(metrics.write_file, path)
+        await asyncio.sleep(METRICS_FILE_INTERVAL)
+
+
+async def write_heartbeats(path: str) -> None:
+    while True:
+        await asyncio.to_thread(
+            shards.write_heartbeat, path, bot.is_ready(), len(bot.guilds),
+            shard_health(), metrics.resident_memory(),
+        )
+        await asyncio.sleep(shards.HEARTBEAT_INTERVAL)
+
+
+class InlineRollerBot(
+    commands.AutoShardedBot if SHARD_COUNT or SHARD_IDS else commands.Bot
+):
+    async def setup_hook(self):
+        try:
+            # The launcher stops workers with SIGTERM; close cleanly so
+            # queued history is written.
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGTERM, lambda: asyncio.create_task(self.close())
+            )
+        except NotImplementedError:  # Windows
+            pass
+        history_sink.start()
+        metrics.install_rate_limit_counter()
+        if METRICS_PORT:
+            metrics.serve(int(METRICS_PORT))
+        if METRICS_FILE:
+            asyncio.create_task(write_metrics_file(METRICS_FILE))
+        if HEARTBEAT_FILE:
+            asyncio.create_task(write_heartbeats(HEARTBEAT_FILE))
+        if EDIT_RELAY_PORT:
+            await relay.serve(
+                int(EDIT_RELAY_PORT), edit_sessions.route, EDIT_RELAY_TOKEN
+            )
+
+    async def on_connect(self):
+        startup.setdefault("connect", time.perf_counter() - STARTED)
+
+    async def on_error(self, event_method, *args, **kwargs):
+        metrics.inc("errors_total", event=event_method)
+        await super().on_error(event_method, *args, **kwargs)
+
+    async def close(self):
+        await history_sink.close()  # don't lose rolls queued at shutdown
+        simulate.shutdown()
+        edit_sessions.cancel_all()
+        await super().close()
+
+
+bot = InlineRollerBot(
+    command_prefix=[command_prefix], help_command=None,
+    **gateway_options(GATEWAY_PROFILE, MAX_MESSAGES),
+    **shard_options(SHARD_COUNT, SHARD_IDS),
 )
 
 
+def shard_health() -> list:
+    """``(shard id, latency in seconds, open)`` for each shard we run."""
+    if isinstance(bot, commands.AutoShardedBot):
+        return [
+            (shard_id, shard.latency, not shard.is_closed())
+            for shard_id, shard in sorted(bot.shards.items())
+        ]
+    return [(bot.shard_id or 0, bot.latency, not bot.is_closed())]
+
+
 # Default server config; also the shape every stored config is normalised to.
-DEFAULT_CONFIG = {"dump_channel_id": 0, "thread_dump_target": "dump_channel"}
+DEFAULT_CONFIG = {
+    "dump_channel_id": 0,
+    "thread_dump_target": "dump_channel",
+    "roll_limit_dice": 100,
+    "roll_limit_mode": cost.SUMMARY,
+    "coalesce_dumps": False,
+}
 
 # thread_dump_target value -> human label shown in the settings embed.
 THREAD_TARGET_LABELS = {
@@ -29,21 +194,139 @@ THREAD_TARGET_LABELS = {
     "parent_channel": "Parent channel",
 }
 
+# roll_limit_mode value -> human label shown in the settings embed.
+ROLL_LIMIT_MODE_LABELS = {
+    cost.SUMMARY: "Show totals only",
+    cost.REJECT: "Refuse the roll",
+}
 
-def load_server_config(guild_id) -> dict:
-    """Return this guild's config merged over ``DEFAULT_CONFIG``."""
-    row = ConfigRepository().get_config(guild_id)
-    if row is None:
-        return dict(DEFAULT_CONFIG)
-    stored = json.loads(row[0])
+# Choices offered for roll_limit_dice.
+ROLL_LIMIT_DICE_CHOICES = [20, 50, 100, 250, 1000]
+
+# coalesce_dumps value -> human label shown in the settings embed.
+COALESCE_LABELS = {
+    False: "One per roll",
+    True: "Combined during bursts",
+}
+
+# Dump posts for guilds with coalesce_dumps on go through here.
+dump_coalescer = dumps.DumpCoalescer()
+
+# Open 📝 edits waiting for the user's DM with the new text.
+edit_sessions = sessions.EditSessionManager()
+
+TUPPERBOX_WEBHOOK_NAME = "Tupperhook"
+TUPPERBOX_USER_ID = 431544605209788416
+# Tupperbox's reply to a ``tul!edit`` of one of our proxies; we delete it.
+TUPPER_EDIT_ERROR = (
+    "That message doesn't seem to be a proxy sent with Tupperbox."
+)
+
+# channel id -> number of tul!edit commands there still expecting Tupperbox's
+# error. on_message checks every message against this with one lookup;
+# a channel's count expires TUPPER_EDIT_ERROR_TTL after its latest tul!edit.
+TUPPER_EDIT_ERROR_TTL = 10
+tupper_edit_errors = TTLCache(maxsize=1024, ttl=TUPPER_EDIT_ERROR_TTL)
+
+# What we remember about a classified webhook. ``webhook`` is only kept for
+# the bot's own hook, since that is the one we edit and delete through.
+WebhookInfo = namedtuple("WebhookInfo", ["name", "owner_id", "webhook"])
+
+# webhook id -> WebhookInfo, or None for webhooks we never act on.
+webhook_identities = TTLCache(maxsize=4096, ttl=6 * 60 * 60)
+# Deleted/forbidden webhooks are retried sooner in case permissions change.
+WEBHOOK_NEGATIVE_TTL = 10 * 60
+
+# channel id -> the bot's own Webhook in that channel.
+channel_webhooks = TTLCache(maxsize=2048)
+# channel id -> in-flight webhook lookup for that channel.
+_webhook_lookups = {}
+# channel id -> why the last lookup there came back empty: None if the
+# channel has no webhook of ours, or the HTTPException it failed with. Kept
+# briefly so background warm-ups and rolls don't re-list webhooks (a
+# rate-limited call) for every message in such a channel.
+WEBHOOK_MISS_TTL = 60
+webhook_misses = TTLCache(maxsize=2048, ttl=WEBHOOK_MISS_TTL)
+# Background warm-up tasks, referenced until done so they aren't collected.
+_warm_tasks = set()
+# Discord JSON error code for "Unknown Webhook".
+UNKNOWN_WEBHOOK = 10015
+
+# channel id -> dump channel resolved over REST, or None if deleted/forbidden.
+dump_channels = TTLCache(maxsize=1024, ttl=60 * 60)
+DUMP_CHANNEL_NEGATIVE_TTL = 10 * 60
+
+
+# guild id -> normalised config. Bulk-loaded in on_ready and written through
+# by SettingsView, so the roll path reads config without touching SQLite.
+server_configs = {}
+
+
+def _normalise_config(stored: dict) -> dict:
     return {
         "dump_channel_id": int(stored.get("dump_channel_id", 0) or 0),
         "thread_dump_target": stored.get(
             "thread_dump_target", DEFAULT_CONFIG["thread_dump_target"]
         ),
+        "roll_limit_dice": int(stored.get(
+            "roll_limit_dice", DEFAULT_CONFIG["roll_limit_dice"]
+        )),
+        "roll_limit_mode": stored.get(
+            "roll_limit_mode", DEFAULT_CONFIG["roll_limit_mode"]
+        ),
+        "coalesce_dumps": bool(stored.get(
+            "coalesce_dumps", DEFAULT_CONFIG["coalesce_dumps"]
+        )),
     }
 
 
+def load_all_server_configs(guild_ids=()) -> None:
+    """Refill ``server_configs`` with one query.
+
+    Guilds in ``guild_ids`` without a stored row get the defaults, so later
+    lookups for them are cache hits as well.
+    """
+    server_configs.clear()
+    for guild_id, raw in ConfigRepository().get_all_configs():
+        server_configs[int(guild_id)] = _normalise_config(json.loads(raw))
+    for guild_id in guild_ids:
+        server_configs.setdefault(guild_id, dict(DEFAULT_CONFIG))
+
+
+def load_server_config(guild_id) -> dict:
+    """Return this guild's config merged over ``DEFAULT_CONFIG``.
+
+    The dict is shared with the cache; copy it before modifying.
+    """
+    config = server_configs.get(guild_id)
+    if config is None:
+        row = ConfigRepository().get_config(guild_id)
+        if row is None:
+            config = dict(DEFAULT_CONFIG)
+        else:
+            config = _normalise_config(json.loads(row[0]))
+        server_configs[guild_id] = config
+    return config
+
+
+async def save_server_config(guild_id, config: dict) -> None:
+    """Persist ``config`` and update the cache in the same step."""
+    await asyncio.to_thread(ConfigRepository().set_config, guild_id, config)
+    previous = server_configs.get(guild_id)
+    if previous is not None:
+        dump_channels.pop(previous["dump_channel_id"])
+    dump_channels.pop(config["dump_channel_id"])
+    server_configs[guild_id] = dict(config)
+
+
+def invalidate_server_config(guild_id=None) -> None:
+    """Drop one guild's cached config (or all of them) so it is re-read."""
+    if guild_id is None:
+        server_configs.clear()
+    else:
+        server_configs.pop(guild_id, None)
+
+
 class SettingsView(discord.ui.View):
     """Interactive settings panel.
 
@@ -59,6 +342,7 @@ class SettingsView(discord.ui.View):
         self.saved = dict(saved)
         self.pending = dict(saved)
         self.message = None  # set by the command once the panel is sent
+        self._sync_coalesce_button()
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         if interaction.user.id != self.author_id:
@@ -81,6 +365,13 @@ class SettingsView(discord.ui.View):
         channel_id = config["dump_channel_id"]
         return f"<#{channel_id}>" if channel_id else "*Not set*"
 
+    @staticmethod
+    def _roll_limit_str(config: dict) -> str:
+        return (
+            f"Over {config['roll_limit_dice']} dice: "
+            f"{ROLL_LIMIT_MODE_LABELS[config['roll_limit_mode']]}"
+        )
+
     def build_embed(self, note: str = None) -> discord.Embed:
         embed = discord.Embed(
             title="⚙️ Inline Roller Settings",
@@ -96,6 +387,16 @@ class SettingsView(discord.ui.View):
             value=THREAD_TARGET_LABELS[self.saved["thread_dump_target"]],
             inline=True,
         )
+        embed.add_field(
+            name="Large rolls",
+            value=self._roll_limit_str(self.saved),
+            inline=False,
+        )
+        embed.add_field(
+            name="Dump posts",
+            value=COALESCE_LABELS[self.saved["coalesce_dumps"]],
+            inline=False,
+        )
         if self.pending != self.saved:
             lines = []
             if self.pending["dump_channel_id"] != self.saved["dump_channel_id"]:
@@ -108,6 +409,18 @@ class SettingsView(discord.ui.View):
                     "• Thread rolls → "
                     f"{THREAD_TARGET_LABELS[self.pending['thread_dump_target']]}"
                 )
+            if (self.pending["roll_limit_dice"],
+                    self.pending["roll_limit_mode"]) != \
+                    (self.saved["roll_limit_dice"],
+                     self.saved["roll_limit_mode"]):
+                lines.append(
+                    f"• Large rolls → {self._roll_limit_str(self.pending)}"
+                )
+            if self.pending["coalesce_dumps"] != self.saved["coalesce_dumps"]:
+                lines.append(
+                    "• Dump posts → "
+                    f"{COALESCE_LABELS[self.pending['coalesce_dumps']]}"
+                )
             embed.add_field(
                 name="⚠️ Unsaved changes",
                 value="\n".join(lines) + "\n**Click Save to apply.**",
@@ -117,8 +430,13 @@ class SettingsView(discord.ui.View):
             embed.set_footer(text=note)
         return embed
 
+    def _sync_coalesce_button(self):
+        state = "on" if self.pending["coalesce_dumps"] else "off"
+        self.coalesce_button.label = f"Combine dump posts: {state}"
+
     async def _refresh(self, interaction: discord.Interaction,
                        note: str = None):
+        self._sync_coalesce_button()
         await interaction.response.edit_message(
             embed=self.build_embed(note), view=self
         )
@@ -157,19 +475,51 @@ class SettingsView(discord.ui.View):
         self.pending["thread_dump_target"] = select.values[0]
         await self._refresh(interaction)
 
-    @discord.ui.button(label="Save", style=discord.ButtonStyle.success, row=2)
+    @discord.ui.select(
+        placeholder="Rolls over the dice limit…",
+        min_values=1,
+        max_values=1,
+        row=2,
+        options=[
+            discord.SelectOption(
+                label="Show totals only", value=cost.SUMMARY,
+                description="Roll it, but skip the individual dice."
+            ),
+            discord.SelectOption(
+                label="Refuse the roll", value=cost.REJECT,
+                description="Leave a note instead of rolling."
+            ),
+        ],
+    )
+    async def roll_limit_mode_select(self, interaction: discord.Interaction,
+                                     select: discord.ui.Select):
+        self.pending["roll_limit_mode"] = select.values[0]
+        await self._refresh(interaction)
+
+    @discord.ui.select(
+        placeholder="Dice limit per roll…",
+        min_values=1,
+        max_values=1,
+        row=3,
+        options=[
+            discord.SelectOption(label=f"{dice} dice", value=str(dice))
+            for dice in ROLL_LIMIT_DICE_CHOICES
+        ],
+    )
+    async def roll_limit_dice_select(self, interaction: discord.Interaction,
+                                     select: discord.ui.Select):
+        self.pending["roll_limit_dice"] = int(select.values[0])
+        await self._refresh(interaction)
+
+    @discord.ui.button(label="Save", style=discord.ButtonStyle.success, row=4)
     async def save_button(self, interaction: discord.Interaction,
                           button: discord.ui.Button):
-        ConfigRepository().set_config(
-            self.guild_id,
-            self.pending["dump_channel_id"],
-            self.pending["thread_dump_target"],
-        )
+        await save_server_config(self.guild_id, self.pending)
         self.saved = dict(self.pending)
         await self._refresh(interaction, note="✅ Settings saved.")
 
     @discord.ui.button(
-        label="Reset to defaults", style=discord.ButtonStyle.secondary, row=2
+        label="Reset to defaults", style=discord.ButtonStyle.secondary, row=4
     )
     async def reset_button(self, interaction: discord.Interaction,
                            button: discord.ui.Button):
@@ -178,6 +528,14 @@ class SettingsView(discord.ui.View):
             interaction, note="Defaults staged — click Save to apply."
         )
 
+    @discord.ui.button(
+        label="Combine dump posts", style=discord.ButtonStyle.secondary, row=4
+    )
+    async def coalesce_button(self, interaction: discord.Interaction,
+                              button: discord.ui.Button):
+        self.pending["coalesce_dumps"] = not self.pending["coalesce_dumps"]
+        await self._refresh(interaction)
+
     async def on_timeout(self):
         for child in self.children:
             child.disabled = True
@@ -207,6 +565,294 @@ async def settings_error(ctx, error):
         await ctx.send("This command only works inside a server.")
 
 
+HISTORY_PAGE_SIZE = 10
+
+
+def _shorten(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class HistoryView(discord.ui.View):
+    """Paged ``;;history`` results.
+
+    Pages are fetched on demand with keyset cursors: ``cursors[i]`` is the
+    ``before`` value that produced page ``i``, so paging back is a pop and
+    no page ever re-reads the rows in front of it.
+    """
+
+    def __init__(self, guild_id: int, author_id: int, filters: dict):
+        super().__init__(timeout=180)
+        self.guild_id = guild_id
+        self.author_id = author_id
+        self.filters = filters
+        self.cursors = [None]
+        self.rows = []
+        self.message = None  # set by the command once the panel is sent
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message(
+                f"Run `{command_prefix}history` yourself to browse rolls.",
+                ephemeral=True,
+            )
+            return False
+        return True
+
+    async def load(self):
+        # One extra row tells us whether an older page exists.
+        rows = await asyncio.to_thread(
+            RollHistoryRepository().get_history_page,
+            self.guild_id,
+            before=self.cursors[-1],
+            limit=HISTORY_PAGE_SIZE + 1,
+            **self.filters,
+        )
+        self.rows = rows[:HISTORY_PAGE_SIZE]
+        self.newer_button.disabled = len(self.cursors) == 1
+        self.older_button.disabled = len(rows) <= HISTORY_PAGE_SIZE
+
+    def build_embed(self) -> discord.Embed:
+        embed = discord.Embed(
+            title="📜 Roll History",
+            color=discord.Color.blurple(),
+        )
+        lines = []
+        for row in self.rows:
+            _, created_at, character, dice_roll, result, room, channel_id = row
+            when = f"<t:{created_at}:R>" if created_at else "*a while ago*"
+            where = f"<#{channel_id}>" if channel_id else f"#{room}"
+            lines.append(
+                f"{when} **{character}** in {where}\n"
+                f"`{dice_roll}` → {_shorten(result, 150)}"
+            )
+        embed.description = "\n".join(lines) or "No rolls found."
+        embed.set_footer(text=f"Page {len(self.cursors)}")
+        return embed
+
+    async def _show(self, interaction: discord.Interaction):
+        await self.load()
+        await interaction.response.edit_message(
+            embed=self.build_embed(), view=self
+        )
+
+    @discord.ui.button(label="◀ Newer", style=discord.ButtonStyle.secondary)
+    async def newer_button(self, interaction: discord.Interaction,
+                           button: discord.ui.Button):
+        self.cursors.pop()
+        await self._show(interaction)
+
+    @discord.ui.button(label="Older ▶", style=discord.ButtonStyle.secondary)
+    async def older_button(self, interaction: discord.Interaction,
+                           button: discord.ui.Button):
+        last_id, last_created_at = self.rows[-1][0], self.rows[-1][1]
+        self.cursors.append((last_created_at, last_id))
+        await self._show(interaction)
+
+    async def on_timeout(self):
+        for child in self.children:
+            child.disabled = True
+        if self.message is not None:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
+
+@bot.command(name="history")
+@commands.guild_only()
+async def history_command(ctx, *, query: str = ""):
+    try:
+        filters = parse_history_query(query)
+    except ValueError as error:
+        await ctx.send(str(error))
+        return
+    view = HistoryView(ctx.guild.id, ctx.author.id, filters)
+    await view.load()
+    view.message = await ctx.send(embed=view.build_embed(), view=view)
+
+
+@history_command.error
+async def history_error(ctx, error):
+    if isinstance(error, commands.NoPrivateMessage):
+        await ctx.send("This command only works inside a server.")
+
+
+@bot.command(name="stats")
+@commands.guild_only()
+async def stats_command(ctx, *, character: str = None):
+    totals = await asyncio.to_thread(
+        RollStatsRepository().get_stats, ctx.guild.id, character
+    )
+    if totals is None:
+        who = f"**{character}**" if character else "this server"
+        await ctx.send(f"No rolls recorded for {who} yet.")
+        return
+    title = totals["character_name"] or ctx.guild.name
+    embed = discord.Embed(
+        title=f"📊 Roll stats — {title}",
+        color=discord.Color.gold(),
+    )
+    for name, value in format_stats(totals):
+        embed.add_field(name=name, value=value, inline=True)
+    await ctx.send(embed=embed)
+
+
+@stats_command.error
+async def stats_error(ctx, error):
+    if isinstance(error, commands.NoPrivateMessage):
+        await ctx.send("This command only works inside a server.")
+
+
+@bot.command(name="odds")
+async def odds_command(ctx, *, expr: str = ""):
+    test = modiphius.parse_test(expr)
+    if test is None:
+        await ctx.send(
+            f"Usage: `{command_prefix}odds <n>d20 t<TN> f<focus> c<range>` "
+            f"— e.g. `{command_prefix}odds 3d20f3t12c1`"
+        )
+        return
+    if test["count"] > odds.MAX_ODDS_DICE:
+        await ctx.send(f"I can only work out odds for up to "
+                       f"{odds.MAX_ODDS_DICE} dice.")
+        return
+    result = odds.test_odds(
+        test["count"], test["focus"], test["target"], test["comp"]
+    )
+    embed = discord.Embed(
+        title=f"🎲 Odds for `{expr.strip()}`",
+        description=modiphius._test_decode(
+            test["count"], test["focus"], test["target"], test["comp"]
+        ),
+        color=discord.Color.gold(),
+    )
+    for name, value in odds.format_odds(result):
+        embed.add_field(name=name, value=value, inline=True)
+    await ctx.send(embed=embed)
+
+
+@bot.command(name="dist")
+async def dist_command(ctx, *, expr: str = ""):
+    if not expr.strip():
+        await ctx.send(f"Usage: `{command_prefix}dist <dice>` — "
+                       f"e.g. `{command_prefix}dist 4d6kh3+2`")
+        return
+    try:
+        parsed = d20.parse(expr, allow_comments=True)
+        # Solving can take a moment for big pools; keep the loop free.
+        analysis = await asyncio.to_thread(dist.analyze, parsed)
+    except d20.RollSyntaxError as error:
+        await ctx.send(f"Couldn't parse that roll: {error}")
+        return
+    except dist.DistError as error:
+        await ctx.send(str(error))
+        return
+    embed = discord.Embed(
+        title=f"📈 Distribution of `{expr.strip()}`",
+        color=discord.Color.gold(),
+    )
+    for name, value in dist.format_analysis(analysis):
+        embed.add_field(name=name, value=value, inline=False)
+    await ctx.send(embed=embed)
+
+
+# Only one simulation at a time; each already uses every core.
+simulation_lock = asyncio.Lock()
+
+
+@bot.command(name="sim")
+async def sim_command(ctx, *, args: str = ""):
+    if not args.strip():
+        await ctx.send(f"Usage: `{command_prefix}sim <dice> [samples]` — "
+                       f"e.g. `{command_prefix}sim 8d6e6 1000000`")
+        return
+    expr, samples = simulate.split_sim_args(args)
+    if simulation_lock.locked():
+        await ctx.send("A simulation is already running, try again shortly.")
+        return
+    async with simulation_lock:
+        try:
+            async with ctx.typing():
+                result = await simulate.simulate_async(expr, samples)
+        except d20.RollSyntaxError as error:
+            await ctx.send(f"Couldn't parse that roll: {error}")
+            return
+        except d20.RollError as error:  # e.g. TooManyRolls from a worker
+            await ctx.send(f"Couldn't roll that: {error}")
+            return
+        except ValueError as error:
+            await ctx.send(str(error))
+            return
+    embed = discord.Embed(
+        title=f"🎲 Simulation of `{expr}`",
+        color=discord.Color.gold(),
+    )
+    for name, value in simulate.format_result(result):
+        embed.add_field(name=name, value=value, inline=False)
+    await ctx.send(embed=embed)
+
+
+@bot.command(name="perf")
+@commands.is_owner()
+async def perf_command(ctx):
+    embed = discord.Embed(
+        title="⏱️ Stage latency",
+        color=discord.Color.dark_grey(),
+    )
+    rows = metrics.summary()[:20]
+    lines = [
+        f"`{stage}` ×{count} · p50 {p50 * 1000:.1f} · "
+        f"p95 {p95 * 1000:.1f} · p99 {p99 * 1000:.1f} ms"
+        for stage, count, p50, p95, p99 in rows
+    ]
+    embed.description = "\n".join(lines) or "Nothing recorded yet."
+    counters = [
+        f"`{name}` {value}" for name, value in metrics.counter_values().items()
+    ]
+    if counters:
+        embed.add_field(
+            name="Counters", value=_shorten("\n".join(counters), 1024),
+            inline=False,
+        )
+    sink = history_sink.stats()
+    embed.add_field(
+        name="History queue",
+        value=" · ".join(f"{key} {value}" for key, value in sink.items()),
+        inline=False,
+    )
+    if "ready" in startup:
+        embed.add_field(
+            name="Startup",
+            value=f"{startup_report()}\n"
+                  f"RSS now {metrics.resident_memory() / 2**20:.0f} MiB",
+            inline=False,
+        )
+    embed.add_field(
+        name="Shards",
+        value=", ".join(
+            f"{shard_id}: {latency * 1000:.0f} ms" if is_open
+            else f"{shard_id}: closed"
+            for shard_id, latency, is_open in shard_health()
+        ),
+        inline=False,
+    )
+    coalesced = dump_coalescer.stats()
+    embed.add_field(
+        name="Combined dump posts",
+        value=" · ".join(
+            f"{key} {value}" for key, value in coalesced.items()
+        ),
+        inline=False,
+    )
+    await ctx.send(embed=embed)
+
+
+@perf_command.error
+async def perf_error(ctx, error):
+    if isinstance(error, commands.NotOwner):
+        await ctx.send("Only the bot owner can use this.")
+
+
 def build_help_embed() -> discord.Embed:
     embed = discord.Embed(
         title="Inline Roller — Help",
@@ -255,8 +901,14 @@ def build_help_embed() -> discord.Embed:
     embed.add_field(
         name="Commands",
         value=(
-            f"`{command_prefix}settings` — set the dump channel & thread "
-            "behavior *(Manage Server)*\n"
+            f"`{command_prefix}settings` — set the dump channel, thread "
+            "behavior, roll limits & dump posts *(Manage Server)*\n"
+            f"`{command_prefix}history [character] [#channel] "
+            "[since:7d] [until:2024-05-01]` — browse past rolls\n"
+            f"`{command_prefix}stats [character]` — roll statistics\n"
+            f"`{command_prefix}odds 3d20f3t12c1` — exact odds for a test\n"
+            f"`{command_prefix}dist 4d6kh3+2` — exact odds for a roll\n"
+            f"`{command_prefix}sim 8d6e6 [samples]` — simulate any roll\n"
             f"`{command_prefix}help` — show this message"
         ),
         inline=False,
@@ -271,7 +923,22 @@ async def help_command(ctx):
 
 @bot.event
 async def on_ready():
+    load_all_server_configs(guild.id for guild in bot.guilds)
     print("We have logged in as {0.user}".format(bot))
+    if "ready" not in startup:
+        startup["ready"] = time.perf_counter() - STARTED
+        startup["rss"] = metrics.resident_memory()
+        print(startup_report())
+
+
+def startup_report() -> str:
+    connect = startup.get("connect", 0.0)
+    return (
+        f"Gateway profile {GATEWAY_PROFILE}: connected "
+        f"{connect:.1f}s after start, ready {startup['ready'] - connect:.1f}s "
+        f"later with {len(bot.guilds)} guilds; "
+        f"RSS {startup['rss'] / 2**20:.0f} MiB"
+    )
 
 
 @bot.event
@@ -282,12 +949,14 @@ async def on_reaction_add(reaction, user):
         return
     if reaction.emoji not in ["❌", "📝"]:
         return
-    webhook_name = f"{bot.application.name}hook"
-    webhook = await bot.fetch_webhook(reaction.message.webhook_id)
-    if webhook.name != webhook_name:
+    with metrics.timed("reaction.webhook_info"):
+        info = await fetch_webhook_info(reaction.message.webhook_id)
+    if info is None or info.name != own_webhook_name():
         return
+    webhook = info.webhook
     if reaction.emoji == "❌":
-        await delete_reaction_message(reaction, user, webhook)
+        with metrics.timed("reaction.delete"):
+            await delete_reaction_message(reaction, user, webhook)
         return
     if reaction.emoji == "📝":
         await edit_reaction_message(reaction, user, webhook)
@@ -296,16 +965,40 @@ async def on_reaction_add(reaction, user):
 
 @bot.event
 async def on_message(message):
+    if claim_tupper_edit_error(message):
+        await message.delete()
+        return
+    if message.guild is None and not message.author.bot:
+        if edit_sessions.route(message.author.id, message):
+            return  # the new text for a 📝 edit
+        # Sharded: the session may be in a worker that never sees DMs.
+        if EDIT_RELAY_PEERS and await relay.forward(
+                EDIT_RELAY_PEERS, EDIT_RELAY_TOKEN, message.author.id,
+                message.content):
+            return
     await bot.process_commands(message)
     await edit_by_tul_edit(message)
     if not hasattr(message, "webhook_id") or message.webhook_id is None:
         return
-    webhook = await bot.fetch_webhook(message.webhook_id)
-    if webhook.name != "Tupperhook":
+    started = time.perf_counter()
+    with metrics.timed("message.webhook_info"):
+        info = await fetch_webhook_info(message.webhook_id)
+    if info is None or info.name != TUPPERBOX_WEBHOOK_NAME:
         return
 
+    channel = message.channel
+    thread = None
+    if getattr(message.channel, "parent", None) is not None:
+        channel = message.channel.parent  # webhook posts to the parent
+        thread = message.channel
+
     content = message.content
-    inline_rolls = find_inline_roll(content)
+    inline_rolls = inline.scan(content)
+    # Only the final proxied send needs our webhook, so its lookup starts
+    # now and overlaps config, dump-channel resolution, rolling and the dump
+    # send; send_by_webhook then joins the in-flight lookup. Until the roll
+    # is known to go ahead this only finds an existing webhook.
+    warm_channel_webhook(channel)
     if len(inline_rolls) == 0:
         return
     display_name = message.author.display_name
@@ -316,17 +1009,19 @@ async def on_message(message):
     dump_channel_id = config["dump_channel_id"]
     thread_target = config["thread_dump_target"]
 
-    channel = message.channel
-    thread = None
-    if getattr(message.channel, "parent", None) is not None:
-        channel = message.channel.parent  # webhook posts to the parent
-        thread = message.channel
-
     # Resolve where the full-result dump is sent.
     if thread is not None and thread_target == "parent_channel":
         dump_channel = channel  # the thread's parent
     elif dump_channel_id:
-        dump_channel = await bot.fetch_channel(dump_channel_id)
+        with metrics.timed("message.dump_channel"):
+            dump_channel = await resolve_dump_channel(dump_channel_id)
+        if dump_channel is None:
+            await message.channel.send(
+                "I can't find or access the dump channel " +
+                f"<#{dump_channel_id}>.\n" +
+                f"Use `{command_prefix}settings` to pick another one."
+            )
+            return
     elif thread is not None:
         dump_channel = channel  # no dump channel set -> fall back to parent
     else:
@@ -336,27 +1031,50 @@ async def on_message(message):
             f"Use `{command_prefix}settings` to configure it."
         )
         return
+    # The roll will be sent, so a missing webhook may now be created.
+    warm_channel_webhook(channel, create=True)
 
-    webhook = await create_webhook_by_channel(channel, bot.application.name)
-
+    rolling = time.perf_counter()
     result_texts = []
+    replacements = []
     histories_list = []
-    for inline_roll in inline_rolls:
-        modiphius_result = modiphius.roll(inline_roll)
-        if modiphius_result is not None:
-            result_texts.append(modiphius_result["full_text"])
-            content = content.replace(
-                f"[[{inline_roll}]]", modiphius_result["inline"], 1
+    for span in inline_rolls:
+        inline_roll = span.expression
+        parsed = roller.parse(inline_roll)
+        admission = cost.admit(
+            parsed.kind, parsed.cost,
+            config["roll_limit_dice"], config["roll_limit_mode"]
+        )
+        metrics.inc("rolls_total", kind=parsed.kind)
+        if admission != cost.FULL:
+            metrics.inc("rolls_limited_total", action=admission)
+        if admission == cost.REJECT:
+            result_texts.append(
+                f"⛔ `{inline_roll.strip()}` was not rolled: it is over "
+                f"this server's limit of {config['roll_limit_dice']} dice."
             )
-            histories_list.append({
-                "message": message,
-                "modiphius": modiphius_result,
-                "command": inline_roll
-            })
+            replacements.append("【 ⛔ 】")
             continue
-        result = d20.roll(inline_roll, allow_comments=True)
-        result_text = f"{result.comment}: {result}" if result.comment else \
-            str(result)
+        summary = admission == cost.SUMMARY
+        if parsed.kind != "d20":
+            modiphius_result = roller.roll_modiphius(
+                inline_roll, parsed, summary
+            )
+            result_texts.append(modiphius_result["full_text"])
+            replacements.append(modiphius_result["inline"])
+            histories_list.append(modiphius_history_record(
+                message, modiphius_result, inline_roll
+            ))
+            continue
+        result = roller.roll_d20(parsed, summary)
+        if summary:
+            result_text = f"{_roll_command(inline_roll, result)} = " \
+                f"`{result.total}` *(breakdown not shown)*"
+            if result.comment:
+                result_text = f"{result.comment}: {result_text}"
+        else:
+            result_text = f"{result.comment}: {result}" \
+                if result.comment else str(result)
         result_texts.append(result_text)
         crit = ""
         if result.crit == 2:
@@ -367,44 +1085,211 @@ async def on_message(message):
             pass
         comment = f" {result.comment}" if result.comment else ""
         inline_replacement = f"【 {result.total}{crit}{comment} 】"
-        content = content.replace(f"[[{inline_roll}]]", inline_replacement, 1)
-        histories_list.append({
-            "message": message,
-            "d20_roll": result,
-            "command": inline_roll
-        })
+        replacements.append(inline_replacement)
+        histories_list.append(roll_history_record(
+            message, result, inline_roll, summary
+        ))
+    content = inline.splice(content, inline_rolls, replacements)
     full_result = '\n'.join(result_texts)
-    asyncio.create_task(insert_roll_histories(histories_list))
+    metrics.observe("message.roll", time.perf_counter() - rolling)
+    with metrics.timed("message.history_queue"):
+        for history in histories_list:
+            await history_sink.submit(history)
 
-    dump_message = await dump_channel.send(
-        f"**{display_name}** in {channel_mention}:" + "\n" +
+    dump_text = f"**{display_name}** in {channel_mention}:" + "\n" + \
         full_result
-    )
+    with metrics.timed("message.dump_send"):
+        if config["coalesce_dumps"]:
+            # Rolls arriving while this channel is busy share one post.
+            dump_message = await dump_coalescer.post(dump_channel, dump_text)
+        else:
+            dump_message = await dump_channel.send(dump_text)
 
     dump_message_url = f"[`🔻`]({dump_message.jump_url})"
     content = f"{content} {dump_message_url}"
 
-    if thread is not None:
-        await send_to_thread_by_webhook(
-            thread, content, avatar, display_name, webhook
-        )
-    else:
-        await send_to_channel_by_webhook(
-            content, avatar, display_name, webhook
+    # The proxied send and deleting the original don't depend on each other.
+    with metrics.timed("message.proxy_send"):
+        sent, deleted = await asyncio.gather(
+            send_by_webhook(channel, thread, content, avatar, display_name),
+            message.delete(),
+            return_exceptions=True,
         )
+    if isinstance(sent, BaseException):
+        if not isinstance(deleted, BaseException):
+            # The original is gone; don't lose the rolled message with it.
+            await message.channel.send(f"**{display_name}**: {content}")
+        raise sent
+    if isinstance(deleted, BaseException):
+        raise deleted
+    metrics.observe("message.total", time.perf_counter() - started)
+
+
+async def resolve_dump_channel(channel_id: int):
+    """Return the channel for ``channel_id``, or None if it is unusable.
+
+    The gateway cache is tried first; channels it doesn't hold are fetched
+    once and remembered in ``dump_channels``. Deleted or forbidden channels
+    are remembered too, so a stale setting doesn't cost an API call per roll.
+    """
+    channel = bot.get_channel(channel_id)
+    if channel is not None:
+        return channel
+    channel = dump_channels.get(channel_id)
+    if channel is not MISSING:
+        return channel
+    try:
+        channel = await bot.fetch_channel(channel_id)
+    except (discord.NotFound, discord.Forbidden):
+        dump_channels.set(channel_id, None, ttl=DUMP_CHANNEL_NEGATIVE_TTL)
+        return None
+    dump_channels.set(channel_id, channel)
+    return channel
 
-    await message.delete()
+
+def own_webhook_name() -> str:
+    return f"{bot.application.name}hook"
+
+
+async def fetch_webhook_info(webhook_id):
+    """Return the ``WebhookInfo`` for ``webhook_id``, or None to ignore it.
+
+    Results come from ``webhook_identities`` when possible. Only Tupperbox's
+    hook and our own are remembered in full; any other webhook is stored as
+    a negative entry so classifying its next message costs no API call.
+    """
+    info = webhook_identities.get(webhook_id)
+    if info is not MISSING:
+        return info
+    try:
+        webhook = await bot.fetch_webhook(webhook_id)
+    except (discord.NotFound, discord.Forbidden):
+        webhook_identities.set(webhook_id, None, ttl=WEBHOOK_NEGATIVE_TTL)
+        return None
+    if webhook.name not in (TUPPERBOX_WEBHOOK_NAME, own_webhook_name()):
+        webhook_identities.set(webhook_id, None)
+        return None
+    info = WebhookInfo(
+        name=webhook.name,
+        owner_id=webhook.user.id if webhook.user is not None else None,
+        webhook=webhook if webhook.name != TUPPERBOX_WEBHOOK_NAME else None,
+    )
+    webhook_identities.set(webhook_id, info)
+    return info
 
 
 # Create webhook based on bot name and channel.
 # If webhook already exists, return existing webhook.
-async def create_webhook_by_channel(channel, bot_name):
-    webhook_name = f"{bot_name}hook"
-    webhooks = await channel.webhooks()
-    for webhook in webhooks:
-        if webhook.name == webhook_name and webhook.token is not None:
+# With ``create=False`` an existing webhook is only looked up, and None is
+# returned if the channel has none.
+async def create_webhook_by_channel(channel, bot_name, create: bool = True):
+    while True:
+        webhook = channel_webhooks.get(channel.id)
+        if webhook is not MISSING:
+            return webhook
+        miss = webhook_misses.get(channel.id)
+        if isinstance(miss, discord.HTTPException):
+            raise miss
+        if miss is None and not create:
+            return None
+        # Concurrent rolls in a cold channel share a single lookup.
+        lookup = _webhook_lookups.get(channel.id)
+        if lookup is None or lookup.done():
+            lookup = asyncio.ensure_future(
+                _find_or_create_webhook(channel, bot_name, create)
+            )
+            _webhook_lookups[channel.id] = lookup
+            lookup.add_done_callback(
+                functools.partial(_forget_lookup, channel.id)
+            )
+        webhook = await asyncio.shield(lookup)
+        if webhook is not None or not create:
             return webhook
-    return await channel.create_webhook(name=webhook_name)
+        # We joined a look-up-only lookup that found nothing; go again.
+
+
+def _forget_lookup(channel_id: int, lookup) -> None:
+    # A newer lookup may already have replaced this one.
+    if _webhook_lookups.get(channel_id) is lookup:
+        del _webhook_lookups[channel_id]
+
+
+async def _find_or_create_webhook(channel, bot_name, create: bool = True):
+    webhook_name = f"{bot_name}hook"
+    try:
+        webhooks = await channel.webhooks()
+        for webhook in webhooks:
+            if webhook.name == webhook_name and webhook.token is not None:
+                break
+        else:
+            if not create:
+                webhook_misses.set(channel.id, None)
+                return None
+            webhook = await channel.create_webhook(name=webhook_name)
+    except discord.HTTPException as error:
+        webhook_misses.set(channel.id, error)
+        raise
+    webhook_misses.pop(channel.id)
+    channel_webhooks.set(channel.id, webhook)
+    # Reactions and edits on our proxied messages then skip fetch_webhook.
+    webhook_identities.set(
+        webhook.id, WebhookInfo(webhook.name, bot.user.id, webhook)
+    )
+    return webhook
+
+
+def invalidate_channel_webhook(channel_id: int) -> None:
+    webhook = channel_webhooks.pop(channel_id)
+    if webhook is not None:
+        webhook_identities.pop(webhook.id)
+
+
+def warm_channel_webhook(channel, create: bool = False) -> None:
+    """Look up our webhook for ``channel`` in the background if not cached.
+
+    Unless ``create`` is set (a roll is about to be sent), only an existing
+    webhook is looked up: channels with Tupperbox chatter but no rolls
+    shouldn't each get a webhook, since Discord caps them per channel.
+    Channels whose last lookup found nothing are skipped for a while.
+    """
+    if channel.id in channel_webhooks or channel.id in _webhook_lookups:
+        return
+    miss = webhook_misses.get(channel.id, count=False)
+    if miss is not MISSING and (miss is not None or not create):
+        return
+
+    async def warm():
+        try:
+            await create_webhook_by_channel(
+                channel, bot.application.name, create=create
+            )
+        except discord.HTTPException:
+            pass  # the roll itself will surface the error
+
+    task = asyncio.create_task(warm())
+    _warm_tasks.add(task)
+    task.add_done_callback(_warm_tasks.discard)
+
+
+# Send message through our webhook in channel (or thread inside it).
+# A cached webhook that was deleted is dropped and looked up again once.
+async def send_by_webhook(channel, thread, content, avatar, username):
+    for attempt in range(2):
+        webhook = await create_webhook_by_channel(
+            channel, bot.application.name
+        )
+        try:
+            if thread is not None:
+                return await send_to_thread_by_webhook(
+                    thread, content, avatar, username, webhook
+                )
+            return await send_to_channel_by_webhook(
+                content, avatar, username, webhook
+            )
+        except discord.NotFound as error:
+            if error.code != UNKNOWN_WEBHOOK or attempt > 0:
+                raise
+            invalidate_channel_webhook(channel.id)
 
 
 # Send message to channle by webhook
@@ -427,12 +1312,6 @@ async def send_to_thread_by_webhook(thread, content, avatar, username,
     )
 
 
-# Parse any inline rolls notation in content
-def find_inline_roll(content: str):
-    pattern = r'\[\[(.*?)\]\]'
-    return re.findall(pattern=pattern, string=content)
-
-
 async def delete_reaction_message(reaction, user, webhook):
     message = reaction.message
     thread = None
@@ -448,60 +1327,75 @@ async def delete_reaction_message(reaction, user, webhook):
 async def edit_reaction_message(reaction, user, webhook):
     pattern = r" \[`🔻`\]\(https://.*?\)$"
     match = re.findall(pattern, reaction.message.content)
+    if not match:
+        await reaction.clear()  # no dump link: not a roll we proxied
+        return
     to_be_edited = reaction.message.content.replace(match[0], "")
-    await user.send(
-        f"Proxy edited: {reaction.message.jump_url}⁠\n" +
-        "Editing message:"
-    )
-    await user.send(to_be_edited)
-    await user.send("Please send me the new content of the message here:")
-
-    def check_message(m):
-        return m.channel == user.dm_channel and m.author == user
-
+    session = edit_sessions.open(user.id)
+    if session is None:
+        await user.send(
+            f"You already have {edit_sessions.max_per_user} edits waiting "
+            "for new text. Answer one of them (or let it time out) first."
+        )
+        await reaction.clear()
+        return
+    prompt = "Please send me the new content of the message here:"
+    if edit_sessions.open_count(user.id) > 1:
+        prompt += " *(your replies go to your edits in the order you " \
+            "started them)*"
     try:
-        msg = await bot.wait_for('message', check=check_message, timeout=300)
-    except asyncio.TimeoutError:
+        await user.send(
+            f"Proxy edited: {reaction.message.jump_url}⁠\n" +
+            "Editing message:"
+        )
+        await user.send(to_be_edited)
+        await user.send(prompt)
+    except BaseException:
+        session.cancel()  # e.g. the user's DMs are closed
+        raise
+
+    msg = await session
+    if msg is None:
         await user.send("Timed out. Message not edited.")
         await reaction.clear()
         return
-    else:
-        message = reaction.message
-        thread = None
-        if hasattr(message.channel, "parent"):
-            thread = message.channel
+    message = reaction.message
+    thread = None
+    if hasattr(message.channel, "parent"):
+        thread = message.channel
 
-        await reaction.clear()
-        if thread is None:
-            await webhook.edit_message(
-                message.id,
-                content=msg.content + match[0]
-            )
-            return
+    await reaction.clear()
+    if thread is None:
         await webhook.edit_message(
             message.id,
-            content=msg.content + match[0],
-            thread=thread
+            content=msg.content + match[0]
         )
+        return
+    await webhook.edit_message(
+        message.id,
+        content=msg.content + match[0],
+        thread=thread
+    )
 
 
 async def edit_by_tul_edit(message):
     if not message.content.startswith("tul!edit"):
         return
-    await delete_tupper_edit_error(message)
+    # Registered before any await: Tupperbox answers the same command.
+    expect_tupper_edit_error(message.channel.id)
     if message.reference is None:
         return
     if len(message.content.split(" ", 1)) <= 1:
         return
     content = message.content.split(" ", 1)[1]
-    reply_message = await message.channel.fetch_message(
-        message.reference.message_id)
-    if reply_message.webhook_id is None:
+    reply_message = await referenced_message(message)
+    if reply_message is None or reply_message.webhook_id is None:
         return
-    webhook_name = f"{bot.application.name}hook"
-    webhook = await bot.fetch_webhook(reply_message.webhook_id)
-    if webhook.name != webhook_name:
+    with metrics.timed("tul_edit.webhook_info"):
+        info = await fetch_webhook_info(reply_message.webhook_id)
+    if info is None or info.name != own_webhook_name():
         return
+    webhook = info.webhook
     await message.delete()
     pattern = r" \[`🔻`\]\(https://.*?\)$"
     match = re.findall(pattern, reply_message.content)
@@ -522,72 +1416,100 @@ async def edit_by_tul_edit(message):
     )
 
 
-async def delete_tupper_edit_error(message):
-    error = "That message doesn't seem to be a proxy sent with Tupperbox."
-    id = 431544605209788416
+async def referenced_message(message):
+    """The message ``message`` replies to, or None if it was deleted.
 
-    def check(m) -> bool:
-        return m.channel.id == message.channel.id and \
-            m.author.id == id and \
-            m.content == error
-    msg = await bot.wait_for('message', check=check, timeout=10)
-    await msg.delete()
+    Discord usually sends the replied-to message along with the reply, and
+    otherwise it may still be in the message cache; only then is it fetched.
+    """
+    reference = message.reference
+    resolved = reference.resolved
+    if isinstance(resolved, discord.DeletedReferencedMessage):
+        return None
+    if resolved is not None:
+        metrics.inc("tul_edit_lookups_total", source="resolved")
+        return resolved
+    cached = reference.cached_message
+    if cached is not None:
+        metrics.inc("tul_edit_lookups_total", source="cache")
+        return cached
+    metrics.inc("tul_edit_lookups_total", source="fetch")
+    with metrics.timed("tul_edit.fetch_message"):
+        return await message.channel.fetch_message(reference.message_id)
+
+
+def expect_tupper_edit_error(channel_id: int) -> None:
+    pending = tupper_edit_errors.get(channel_id, 0, count=False)
+    tupper_edit_errors.set(channel_id, pending + 1)
+
+
+def claim_tupper_edit_error(message) -> bool:
+    """True if ``message`` is Tupperbox's error for a pending tul!edit.
+
+    Each match uses up one expectation in its channel.
+    """
+    pending = tupper_edit_errors.get(message.channel.id, 0, count=False)
+    if not pending:
+        return False
+    if message.author.id != TUPPERBOX_USER_ID or \
+            message.content != TUPPER_EDIT_ERROR:
+        return False
+    if pending == 1:
+        tupper_edit_errors.pop(message.channel.id)
+    else:
+        tupper_edit_errors.set(message.channel.id, pending - 1)
+    return True
 
 
-async def insert_roll_history(
-        message: discord.Message,
-        d20_roll: d20.RollResult,
-        command: str
-        ):
+def _roll_command(command: str, d20_roll: d20.RollResult) -> str:
+    """``command`` without the roll's trailing comment."""
     comment = d20_roll.comment
     if comment is not None:
         command = command.replace(comment, "")
-        command = command.strip()
-    history_repo = RollHistoryRepository()
-    history_repo.add_history(
+    return command.strip()
+
+
+def roll_history_record(
+        message: discord.Message,
+        d20_roll: d20.RollResult,
+        command: str,
+        summary: bool = False
+        ) -> HistoryRecord:
+    command = _roll_command(command, d20_roll)
+    return HistoryRecord(
         guild_id=message.guild.id,
         character_name=message.author.name,
         dice_roll=command,
-        result=d20_roll.result,
-        expression=str(d20_roll.expr),
+        result=f"{command} = `{d20_roll.total}`" if summary
+        else d20_roll.result,
+        expression=command if summary else str(d20_roll.expr),
         crit=d20_roll.crit,
-        room_name=message.channel.name
+        room_name=message.channel.name,
+        channel_id=message.channel.id,
+        message_id=message.id,
+        created_at=int(message.created_at.timestamp())
     )
 
 
-async def insert_modiphius_history(
+def modiphius_history_record(
         message: discord.Message,
         modiphius_result: dict,
         command: str
-        ):
-    history_repo = RollHistoryRepository()
-    history_repo.add_history(
+        ) -> HistoryRecord:
+    return HistoryRecord(
         guild_id=message.guild.id,
         character_name=message.author.name,
         dice_roll=command,
         result=modiphius_result['summary'],
         expression=modiphius_result['expression'],
         crit=0,
-        room_name=message.channel.name
+        room_name=message.channel.name,
+        channel_id=message.channel.id,
+        message_id=message.id,
+        created_at=int(message.created_at.timestamp())
     )
 
 
-async def insert_roll_histories(
-        histories_list
-        ):
-    for history in histories_list:
-        if 'modiphius' in history:
-            await insert_modiphius_history(
-                message=history['message'],
-                modiphius_result=history['modiphius'],
-                command=history['command']
-            )
-            continue
-        await insert_roll_history(
-            message=history['message'],
-            d20_roll=history['d20_roll'],
-            command=history['command']
-        )
-
-
-bot.run(TOKEN)
+if __name__ == "__main__":
+    database.connect()  # open the shared connection, create the schema
+    bot.run(TOKEN)
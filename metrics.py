@@ -0,0 +1,253 @@
+"""Low-overhead latency histograms and counters for the bot's hot paths.
+
+Stages are timed with ``timed`` (a context manager that also works as a
+decorator on plain functions) into fixed-bucket histograms, so recording is
+a bisect and three additions and memory never grows with traffic. Counters
+take optional labels. Everything lives in the module-level ``registry`` and
+can be rendered as Prometheus text (``render``), served on a local HTTP
+port (``serve``) or written to a file (``write_file``); ``;;perf`` shows
+the same numbers in Discord.
+
+Repository calls are timed from worker threads, so updates take a lock.
+"""
+
+import bisect
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # not on Windows; resident_memory reports 0
+    resource = None
+
+PREFIX = "inline_roller"
+
+# Upper bounds, in seconds, of the latency buckets; +Inf is implicit. The
+# sub-millisecond ones separate the fast in-process stages (scan, roll).
+BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    """Bucketed latency distribution for one stage."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimate the ``q`` quantile by interpolating inside its bucket.
+
+        Like Prometheus' ``histogram_quantile``, observations past the last
+        bound are reported as that bound.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.buckets[-1]
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}  # stage -> Histogram
+        self.counters = {}  # (name, ((label, value), ...)) -> int
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, amount: int = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def clear(self) -> None:
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+registry = Registry()
+
+
+def observe(stage: str, seconds: float) -> None:
+    registry.observe(stage, seconds)
+
+
+def inc(name: str, amount: int = 1, **labels) -> None:
+    registry.inc(name, amount, **labels)
+
+
+@contextmanager
+def timed(stage: str):
+    """Time the block (or decorated function) into ``stage``'s histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(stage, time.perf_counter() - start)
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+def render(source: Registry = None) -> str:
+    """The registry in the Prometheus text exposition format."""
+    source = source or registry
+    with source.lock:
+        histograms = {
+            stage: (list(h.counts), h.count, h.sum, h.buckets)
+            for stage, h in source.histograms.items()
+        }
+        counters = dict(source.counters)
+
+    lines = []
+    name = f"{PREFIX}_stage_seconds"
+    lines.append(f"# HELP {name} Time spent in each handler stage.")
+    lines.append(f"# TYPE {name} histogram")
+    for stage in sorted(histograms):
+        counts, count, total, buckets = histograms[stage]
+        cumulative = 0
+        for bound, bucket in zip(buckets, counts):
+            cumulative += bucket
+            lines.append(
+                f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}'
+            )
+        lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        lines.append(f'{name}_sum{{stage="{stage}"}} {total}')
+        lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+
+    typed = set()
+    for counter, pairs in sorted(counters):
+        full_name = f"{PREFIX}_{counter}"
+        if full_name not in typed:
+            lines.append(f"# TYPE {full_name} counter")
+            typed.add(full_name)
+        lines.append(
+            f"{full_name}{_labels(pairs)} {counters[(counter, pairs)]}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def summary(source: Registry = None) -> list:
+    """``(stage, count, p50, p95, p99)`` rows, slowest p95 first."""
+    source = source or registry
+    with source.lock:
+        rows = [
+            (stage, h.count, h.quantile(0.5), h.quantile(0.95),
+             h.quantile(0.99))
+            for stage, h in source.histograms.items()
+        ]
+    return sorted(rows, key=lambda row: row[3], reverse=True)
+
+
+def counter_values(source: Registry = None) -> dict:
+    """``"name{labels}" -> value`` for every counter."""
+    source = source or registry
+    with source.lock:
+        return {
+            f"{name}{_labels(pairs)}": value
+            for (name, pairs), value in sorted(source.counters.items())
+        }
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes would otherwise be logged to stderr
+
+
+def serve(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve ``/metrics`` from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(
+        target=server.serve_forever, name="metrics", daemon=True
+    )
+    thread.start()
+    return server
+
+
+def write_file(path: str) -> None:
+    """Write ``render()`` to ``path`` atomically (node-exporter style)."""
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        file.write(render())
+    os.replace(temporary, path)
+
+
+class RateLimitFilter(logging.Filter):
+    """Counts discord.py's "responded with 429" logs, one per 429 response.
+
+    The extra "Global rate limit has been hit" line for the same response
+    is not counted. Installed as a filter on the ``discord.http`` logger; it
+    never drops a record.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if "responded with 429" in record.getMessage():
+            inc("rate_limits_total")
+        return True
+
+
+def install_rate_limit_counter(logger_name: str = "discord.http") -> None:
+    logger = logging.getLogger(logger_name)
+    if not any(isinstance(f, RateLimitFilter) for f in logger.filters):
+        logger.addFilter(RateLimitFilter())
+
+
+def resident_memory() -> int:
+    """Resident set size of this process in bytes.
+
+    Read from ``/proc`` where there is one; elsewhere this is the peak RSS
+    from ``getrusage``, or 0 if neither is available.
+    """
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # macOS: bytes
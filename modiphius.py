@@ -14,14 +14,31 @@ uses:
 
 Rolling uses ``random`` directly; the pure evaluation/formatting helpers take
 already-rolled dice so they can be unit tested deterministically.
+
+When NumPy is installed, the batch helpers (``roll_tests``,
+``evaluate_tests`` and the challenge equivalents) and single pools of at
+least ``NUMPY_MIN_DICE`` dice are rolled and scored as arrays. Scoring then
+uses per-face lookup tables that pack a die's successes (or challenge
+result) in the low bits and complications (or effects) above
+``PACK_SHIFT``, so a pool is scored with one gather and one sum. Without
+NumPy, the per-die loops below do the same job with identical results.
 """
 
+import functools
 import random
 import re
 
-TEST_PREFIX_PATTERN = re.compile(r"^(\d+)d20(.*)$")
+try:
+    import numpy
+except ImportError:  # the per-die loops are used instead
+    numpy = None
+
+# The whole Modiphius grammar in one anchored pattern: a count, then either
+# ``d20`` and its fields (group 2) or ``cd`` (group 3). Matching stops at the
+# first character that can't continue either form, so ordinary d20-library
+# rolls like ``1d20+5`` are rejected after a few characters.
+MODIPHIUS_PATTERN = re.compile(r"(\d+)(?:d20((?:[ftc]\d+)*)|(cd))")
 TEST_FIELD_PATTERN = re.compile(r"([ftc])(\d+)")
-CHALLENGE_PATTERN = re.compile(r"^(\d+)cd$")
 
 # d6 face -> (result, effect) for Challenge Dice.
 CHALLENGE_FACES = {
@@ -33,6 +50,78 @@ CHALLENGE_FACES = {
     6: (1, 1),
 }
 
+# Packed table layout: low field | high field << PACK_SHIFT. 32 bits leaves
+# room for pools of up to 2**31 dice before the fields could collide.
+PACK_SHIFT = 32
+PACK_MASK = (1 << PACK_SHIFT) - 1
+
+# Single pools at least this big are rolled and scored with NumPy.
+NUMPY_MIN_DICE = 64
+
+_rng = numpy.random.default_rng() if numpy is not None else None
+
+# Challenge die face -> packed (result, effect); index 0 is unused.
+CHALLENGE_TABLE = (0,) + tuple(
+    result | effect << PACK_SHIFT
+    for result, effect in (CHALLENGE_FACES[face] for face in range(1, 7))
+)
+
+
+@functools.lru_cache(maxsize=512)
+def test_table(focus: int, target: int, comp: int) -> tuple:
+    """d20 face -> packed (successes, complications); index 0 is unused."""
+    return (0,) + tuple(
+        ((face <= target) + (face <= focus)) | (face >= comp) << PACK_SHIFT
+        for face in range(1, 21)
+    )
+
+
+@functools.lru_cache(maxsize=512)
+def _numpy_table(table: tuple):
+    return numpy.array(table, dtype=numpy.int64)
+
+
+def _unpack(packed):
+    """Split a packed sum (int or NumPy array) into its two fields."""
+    return packed & PACK_MASK, packed >> PACK_SHIFT
+
+
+def _numpy_score(dice, table: tuple):
+    return _unpack(int(_numpy_table(table)[numpy.asarray(dice)].sum()))
+
+
+def _roll_dice(count: int, sides: int) -> list:
+    if numpy is not None and count >= NUMPY_MIN_DICE:
+        return _rng.integers(1, sides + 1, size=count).tolist()
+    return [random.randint(1, sides) for _ in range(count)]
+
+
+def classify(expr: str):
+    """Return ``("test", params)``, ``("challenge", params)`` or None.
+
+    One match of ``MODIPHIUS_PATTERN`` decides the kind; only a test's field
+    string (a few characters) is read again to split it into fields.
+    """
+    match = MODIPHIUS_PATTERN.fullmatch(expr.strip())
+    if match is None:
+        return None
+    count = int(match.group(1))
+    if match.group(3) is not None:
+        return "challenge", {"count": count}
+
+    pairs = TEST_FIELD_PATTERN.findall(match.group(2))
+    fields = dict(pairs)
+    if len(fields) != len(pairs):  # duplicate field
+        return None
+    if "t" not in fields:  # target number is mandatory
+        return None
+    return "test", {
+        "count": count,
+        "focus": int(fields.get("f", 1)),
+        "target": int(fields["t"]),
+        "comp": 20 - int(fields.get("c", 0)),
+    }
+
 
 def parse_test(expr: str):
     """Return test params dict, or None if ``expr`` is not a Modiphius test.
@@ -44,49 +133,28 @@ def parse_test(expr: str):
     ``c1`` yields 19, and so on. Duplicate fields or trailing junk are
     rejected.
     """
-    prefix = TEST_PREFIX_PATTERN.match(expr.strip())
-    if prefix is None:
-        return None
-    count = int(prefix.group(1))
-    rest = prefix.group(2)
-
-    fields = {}
-    pos = 0
-    for field in TEST_FIELD_PATTERN.finditer(rest):
-        if field.start() != pos:  # gap or unexpected character
-            return None
-        letter = field.group(1)
-        if letter in fields:  # duplicate field
-            return None
-        fields[letter] = int(field.group(2))
-        pos = field.end()
-    if pos != len(rest):  # trailing junk after the last field
-        return None
-    if "t" not in fields:  # target number is mandatory
+    parsed = classify(expr)
+    if parsed is None or parsed[0] != "test":
         return None
-
-    return {
-        "count": count,
-        "focus": fields.get("f", 1),
-        "target": fields["t"],
-        "comp": 20 - fields.get("c", 0),
-    }
+    return parsed[1]
 
 
 def parse_challenge(expr: str):
     """Return challenge params dict, or None if ``expr`` is not challenge dice."""
-    match = CHALLENGE_PATTERN.match(expr.strip())
-    if match is None:
+    parsed = classify(expr)
+    if parsed is None or parsed[0] != "challenge":
         return None
-    return {"count": int(match.group(1))}
+    return parsed[1]
 
 
 def is_modiphius(expr: str) -> bool:
-    return parse_test(expr) is not None or parse_challenge(expr) is not None
+    return classify(expr) is not None
 
 
 def evaluate_test(dice, focus: int, target: int, comp: int):
     """Count (successes, complications) for already-rolled d20 ``dice``."""
+    if numpy is not None and len(dice) >= NUMPY_MIN_DICE:
+        return _numpy_score(dice, test_table(focus, target, comp))
     successes = 0
     complications = 0
     for die in dice:
@@ -101,6 +169,8 @@ def evaluate_test(dice, focus: int, target: int, comp: int):
 
 def evaluate_challenge(dice):
     """Sum (total_result, total_effects) for already-rolled d6 ``dice``."""
+    if numpy is not None and len(dice) >= NUMPY_MIN_DICE:
+        return _numpy_score(dice, CHALLENGE_TABLE)
     result = 0
     effects = 0
     for die in dice:
@@ -110,6 +180,49 @@ def evaluate_challenge(dice):
     return result, effects
 
 
+def _roll_rows(n: int, count: int, sides: int):
+    if numpy is not None:
+        return _rng.integers(1, sides + 1, size=(n, count))
+    return [
+        [random.randint(1, sides) for _ in range(count)] for _ in range(n)
+    ]
+
+
+def evaluate_tests(rows, focus: int, target: int, comp: int):
+    """Score many tests at once: ``rows`` is one list of d20 faces per test.
+
+    Returns ``(successes, complications)``, each with one entry per row —
+    NumPy arrays when NumPy is available, lists otherwise. With NumPy every
+    row must hold the same number of dice.
+    """
+    if numpy is not None:
+        table = _numpy_table(test_table(focus, target, comp))
+        return _unpack(table[numpy.asarray(rows)].sum(axis=-1))
+    scores = [evaluate_test(row, focus, target, comp) for row in rows]
+    return [s for s, _ in scores], [c for _, c in scores]
+
+
+def evaluate_challenges(rows):
+    """Score many challenge pools at once; see ``evaluate_tests``."""
+    if numpy is not None:
+        table = _numpy_table(CHALLENGE_TABLE)
+        return _unpack(table[numpy.asarray(rows)].sum(axis=-1))
+    scores = [evaluate_challenge(row) for row in rows]
+    return [r for r, _ in scores], [e for _, e in scores]
+
+
+def roll_tests(n: int, count: int, focus: int, target: int, comp: int):
+    """Roll ``n`` tests of ``count`` d20 each; returns (dice, succ., comp.)."""
+    rows = _roll_rows(n, count, 20)
+    return (rows, *evaluate_tests(rows, focus, target, comp))
+
+
+def roll_challenges(n: int, count: int):
+    """Roll ``n`` pools of ``count`` challenge dice; (dice, result, effects)."""
+    rows = _roll_rows(n, count, 6)
+    return (rows, *evaluate_challenges(rows))
+
+
 def _successes(n: int) -> str:
     return f"{n} Success" if n == 1 else f"{n} Successes"
 
@@ -122,20 +235,29 @@ def _dice_str(dice) -> str:
     return ", ".join(str(d) for d in dice)
 
 
+def _dice_line(dice, count: int) -> str:
+    if dice is None:
+        return f"Dice: *{count} rolled, not shown*"
+    return f"Dice: [{_dice_str(dice)}]"
+
+
 def _test_decode(count: int, focus: int, target: int, comp: int) -> str:
     """Human-readable breakdown of a test command's parameters."""
     return f"{count}d20 · Focus {focus} · TN {target} · Comp {comp}+"
 
 
 def format_test_full(command: str, dice, focus: int, target: int, comp: int,
-                     successes: int, complications: int) -> str:
+                     successes: int, complications: int,
+                     count: int = None) -> str:
     """Full result block for the dump channel (the non-inline reference).
 
     Includes the raw command and a decoded breakdown so the roll can be
     referenced later, since the inline 【 】 view only shows the outcome.
+    ``dice=None`` (with ``count``) leaves out the individual dice.
     """
-    ref = f"🎲 Rolling `{command}` · {_test_decode(len(dice), focus, target, comp)}"
-    dice_line = f"Dice: [{_dice_str(dice)}]"
+    count = len(dice) if dice is not None else count
+    ref = f"🎲 Rolling `{command}` · {_test_decode(count, focus, target, comp)}"
+    dice_line = _dice_line(dice, count)
     if successes > 0 and complications > 0:
         body = f"✨ {_successes(successes)} | ⚠️ {_complications(complications)}"
     elif successes > 0:
@@ -159,9 +281,10 @@ def format_test_inline(successes: int, complications: int) -> str:
 
 
 def format_challenge_full(command: str, dice, result: int,
-                          effects: int) -> str:
-    ref = f"🎲 Rolling `{command}` · {len(dice)} Challenge Dice"
-    dice_line = f"Dice: [{_dice_str(dice)}]"
+                          effects: int, count: int = None) -> str:
+    count = len(dice) if dice is not None else count
+    ref = f"🎲 Rolling `{command}` · {count} Challenge Dice"
+    dice_line = _dice_line(dice, count)
     totals = f"**Total Result:** {result} | **Total Effects:** {effects}"
     return f"{ref}\n{dice_line}\n{totals}"
 
@@ -178,6 +301,56 @@ def _test_summary(successes: int, complications: int) -> str:
     return part
 
 
+def roll_test(command: str, test: dict, summary: bool = False) -> dict:
+    """Roll an already-parsed test; ``command`` is the stripped expression.
+
+    With ``summary`` the pool is rolled and scored in one batch and the
+    individual dice are neither listed nor stored.
+    """
+    count = test["count"]
+    if summary:
+        _, successes, complications = roll_tests(
+            1, count, test["focus"], test["target"], test["comp"]
+        )
+        successes, complications = int(successes[0]), int(complications[0])
+        dice = None
+    else:
+        dice = _roll_dice(count, 20)
+        successes, complications = evaluate_test(
+            dice, test["focus"], test["target"], test["comp"]
+        )
+    return {
+        "full_text": format_test_full(
+            command, dice, test["focus"], test["target"], test["comp"],
+            successes, complications, count
+        ),
+        "inline": format_test_inline(successes, complications),
+        "summary": _test_summary(successes, complications),
+        "expression": f"[{count} dice]" if summary else str(dice),
+    }
+
+
+def roll_challenge(command: str, challenge: dict,
+                   summary: bool = False) -> dict:
+    """Roll an already-parsed challenge pool (see ``roll_test``)."""
+    count = challenge["count"]
+    if summary:
+        _, result, effects = roll_challenges(1, count)
+        result, effects = int(result[0]), int(effects[0])
+        dice = None
+    else:
+        dice = _roll_dice(count, 6)
+        result, effects = evaluate_challenge(dice)
+    return {
+        "full_text": format_challenge_full(
+            command, dice, result, effects, count
+        ),
+        "inline": format_challenge_inline(result, effects),
+        "summary": f"{result} Result | {effects} Effects",
+        "expression": f"[{count} dice]" if summary else str(dice),
+    }
+
+
 def roll(expr: str):
     """Roll a Modiphius test or challenge pool.
 
@@ -186,32 +359,10 @@ def roll(expr: str):
     ``None`` if ``expr`` is not Modiphius syntax and should fall through to
     the existing d20 path.
     """
-    command = expr.strip()
-    test = parse_test(expr)
-    if test is not None:
-        dice = [random.randint(1, 20) for _ in range(test["count"])]
-        successes, complications = evaluate_test(
-            dice, test["focus"], test["target"], test["comp"]
-        )
-        return {
-            "full_text": format_test_full(
-                command, dice, test["focus"], test["target"], test["comp"],
-                successes, complications
-            ),
-            "inline": format_test_inline(successes, complications),
-            "summary": _test_summary(successes, complications),
-            "expression": str(dice),
-        }
-
-    challenge = parse_challenge(expr)
-    if challenge is not None:
-        dice = [random.randint(1, 6) for _ in range(challenge["count"])]
-        result, effects = evaluate_challenge(dice)
-        return {
-            "full_text": format_challenge_full(command, dice, result, effects),
-            "inline": format_challenge_inline(result, effects),
-            "summary": f"{result} Result | {effects} Effects",
-            "expression": str(dice),
-        }
-
-    return None
+    parsed = classify(expr)
+    if parsed is None:
+        return None
+    kind, params = parsed
+    if kind == "test":
+        return roll_test(expr.strip(), params)
+    return roll_challenge(expr.strip(), params)
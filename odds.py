@@ -0,0 +1,107 @@
+"""Exact success/complication odds for Modiphius 2d20 tests.
+
+Each d20 in a test independently scores 0, 1 or 2 successes and 0 or 1
+complications, with face counts fixed by (focus, target, comp). The
+distribution of a pool's total is built one die at a time by dynamic
+programming over whole-number outcome counts, so the answer is exact: the
+probability of ``k`` successes is ``successes[k] / total``.
+"""
+
+import functools
+import math
+from collections import namedtuple
+
+# Refuse bigger pools: real tests roll at most five dice, and the DP is
+# quadratic in the pool size.
+MAX_ODDS_DICE = 100
+
+# ``successes[k]`` / ``complications[k]`` count the ``total`` equally likely
+# outcomes (20 ** count) that score exactly ``k``.
+TestOdds = namedtuple("TestOdds", ["total", "successes", "complications"])
+
+
+def face_counts(focus: int, target: int, comp: int):
+    """d20 faces scoring 0, 1 and 2 successes, and faces that complicate."""
+    per_success = [0, 0, 0]
+    complicating = 0
+    for face in range(1, 21):
+        per_success[(face <= target) + (face <= focus)] += 1
+        complicating += face >= comp
+    return tuple(per_success), complicating
+
+
+@functools.lru_cache(maxsize=1024)
+def test_odds(count: int, focus: int, target: int, comp: int) -> TestOdds:
+    """Exact outcome counts for a ``count``-die test (see ``TestOdds``)."""
+    if count > MAX_ODDS_DICE:
+        raise ValueError(f"Pools over {MAX_ODDS_DICE} dice are not supported.")
+    per_success, complicating = face_counts(focus, target, comp)
+
+    successes = [1]
+    for _ in range(count):
+        rolled = [0] * (len(successes) + 2)
+        for total, ways in enumerate(successes):
+            if not ways:
+                continue
+            for gained, faces in enumerate(per_success):
+                rolled[total + gained] += ways * faces
+        successes = rolled
+    while len(successes) > 1 and successes[-1] == 0:
+        successes.pop()
+
+    clean = 20 - complicating
+    complications = [
+        math.comb(count, k) * complicating ** k * clean ** (count - k)
+        for k in range(count + 1)
+    ]
+    while len(complications) > 1 and complications[-1] == 0:
+        complications.pop()
+
+    return TestOdds(20 ** count, tuple(successes), tuple(complications))
+
+
+def at_least(counts, total: int) -> list:
+    """``P(X >= k)`` for every ``k``, from exact outcome ``counts``."""
+    chances = []
+    remaining = total
+    for ways in counts:
+        chances.append(remaining / total)
+        remaining -= ways
+    return chances
+
+
+def mean(counts, total: int) -> float:
+    return sum(k * ways for k, ways in enumerate(counts)) / total
+
+
+def _percent(chance: float) -> str:
+    if 0 < chance < 0.001:
+        return "<0.1%"
+    return f"{chance:.1%}"
+
+
+def format_odds(odds: TestOdds, max_rows: int = 8) -> list:
+    """``(name, value)`` embed fields describing ``odds``."""
+    success_chances = at_least(odds.successes, odds.total)
+    success_lines = [
+        f"**{k}+** {_percent(chance)}"
+        for k, chance in enumerate(success_chances[1:max_rows + 1], start=1)
+        if chance > 0
+    ]
+    success_lines.append(
+        f"Average {mean(odds.successes, odds.total):.2f}"
+    )
+
+    comp_chances = at_least(odds.complications, odds.total)
+    comp_lines = [
+        f"**None** {_percent(odds.complications[0] / odds.total)}"
+    ]
+    comp_lines += [
+        f"**{k}+** {_percent(chance)}"
+        for k, chance in enumerate(comp_chances[1:max_rows + 1], start=1)
+        if chance > 0
+    ]
+    return [
+        ("✨ Successes", "\n".join(success_lines)),
+        ("⚠️ Complications", "\n".join(comp_lines)),
+    ]
@@ -0,0 +1,74 @@
+"""Forwards 📝 edit replies between sharded worker processes.
+
+Discord delivers direct messages to shard 0 only, but a 📝 edit session
+lives in whichever worker's shard saw the reaction. With ``launcher.py``
+every worker listens on a local port (``serve``); the worker that receives
+a DM no session of its own wants offers it to the other workers in turn
+(``forward``) until one of them routes it to a session.
+
+Requests are one JSON line carrying a shared token, so only processes
+started by the same launcher can inject replies.
+"""
+
+import asyncio
+import hmac
+import json
+from collections import namedtuple
+
+HOST = "127.0.0.1"
+TIMEOUT = 2
+
+# Stands in for the discord.Message a session would otherwise receive;
+# the 📝 flow only reads ``content``.
+RelayedReply = namedtuple("RelayedReply", ["author_id", "content"])
+
+
+async def serve(port: int, route, token: str) -> asyncio.AbstractServer:
+    """Accept forwarded replies; ``route(user_id, reply)`` returns whether
+    a session took it."""
+
+    async def handle(reader, writer):
+        answer = b"0\n"
+        try:
+            request = json.loads(
+                await asyncio.wait_for(reader.readline(), TIMEOUT)
+            )
+            if hmac.compare_digest(str(request["token"]), token):
+                reply = RelayedReply(request["user_id"], request["content"])
+                if route(reply.author_id, reply):
+                    answer = b"1\n"
+            writer.write(answer)
+            await writer.drain()
+        except (ValueError, KeyError, TypeError, OSError,
+                asyncio.TimeoutError):
+            pass  # malformed or abandoned request: nothing was routed
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, HOST, port)
+
+
+async def forward(ports, token: str, user_id: int, content: str) -> bool:
+    """Offer a DM to the workers on ``ports`` in order; True once one of
+    them hands it to a session. Unreachable workers are skipped."""
+    request = json.dumps(
+        {"token": token, "user_id": user_id, "content": content}
+    ).encode() + b"\n"
+    for port in ports:
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(HOST, port), TIMEOUT
+            )
+        except (OSError, asyncio.TimeoutError):
+            continue  # e.g. that worker is restarting
+        try:
+            writer.write(request)
+            await writer.drain()
+            answer = await asyncio.wait_for(reader.readline(), TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            answer = b""
+        finally:
+            writer.close()
+        if answer.strip() == b"1":
+            return True
+    return False
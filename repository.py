@@ -1,34 +1,200 @@
 import json
+import os
 import sqlite3
+import threading
+
+import metrics
+import stats
+
+DEFAULT_DB_PATH = "database/inline_roller.db"
+
+# Applied to every new connection. WAL lets readers run alongside the writer
+# and NORMAL sync is durable at checkpoint, which is plenty for roll logs.
+PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",  # in KiB, i.e. ~16 MB
+    "PRAGMA mmap_size = 134217728",  # 128 MB
+    "PRAGMA temp_store = MEMORY",
+]
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS server_config (
+        id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        guild_id VARCHAR(255) NOT NULL UNIQUE,
+        config JSON NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS history_dice (
+        id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        character_name VARCHAR(255) NOT NULL,
+        dice_roll VARCHAR(255) NOT NULL,
+        result VARCHAR(255) NOT NULL,
+        expression TEXT NOT NULL,
+        crit INTEGER NOT NULL,
+        guild_id VARCHAR(255) NOT NULL,
+        room_name VARCHAR(255) NOT NULL
+    )""",
+    # Running totals per character, plus one row per guild whose
+    # character_name is stats.GUILD_TOTAL; see stats.STAT_FIELDS.
+    """CREATE TABLE IF NOT EXISTS roll_stats (
+        guild_id VARCHAR(255) NOT NULL,
+        character_name VARCHAR(255) NOT NULL COLLATE NOCASE,
+        rolls INTEGER NOT NULL DEFAULT 0,
+        d20_rolls INTEGER NOT NULL DEFAULT 0,
+        crits INTEGER NOT NULL DEFAULT 0,
+        fumbles INTEGER NOT NULL DEFAULT 0,
+        tests INTEGER NOT NULL DEFAULT 0,
+        successes INTEGER NOT NULL DEFAULT 0,
+        complications INTEGER NOT NULL DEFAULT 0,
+        challenges INTEGER NOT NULL DEFAULT 0,
+        challenge_results INTEGER NOT NULL DEFAULT 0,
+        challenge_effects INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (guild_id, character_name)
+    )""",
+]
+
+# Columns added after a table first shipped, as (table, column, definition).
+# Missing ones are added with ALTER TABLE when the connection opens, so old
+# database files and fresh ones end up with the same shape.
+COLUMNS = [
+    ("history_dice", "created_at", "INTEGER NOT NULL DEFAULT 0"),
+    ("history_dice", "channel_id", "INTEGER"),
+    ("history_dice", "message_id", "INTEGER"),
+    ("roll_stats", "crit_rolls", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+# Every history query filters on guild_id and pages newest-first by
+# (created_at, id); the implicit trailing rowid makes that order index-only.
+INDEXES = [
+    """CREATE INDEX IF NOT EXISTS history_dice_guild
+        ON history_dice (guild_id, created_at)""",
+    """CREATE INDEX IF NOT EXISTS history_dice_guild_character
+        ON history_dice (
+            guild_id, character_name COLLATE NOCASE, created_at
+        )""",
+    """CREATE INDEX IF NOT EXISTS history_dice_guild_channel
+        ON history_dice (guild_id, channel_id, created_at)""",
+]
+
+
+class Database:
+    """The process-wide SQLite connection every repository shares.
+
+    The connection is opened, tuned and given its schema once, on first use.
+    Keeping it open also lets sqlite3's per-connection statement cache reuse
+    the prepared form of each repository query. ``lock`` serialises access
+    because the connection may be used from worker threads as well.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("INLINE_ROLLER_DB", DEFAULT_DB_PATH)
+        self.lock = threading.RLock()
+        self._connection = None
+
+    def connect(self) -> sqlite3.Connection:
+        with self.lock:
+            if self._connection is None:
+                connection = sqlite3.connect(
+                    self.path,
+                    timeout=5.0,
+                    check_same_thread=False,
+                    cached_statements=256,
+                )
+                for pragma in PRAGMAS:
+                    connection.execute(pragma)
+                # Sharded workers open the same file at once; taking the
+                # write lock first makes them migrate one after another.
+                connection.execute("BEGIN IMMEDIATE")
+                for statement in SCHEMA:
+                    connection.execute(statement)
+                added = _add_missing_columns(connection)
+                # Totals that gained a column are recounted from history.
+                if any(table == "roll_stats" for table, _ in added):
+                    _rebuild_stats(connection.cursor())
+                for statement in INDEXES:
+                    connection.execute(statement)
+                connection.commit()
+                self._connection = connection
+            return self._connection
+
+    def configure(self, path: str) -> None:
+        """Point at another database file, closing the current connection."""
+        with self.lock:
+            self.close()
+            self.path = path
+
+    def close(self) -> None:
+        with self.lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def _add_missing_columns(connection: sqlite3.Connection) -> list:
+    """Add the missing ``COLUMNS``; returns them as (table, column)."""
+    added = []
+    existing = {}
+    for table, column, definition in COLUMNS:
+        if table not in existing:
+            existing[table] = {
+                row[1] for row in
+                connection.execute(f"PRAGMA table_info({table})")
+            }
+        if column not in existing[table]:
+            connection.execute(
+                f"ALTER TABLE {table} ADD COLUMN {column} {definition}"
+            )
+            existing[table].add(column)
+            added.append((table, column))
+    return added
+
+
+def _rebuild_stats(cursor: sqlite3.Cursor) -> int:
+    """Replace ``roll_stats`` with totals recomputed from ``history_dice``
+    inside the caller's transaction; returns the history rows read."""
+    totals = {}
+    rows = 0
+    cursor.execute(
+        "SELECT guild_id, character_name, dice_roll, result, crit "
+        "FROM history_dice"
+    )
+    for guild_id, character_name, dice_roll, result, crit in cursor:
+        stats.accumulate(
+            totals, guild_id, character_name,
+            stats.row_stats(dice_roll, result, crit),
+        )
+        rows += 1
+    cursor.execute("DELETE FROM roll_stats")
+    RollStatsRepository.add_stats(cursor, totals)
+    return rows
+
+
+database = Database()
 
 
 class Repository:
-    def __init__(self):
-        pass
+    def __init__(self, db: Database = None):
+        self.db = db or database
 
     def __enter__(self):
-        self.connection = sqlite3.connect("database/inline_roller.db")
+        self.db.lock.acquire()
+        try:
+            self.connection = self.db.connect()
+        except Exception:
+            self.db.lock.release()
+            raise
         self.cursor = self.connection.cursor()
         return self
 
     def __exit__(self, type, value, traceback):
         self.cursor.close()
-        self.connection.close()
+        if type is not None:
+            self.connection.rollback()
+        self.db.lock.release()
 
 
 class ConfigRepository(Repository):
-    def __init__(self):
-        super().__init__()
-        self.connection = sqlite3.connect("database/inline_roller.db")
-        self.cursor = self.connection.cursor()
-        self.cursor.execute("""CREATE TABLE IF NOT EXISTS server_config (
-            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-            guild_id VARCHAR(255) NOT NULL UNIQUE,
-            config JSON NOT NULL
-        )""")
-        self.cursor.close()
-        self.connection.close()
-
+    @metrics.timed("repository.get_config")
     def get_config(self, guild_id: str):
         query = """
         SELECT
@@ -44,17 +210,28 @@ class ConfigRepository(Repository):
 
         return result
 
-    def set_config(self, guild_id: str, dump_channel_id: int,
-                   thread_dump_target: str) -> None:
+    @metrics.timed("repository.get_all_configs")
+    def get_all_configs(self):
+        query = """
+        SELECT
+            guild_id, config
+        FROM server_config
+        """
+
+        with self as db:
+            db.cursor.execute(query)
+            result = db.cursor.fetchall()
+
+        return result
+
+    @metrics.timed("repository.set_config")
+    def set_config(self, guild_id: str, config: dict) -> None:
         """Upsert the full server config for ``guild_id``.
 
         The whole config object is (re)written, so callers pass every field
         they want persisted rather than patching individual keys.
         """
-        config = json.dumps({
-            "dump_channel_id": dump_channel_id,
-            "thread_dump_target": thread_dump_target,
-        })
+        config = json.dumps(config)
         query = """
         INSERT INTO server_config (guild_id, config)
         VALUES (?, ?)
@@ -68,23 +245,7 @@ class ConfigRepository(Repository):
 
 
 class RollHistoryRepository(Repository):
-    def __init__(self):
-        super().__init__()
-        self.connection = sqlite3.connect("database/inline_roller.db")
-        self.cursor = self.connection.cursor()
-        self.cursor.execute("""CREATE TABLE IF NOT EXISTS history_dice (
-            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-            character_name VARCHAR(255) NOT NULL,
-            dice_roll VARCHAR(255) NOT NULL,
-            result VARCHAR(255) NOT NULL,
-            expression TEXT NOT NULL,
-            crit INTEGER NOT NULL,
-            guild_id VARCHAR(255) NOT NULL,
-            room_name VARCHAR(255) NOT NULL
-        )""")
-        self.cursor.close()
-        self.connection.close()
-
+    @metrics.timed("repository.get_history")
     def get_history(self, guild_id: str):
         query = """
         SELECT
@@ -109,21 +270,152 @@ class RollHistoryRepository(Repository):
             expression: str,
             crit: int,
             room_name: str,
+            channel_id: int = None,
+            message_id: int = None,
+            created_at: int = 0,
             ) -> None:
+        self.add_histories([(
+            guild_id, character_name, dice_roll, result, expression,
+            crit, room_name, channel_id, message_id, created_at
+        )])
+
+    @metrics.timed("repository.add_histories")
+    def add_histories(self, records) -> None:
+        """Insert many history rows in a single transaction.
+
+        ``records`` are ``history.HistoryRecord`` tuples (or any sequence in
+        the same field order). The ``roll_stats`` totals are updated in the
+        same transaction.
+        """
         query = """
         INSERT INTO history_dice (
-            character_name, dice_roll, result, expression, crit,
-            guild_id, room_name
+            guild_id, character_name, dice_roll, result, expression,
+            crit, room_name, channel_id, message_id, created_at
         )
         VALUES (
             ?, ?, ?, ?, ?,
-            ?, ?
+            ?, ?, ?, ?, ?
         )
         """
 
+        totals = {}
+        for record in records:
+            guild_id, character_name, dice_roll, result, _, crit = record[:6]
+            stats.accumulate(
+                totals, guild_id, character_name,
+                stats.row_stats(dice_roll, result, crit),
+            )
+
+        with self as db:
+            db.cursor.executemany(query, records)
+            RollStatsRepository.add_stats(db.cursor, totals)
+            db.connection.commit()
+
+    @metrics.timed("repository.get_history_page")
+    def get_history_page(
+            self,
+            guild_id: str,
+            character_name: str = None,
+            channel_id: int = None,
+            since: int = None,
+            until: int = None,
+            before: tuple = None,
+            limit: int = 10,
+            ):
+        """Return up to ``limit`` history rows, newest first.
+
+        ``before`` is the ``(created_at, id)`` of the last row of the previous
+        page; rows strictly older than it are returned, so each page is an
+        index seek plus ``limit`` row reads however deep the history goes.
+        ``since``/``until`` are inclusive unix timestamps and the character
+        match ignores case. Rows are ``(id, created_at, character_name,
+        dice_roll, result, room_name, channel_id)``.
+        """
+        conditions = ["guild_id = ?"]
+        params = [guild_id]
+        if character_name is not None:
+            conditions.append("character_name = ? COLLATE NOCASE")
+            params.append(character_name)
+        if channel_id is not None:
+            conditions.append("channel_id = ?")
+            params.append(channel_id)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at <= ?")
+            params.append(until)
+        if before is not None:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend(before)
+        query = f"""
+        SELECT
+            id, created_at, character_name, dice_roll, result,
+            room_name, channel_id
+        FROM history_dice
+        WHERE {" AND ".join(conditions)}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+        """
+        params.append(limit)
+
+        with self as db:
+            db.cursor.execute(query, params)
+            result = db.cursor.fetchall()
+
+        return result
+
+
+class RollStatsRepository(Repository):
+    _COLUMNS = ", ".join(stats.STAT_FIELDS)
+    _UPSERT = f"""
+        INSERT INTO roll_stats (guild_id, character_name, {_COLUMNS})
+        VALUES (?, ?, {", ".join("?" for _ in stats.STAT_FIELDS)})
+        ON CONFLICT(guild_id, character_name) DO UPDATE SET
+            {", ".join(f"{f} = {f} + excluded.{f}" for f in stats.STAT_FIELDS)}
+        """
+
+    @classmethod
+    def add_stats(cls, cursor: sqlite3.Cursor, totals: dict) -> None:
+        """Add ``stats.accumulate`` totals inside the caller's transaction."""
+        cursor.executemany(cls._UPSERT, [
+            (guild_id, character_name, *deltas)
+            for (guild_id, character_name), deltas in totals.items()
+        ])
+
+    @metrics.timed("repository.get_stats")
+    def get_stats(self, guild_id: str, character_name: str = None):
+        """Return the totals as a dict, or None if nothing was rolled.
+
+        Without ``character_name`` the guild-wide totals are returned.
+        """
+        query = f"""
+        SELECT
+            character_name, {self._COLUMNS}
+        FROM roll_stats
+        WHERE guild_id = ? AND character_name = ?
+        """
+        if character_name is None:
+            character_name = stats.GUILD_TOTAL
+
         with self as db:
-            db.cursor.execute(query, (
-                character_name, dice_roll, result, expression, crit,
-                guild_id, room_name
-            ))
+            db.cursor.execute(query, (str(guild_id), character_name))
+            row = db.cursor.fetchone()
+
+        if row is None:
+            return None
+        return dict(zip(("character_name", *stats.STAT_FIELDS), row))
+
+    @metrics.timed("repository.rebuild_stats")
+    def rebuild_stats(self) -> int:
+        """Recompute every total from ``history_dice``; returns rows read.
+
+        Runs as one write transaction, so the totals are never seen half
+        built and no history row can slip in between the scan and the swap.
+        """
+        with self as db:
+            db.cursor.execute("BEGIN IMMEDIATE")
+            rows = _rebuild_stats(db.cursor)
             db.connection.commit()
+
+        return rows
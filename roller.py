@@ -0,0 +1,75 @@
+"""Cached classification and parsing of inline roll expressions.
+
+Tables reuse the same handful of expressions all session, so each distinct
+expression is classified and parsed once: ``parse`` maps the stripped text
+to a ``ParsedRoll`` holding either Modiphius parameters or the d20 AST, and
+later rolls of the same text skip both the Modiphius regexes and the d20
+parser. A ``"d20"`` entry doubles as the negative "not Modiphius" answer.
+Expressions that fail to parse are not cached. The ``cost.estimate`` of each
+expression is cached alongside it.
+"""
+
+from collections import namedtuple
+
+import d20
+import cost
+import modiphius
+from cache import MISSING, TTLCache
+
+PARSE_CACHE_SIZE = 1024
+
+# ``kind`` is "test", "challenge" or "d20"; ``params`` is the matching
+# ``modiphius.parse_*`` dict or the parsed ``d20`` expression; ``cost`` is
+# its ``cost.Cost``.
+ParsedRoll = namedtuple("ParsedRoll", ["kind", "params", "cost"])
+
+parse_cache = TTLCache(PARSE_CACHE_SIZE)
+_roller = d20.Roller()
+
+
+class SummaryStringifier(d20.Stringifier):
+    """Renders nothing; used when only a roll's total will be shown."""
+
+    def stringify(self, the_roll) -> str:
+        return ""
+
+
+_summary_stringifier = SummaryStringifier()
+
+
+def parse(expr: str) -> ParsedRoll:
+    """Classify and parse ``expr``; raises ``d20.RollSyntaxError``."""
+    text = expr.strip()
+    parsed = parse_cache.get(text)
+    if parsed is not MISSING:
+        return parsed
+    modiphius_roll = modiphius.classify(text)
+    if modiphius_roll is not None:
+        kind, params = modiphius_roll
+    else:
+        kind, params = "d20", d20.parse(text, allow_comments=True)
+    parsed = ParsedRoll(kind, params, cost.estimate(kind, params))
+    parse_cache.set(text, parsed)
+    return parsed
+
+
+def roll_modiphius(expr: str, parsed: ParsedRoll,
+                   summary: bool = False) -> dict:
+    """``modiphius.roll`` for an expression ``parse`` classified."""
+    if parsed.kind == "test":
+        return modiphius.roll_test(expr.strip(), parsed.params, summary)
+    return modiphius.roll_challenge(expr.strip(), parsed.params, summary)
+
+
+def roll_d20(parsed: ParsedRoll, summary: bool = False):
+    """``d20.roll`` without re-parsing; the AST is never mutated.
+
+    With ``summary`` the breakdown is not rendered (``result`` is empty).
+    """
+    stringifier = _summary_stringifier if summary else None
+    return _roller.roll(parsed.params, stringifier=stringifier,
+                        allow_comments=True)
+
+
+def cache_stats() -> dict:
+    return parse_cache.stats()
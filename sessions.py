@@ -0,0 +1,111 @@
+"""DM edit sessions for the 📝 reaction flow.
+
+``EditSessionManager.open`` starts a session for a user and returns a
+future that resolves to their next DM (or None when the session times
+out). ``route`` hands a DM to the user's oldest open session with one dict
+lookup, so on_message costs the same however many edits are open. All
+timeouts share one heap and one loop timer, rescheduled for the earliest
+deadline, instead of a ``wait_for`` check and timeout per session.
+"""
+
+import asyncio
+import heapq
+import itertools
+from collections import deque
+
+DEFAULT_TIMEOUT = 300
+DEFAULT_MAX_PER_USER = 3
+
+
+class EditSessionManager:
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT,
+                 max_per_user: int = DEFAULT_MAX_PER_USER):
+        self.timeout = timeout
+        self.max_per_user = max_per_user
+        self._sessions = {}  # user id -> deque of futures, oldest first
+        self._deadlines = []  # heap of (deadline, seq, user id, future)
+        self._seq = itertools.count()  # breaks deadline ties
+        self._timer = None  # asyncio.TimerHandle for the earliest deadline
+        self._timer_at = None
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._sessions.values())
+
+    def open_count(self, user_id: int) -> int:
+        return len(self._sessions.get(user_id, ()))
+
+    def open(self, user_id: int, timeout: float = None):
+        """Start a session for ``user_id``; returns its future, or None if
+        the user already has ``max_per_user`` sessions open."""
+        queue = self._sessions.setdefault(user_id, deque())
+        for future in [future for future in queue if future.done()]:
+            queue.remove(future)  # cancelled by their waiter
+        if len(queue) >= self.max_per_user:
+            return None
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue.append(future)
+        deadline = loop.time() + (self.timeout if timeout is None
+                                  else timeout)
+        heapq.heappush(self._deadlines,
+                       (deadline, next(self._seq), user_id, future))
+        self._schedule(loop)
+        return future
+
+    def route(self, user_id: int, message) -> bool:
+        """Resolve ``user_id``'s oldest session with ``message``.
+
+        Returns False if the user has no session open.
+        """
+        queue = self._sessions.get(user_id)
+        if queue is None:
+            return False
+        routed = False
+        while queue and not routed:
+            future = queue.popleft()
+            # Sessions whose waiter was cancelled are dropped here.
+            if not future.done():
+                future.set_result(message)
+                routed = True
+        if not queue:
+            del self._sessions[user_id]
+        # The heap entry is skipped when it comes due.
+        return routed
+
+    def cancel_all(self) -> None:
+        for queue in self._sessions.values():
+            for future in queue:
+                future.cancel()
+        self._sessions.clear()
+        self._deadlines.clear()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = self._timer_at = None
+
+    def _schedule(self, loop) -> None:
+        """Point the timer at the earliest live deadline."""
+        while self._deadlines and self._deadlines[0][3].done():
+            heapq.heappop(self._deadlines)
+        if not self._deadlines:
+            return
+        deadline = self._deadlines[0][0]
+        if self._timer is not None:
+            if self._timer_at <= deadline:
+                return
+            self._timer.cancel()
+        self._timer = loop.call_at(deadline, self._expire, loop)
+        self._timer_at = deadline
+
+    def _expire(self, loop) -> None:
+        self._timer = self._timer_at = None
+        now = loop.time()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, user_id, future = heapq.heappop(self._deadlines)
+            queue = self._sessions.get(user_id)
+            if queue is not None and future in queue:
+                queue.remove(future)  # at most max_per_user entries
+                if not queue:
+                    del self._sessions[user_id]
+            if not future.done():
+                future.set_result(None)
+        self._schedule(loop)
@@ -0,0 +1,132 @@
+"""Shard assignment and heartbeat files for the multi-process mode.
+
+``launcher.py`` splits ``SHARD_COUNT`` shards into contiguous ranges with
+``shard_ranges`` and starts one bot process per range, passing it
+``SHARD_IDS`` (``format_shard_ids``) and a ``HEARTBEAT_FILE``. Each worker
+rewrites that file every few seconds with ``write_heartbeat``; the launcher
+reads it back (``read_heartbeat``) to report per-shard health and latency,
+to notice hung workers and to know when a restarted worker is ready.
+"""
+
+import json
+import math
+import os
+import time
+
+# How often a worker rewrites its heartbeat, and how old one may get before
+# the launcher treats the worker as hung.
+HEARTBEAT_INTERVAL = 10
+HEARTBEAT_TIMEOUT = 90
+
+
+def shard_ranges(shard_count: int, workers: int) -> list:
+    """Split shards ``0..shard_count-1`` into ``workers`` contiguous lists.
+
+    Sizes differ by at most one, larger ranges first; there are never more
+    ranges than shards.
+    """
+    if shard_count < 1 or workers < 1:
+        raise ValueError("shard_count and workers must be at least 1")
+    workers = min(workers, shard_count)
+    size, extra = divmod(shard_count, workers)
+    ranges = []
+    start = 0
+    for index in range(workers):
+        end = start + size + (1 if index < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def format_shard_ids(shard_ids) -> str:
+    return ",".join(str(shard_id) for shard_id in shard_ids)
+
+
+def parse_shard_ids(text: str) -> list:
+    """``"0,1,2"`` -> ``[0, 1, 2]``; ranges like ``"0-3"`` are accepted."""
+    shard_ids = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            shard_ids.extend(range(int(first), int(last) + 1))
+        else:
+            shard_ids.append(int(part))
+    return shard_ids
+
+
+def _seconds(latency):
+    """JSON-safe latency: discord.py reports nan/inf before the first ack."""
+    if latency is None or not math.isfinite(latency):
+        return None
+    return round(latency, 4)
+
+
+def write_heartbeat(path: str, ready: bool, guilds: int, shards,
+                    rss: int = 0) -> None:
+    """Atomically write this process's heartbeat to ``path``.
+
+    ``shards`` holds ``(shard id, latency in seconds, open)`` tuples.
+    """
+    heartbeat = {
+        "pid": os.getpid(),
+        "time": time.time(),
+        "ready": ready,
+        "guilds": guilds,
+        "rss": rss,
+        "shards": [
+            {"id": shard_id, "latency": _seconds(latency), "open": is_open}
+            for shard_id, latency, is_open in shards
+        ],
+    }
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(heartbeat, file)
+    os.replace(temporary, path)
+
+
+def read_heartbeat(path: str):
+    """The heartbeat dict at ``path``, or None if missing or unreadable."""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def is_healthy(heartbeat, pid: int = None, now: float = None,
+               timeout: float = HEARTBEAT_TIMEOUT) -> bool:
+    """True if ``heartbeat`` is recent, from ``pid`` (when given), and
+    reports ready with every shard open."""
+    if heartbeat is None:
+        return False
+    if pid is not None and heartbeat.get("pid") != pid:
+        return False
+    now = time.time() if now is None else now
+    if now - heartbeat.get("time", 0) > timeout:
+        return False
+    return bool(heartbeat.get("ready")) and all(
+        shard["open"] for shard in heartbeat.get("shards", [])
+    )
+
+
+def describe(heartbeat) -> str:
+    """One status line, e.g. ``ready, 120 guilds, 85 MiB, 0: 41 ms``."""
+    if heartbeat is None:
+        return "no heartbeat"
+    parts = [
+        "ready" if heartbeat.get("ready") else "starting",
+        f"{heartbeat.get('guilds', 0)} guilds",
+        f"{heartbeat.get('rss', 0) / 2**20:.0f} MiB",
+    ]
+    for shard in heartbeat.get("shards", []):
+        if not shard["open"]:
+            state = "closed"
+        elif shard["latency"] is None:
+            state = "?"
+        else:
+            state = f"{shard['latency'] * 1000:.0f} ms"
+        parts.append(f"{shard['id']}: {state}")
+    return ", ".join(parts)
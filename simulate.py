@@ -0,0 +1,286 @@
+"""Monte Carlo simulation of roll expressions across worker processes.
+
+For rolls without a cheap exact answer (exploding dice, rerolls, anything
+``dist`` refuses), ``simulate``/``simulate_async`` roll the expression many
+times in a ``ProcessPoolExecutor``. Work is split into shards with their own
+seeds; each shard returns a histogram (outcome -> count) rather than a list
+of samples, and histograms are merged as shards finish. Every shard checks
+a shared wall-clock deadline, so a time budget caps the whole run.
+"""
+
+import asyncio
+import math
+import multiprocessing
+import multiprocessing.context
+import os
+import random
+import sys
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cost
+import d20
+import modiphius
+import roller
+
+SHARD_SIZE = 50_000
+DEFAULT_SAMPLES = 100_000
+MAX_SAMPLES = 10_000_000
+DEFAULT_TIME_BUDGET = 10.0
+# How many samples a shard rolls between deadline checks.
+DEADLINE_CHECK_EVERY = 1000
+
+# ``kind`` is "test", "challenge" or "d20". Histogram keys are
+# (successes, complications), (result, effects) or the roll total.
+SimResult = namedtuple("SimResult", [
+    "expr", "kind", "samples", "histogram", "elapsed", "complete",
+])
+
+_executor = None
+
+
+class _WorkerProcess(multiprocessing.context.SpawnProcess):
+    """A spawned worker that starts from this module, not the bot's script.
+
+    A spawned child first re-runs the parent's ``__main__`` (as
+    ``__mp_main__``), which for the bot would be all of main.py. While the
+    child is started this module stands in for ``__main__``, so workers only
+    import ``simulate`` and what it needs to roll.
+    """
+
+    def start(self):
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = sys.modules[__name__]
+        try:
+            super().start()
+        finally:
+            sys.modules["__main__"] = main
+
+
+class _WorkerContext(multiprocessing.context.SpawnContext):
+    Process = _WorkerProcess
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """The shared worker pool, started on first use.
+
+    Workers are spawned rather than forked so they never inherit the bot's
+    event loop, sockets or threads.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=os.cpu_count() or 1, mp_context=_WorkerContext(),
+        )
+    return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def classify(expr: str) -> str:
+    """Return the simulation kind for ``expr``; d20 syntax errors propagate.
+
+    Raises ValueError for pools over the ``cost`` hard caps, so workers never
+    start on a roll that can't be made.
+    """
+    modiphius_roll = modiphius.classify(expr)
+    if modiphius_roll is not None:
+        kind, params = modiphius_roll
+    else:
+        kind, params = "d20", d20.parse(expr, allow_comments=True)
+    # Only the hard caps reject in SUMMARY mode; output length doesn't
+    # matter here.
+    if cost.admit(kind, cost.estimate(kind, params), cost.HARD_MAX_DICE,
+                  cost.SUMMARY) == cost.REJECT:
+        raise ValueError("That roll throws too many dice to simulate.")
+    return kind
+
+
+def run_shard(expr: str, kind: str, samples: int, seed: str,
+              deadline: float):
+    """Roll ``expr`` up to ``samples`` times; returns (histogram, rolled).
+
+    Runs in a worker process. ``deadline`` is a ``time.time()`` value.
+    """
+    histogram = Counter()
+    rng = random.Random(seed)
+    rolled = 0
+    if kind == "d20":
+        random.seed(seed)  # d20 rolls with the module-level generator
+        d20_roller = d20.Roller()
+        parsed = d20.parse(expr, allow_comments=True)
+        # Only totals are kept, so skip building each roll's text.
+        stringifier = roller.SummaryStringifier()
+
+        def one():
+            return d20_roller.roll(parsed, stringifier=stringifier).total
+    elif kind == "test":
+        test = modiphius.parse_test(expr)
+        faces = range(1, 21)
+
+        def one():
+            dice = rng.choices(faces, k=test["count"])
+            return modiphius.evaluate_test(
+                dice, test["focus"], test["target"], test["comp"]
+            )
+    else:
+        count = modiphius.parse_challenge(expr)["count"]
+        faces = range(1, 7)
+
+        def one():
+            return modiphius.evaluate_challenge(rng.choices(faces, k=count))
+
+    while rolled < samples:
+        if time.time() >= deadline:
+            break
+        chunk = min(DEADLINE_CHECK_EVERY, samples - rolled)
+        for _ in range(chunk):
+            histogram[one()] += 1
+        rolled += chunk
+    return dict(histogram), rolled
+
+
+def _shards(samples: int, seed):
+    """``(size, seed)`` per shard; seeds derive from one base seed."""
+    base = seed if seed is not None else random.SystemRandom().getrandbits(64)
+    shards = []
+    for index, start in enumerate(range(0, samples, SHARD_SIZE)):
+        shards.append((min(SHARD_SIZE, samples - start), f"{base}:{index}"))
+    return shards
+
+
+def _check(samples: int) -> None:
+    if not 1 <= samples <= MAX_SAMPLES:
+        raise ValueError(f"Samples must be between 1 and {MAX_SAMPLES:,}.")
+
+
+def simulate(expr: str, samples: int = DEFAULT_SAMPLES,
+             time_budget: float = DEFAULT_TIME_BUDGET, seed=None,
+             executor=None) -> SimResult:
+    """Blocking entry point; see ``simulate_async`` for use on the loop."""
+    _check(samples)
+    kind = classify(expr)
+    executor = executor or get_executor()
+    started = time.time()
+    deadline = started + time_budget
+    futures = [
+        executor.submit(run_shard, expr, kind, size, shard_seed, deadline)
+        for size, shard_seed in _shards(samples, seed)
+    ]
+    histogram = Counter()
+    rolled = 0
+    for future in as_completed(futures):
+        shard_histogram, shard_rolled = future.result()
+        histogram.update(shard_histogram)
+        rolled += shard_rolled
+    return SimResult(expr, kind, rolled, histogram, time.time() - started,
+                     rolled == samples)
+
+
+async def simulate_async(expr: str, samples: int = DEFAULT_SAMPLES,
+                         time_budget: float = DEFAULT_TIME_BUDGET, seed=None,
+                         executor=None) -> SimResult:
+    """Run ``simulate`` without blocking the event loop.
+
+    Shards are awaited as they finish and merged straight away, so only the
+    histograms — never individual samples — come back to this process.
+    """
+    _check(samples)
+    kind = classify(expr)
+    executor = executor or get_executor()
+    loop = asyncio.get_running_loop()
+    started = time.time()
+    deadline = started + time_budget
+    futures = [
+        loop.run_in_executor(
+            executor, run_shard, expr, kind, size, shard_seed, deadline
+        )
+        for size, shard_seed in _shards(samples, seed)
+    ]
+    histogram = Counter()
+    rolled = 0
+    for future in asyncio.as_completed(futures):
+        shard_histogram, shard_rolled = await future
+        histogram.update(shard_histogram)
+        rolled += shard_rolled
+    return SimResult(expr, kind, rolled, histogram, time.time() - started,
+                     rolled == samples)
+
+
+SIM_OPERATOR_ENDINGS = tuple("+-*/%(<>=!,")
+
+
+def split_sim_args(text: str):
+    """Split ``;;sim`` arguments into ``(expr, samples)``.
+
+    A trailing whole number is the sample count unless it is clearly the
+    right-hand side of an operator (``1d20 + 5``).
+    """
+    text = text.strip()
+    head, _, tail = text.rpartition(" ")
+    if head and tail.isdigit() and \
+            not head.rstrip().endswith(SIM_OPERATOR_ENDINGS):
+        return head.strip(), int(tail)
+    return text, DEFAULT_SAMPLES
+
+
+def _percent(count: int, total: int) -> str:
+    return f"{count / total:.1%}"
+
+
+def format_result(result: SimResult) -> list:
+    """``(name, value)`` embed fields summarising ``result``."""
+    total = result.samples
+    if total == 0:
+        return [("Samples", "None finished inside the time budget.")]
+    histogram = result.histogram
+    fields = []
+    if result.kind == "d20":
+        mean = sum(v * n for v, n in histogram.items()) / total
+        variance = sum((v - mean) ** 2 * n for v, n in histogram.items())
+        fields.append((
+            "Average", f"{mean:.2f} ± {math.sqrt(variance / total):.2f}"
+        ))
+        fields.append(("Range", f"{min(histogram)} – {max(histogram)}"))
+        cumulative = 0
+        marks = iter((10, 25, 50, 75, 90))
+        mark = next(marks)
+        percentiles = []
+        for value in sorted(histogram):
+            cumulative += histogram[value]
+            while mark is not None and cumulative * 100 >= mark * total:
+                percentiles.append(f"p{mark} **{value}**")
+                mark = next(marks, None)
+        fields.append(("Percentiles", " · ".join(percentiles)))
+    else:
+        first = Counter()
+        second = Counter()
+        for (a, b), n in histogram.items():
+            first[a] += n
+            second[b] += n
+        names = ("✨ Successes", "⚠️ Complications") \
+            if result.kind == "test" else ("🎯 Result", "⚡ Effects")
+        for name, counter in zip(names, (first, second)):
+            lines = []
+            remaining = total
+            for value in range(max(counter) + 1):
+                if value and remaining:
+                    lines.append(
+                        f"**{value}+** {_percent(remaining, total)}"
+                    )
+                remaining -= counter.get(value, 0)
+            mean = sum(v * n for v, n in counter.items()) / total
+            lines.append(f"Average {mean:.2f}")
+            fields.append((name, "\n".join(lines[-9:])))
+    status = "" if result.complete else " (time budget reached)"
+    fields.append((
+        "Samples",
+        f"{total:,} in {result.elapsed:.1f}s{status}",
+    ))
+    return fields
@@ -0,0 +1,136 @@
+"""Roll statistics derived from ``history_dice`` rows.
+
+Stats are kept as running totals in the ``roll_stats`` table, one row per
+character plus one per guild (``GUILD_TOTAL``). Every history write adds
+the deltas computed by ``row_stats``, so reading stats is a primary-key
+lookup however long the history grows. ``python stats.py`` rebuilds the
+totals from scratch for history written before the table existed.
+"""
+
+import re
+
+import d20
+import dist
+import modiphius
+import roller
+
+# Column order of the running totals in ``roll_stats``.
+STAT_FIELDS = (
+    "rolls",
+    "d20_rolls", "crit_rolls", "crits", "fumbles",
+    "tests", "successes", "complications",
+    "challenges", "challenge_results", "challenge_effects",
+)
+
+# ``character_name`` of the per-guild row.
+GUILD_TOTAL = ""
+
+SUCCESSES_PATTERN = re.compile(r"(\d+) Success")
+COMPLICATIONS_PATTERN = re.compile(r"(\d+) Complication")
+CHALLENGE_SUMMARY_PATTERN = re.compile(r"^(\d+) Result \| (\d+) Effects$")
+
+
+def can_crit(dice_roll: str) -> bool:
+    """Whether d20 checks ``dice_roll`` for crits: its leftmost dice are
+    d20s of which one is kept (``1d20+5``, ``2d20kh1``, not ``8d6``)."""
+    try:
+        return dist.checks_crits(dist.to_key(roller.parse(dice_roll).params))
+    except (d20.RollSyntaxError, dist.DistError):
+        return False
+
+
+def row_stats(dice_roll: str, result: str, crit: int) -> tuple:
+    """Deltas (in ``STAT_FIELDS`` order) contributed by one history row.
+
+    Modiphius rows are recognised by their command and their numbers read
+    back from the summary ``modiphius.roll`` stored; everything else is a
+    d20-library roll whose ``crit`` is 1 for a natural 20 and 2 for a 1.
+    Only rolls that ``can_crit`` count towards the crit and fumble rates.
+    """
+    kind = (modiphius.classify(dice_roll) or ("d20",))[0]
+    if kind == "test":
+        successes = SUCCESSES_PATTERN.search(result)
+        complications = COMPLICATIONS_PATTERN.search(result)
+        return (
+            1, 0, 0, 0, 0,
+            1,
+            int(successes.group(1)) if successes else 0,
+            int(complications.group(1)) if complications else 0,
+            0, 0, 0,
+        )
+    if kind == "challenge":
+        totals = CHALLENGE_SUMMARY_PATTERN.match(result)
+        return (
+            1, 0, 0, 0, 0, 0, 0, 0,
+            1,
+            int(totals.group(1)) if totals else 0,
+            int(totals.group(2)) if totals else 0,
+        )
+    return (
+        1, 1, int(bool(crit) or can_crit(dice_roll)),
+        int(crit == 1), int(crit == 2),
+        0, 0, 0, 0, 0, 0,
+    )
+
+
+def accumulate(totals: dict, guild_id, character_name: str,
+               deltas: tuple) -> None:
+    """Add ``deltas`` to both the character's and the guild's totals."""
+    for key in ((str(guild_id), character_name),
+                (str(guild_id), GUILD_TOTAL)):
+        current = totals.get(key)
+        if current is None:
+            totals[key] = list(deltas)
+        else:
+            for i, delta in enumerate(deltas):
+                current[i] += delta
+
+
+def _rate(part: int, whole: int) -> str:
+    return f"{part / whole:.1%}" if whole else "—"
+
+
+def _average(total: int, count: int) -> str:
+    return f"{total / count:.2f}" if count else "—"
+
+
+def format_stats(stats: dict) -> list:
+    """``(name, value)`` embed fields for a ``get_stats`` result."""
+    fields = [("Rolls", str(stats["rolls"]))]
+    if stats["d20_rolls"]:
+        fields.append((
+            "Dice rolls",
+            f"{stats['d20_rolls']} rolled\n"
+            f"💥 Crits {_rate(stats['crits'], stats['crit_rolls'])}\n"
+            f"💀 Fumbles {_rate(stats['fumbles'], stats['crit_rolls'])}",
+        ))
+    if stats["tests"]:
+        fields.append((
+            "2d20 tests",
+            f"{stats['tests']} rolled\n"
+            f"✨ {_average(stats['successes'], stats['tests'])} "
+            "successes / test\n"
+            f"⚠️ {_average(stats['complications'], stats['tests'])} "
+            "complications / test",
+        ))
+    if stats["challenges"]:
+        fields.append((
+            "Challenge dice",
+            f"{stats['challenges']} rolled\n"
+            f"🎯 {_average(stats['challenge_results'], stats['challenges'])} "
+            "result / roll\n"
+            f"⚡ {_average(stats['challenge_effects'], stats['challenges'])} "
+            "effects / roll",
+        ))
+    return fields
+
+
+def main():
+    from repository import RollStatsRepository
+
+    rows = RollStatsRepository().rebuild_stats()
+    print(f"Rebuilt roll stats from {rows} history rows.")
+
+
+if __name__ == "__main__":
+    main()
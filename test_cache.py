@@ -0,0 +1,62 @@
+import unittest
+
+from cache import MISSING, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TTLCacheCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(maxsize=2, ttl=10, clock=self.clock)
+
+    def test_miss_returns_sentinel(self):
+        self.assertIs(self.cache.get("a"), MISSING)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_none_is_a_cacheable_negative_entry(self):
+        self.cache.set("a", None)
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_entries_expire(self):
+        self.cache.set("a", 1)
+        self.clock.now = 9.9
+        self.assertEqual(self.cache.get("a"), 1)
+        self.clock.now = 10.0
+        self.assertIs(self.cache.get("a"), MISSING)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_per_key_ttl_override(self):
+        self.cache.set("a", 1, ttl=1)
+        self.cache.set("b", 2, ttl=None)
+        self.clock.now = 1000
+        self.assertIs(self.cache.get("a"), MISSING)
+        self.assertEqual(self.cache.get("b"), 2)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")  # "b" is now the oldest
+        self.cache.set("c", 3)
+        self.assertIn("a", self.cache)
+        self.assertNotIn("b", self.cache)
+        self.assertIn("c", self.cache)
+
+    def test_pop_and_hit_rate(self):
+        self.cache.set("a", 1)
+        self.cache.get("a")
+        self.cache.get("b")
+        self.assertEqual(self.cache.hit_rate(), 0.5)
+        self.assertEqual(self.cache.pop("a"), 1)
+        self.assertIsNone(self.cache.pop("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+import cost
+
+
+# Stand-ins for the d20.diceast classes ``cost`` reads by class name.
+class Expression:
+    def __init__(self, roll):
+        self.roll = roll
+        self.comment = None
+
+
+class Literal:
+    def __init__(self, value):
+        self.value = value
+
+
+class BinOp:
+    def __init__(self, left, op, right):
+        self.left, self.op, self.right = left, op, right
+
+
+class Dice:
+    def __init__(self, num, size):
+        self.num, self.size = num, size
+
+
+class OperatedDice:
+    def __init__(self, the_dice, *ops):
+        self.value = the_dice
+        self.operations = [SetOperator(op) for op in ops]
+
+
+class SetOperator:
+    def __init__(self, op):
+        self.op = op
+        self.sels = []
+
+
+class EstimateCase(unittest.TestCase):
+    def test_modiphius_pools(self):
+        self.assertEqual(cost.estimate("test", {"count": 5}).dice, 5)
+        big = cost.estimate("challenge", {"count": 5000})
+        self.assertEqual(big.dice, 5000)
+        self.assertGreater(big.output, cost.MAX_OUTPUT)
+
+    def test_d20_tree(self):
+        tree = Expression(BinOp(Dice(2, 20), "+", Literal(5)))
+        estimate = cost.estimate("d20", tree)
+        self.assertEqual(estimate.dice, 2)
+        self.assertLess(estimate.output, 40)
+
+    def test_rerolls_count_extra_dice(self):
+        plain = cost.estimate("d20", Expression(OperatedDice(Dice(8, 6))))
+        exploding = cost.estimate(
+            "d20", Expression(OperatedDice(Dice(8, 6), "e"))
+        )
+        kept = cost.estimate(
+            "d20", Expression(OperatedDice(Dice(8, 6), "k"))
+        )
+        self.assertEqual((plain.dice, exploding.dice, kept.dice), (8, 16, 8))
+        self.assertGreater(exploding.output, plain.output)
+
+
+class AdmitCase(unittest.TestCase):
+    def test_within_limits(self):
+        small = cost.Cost(10, 10, 100)
+        self.assertEqual(cost.admit("test", small, 100, cost.SUMMARY),
+                         cost.FULL)
+
+    def test_over_guild_limit_follows_mode(self):
+        big = cost.Cost(500, 500, 2000)
+        self.assertEqual(cost.admit("test", big, 100, cost.SUMMARY),
+                         cost.SUMMARY)
+        self.assertEqual(cost.admit("test", big, 100, cost.REJECT),
+                         cost.REJECT)
+
+    def test_long_output_is_summarised(self):
+        wordy = cost.Cost(50, 50, cost.MAX_OUTPUT + 1)
+        self.assertEqual(cost.admit("d20", wordy, 100, cost.SUMMARY),
+                         cost.SUMMARY)
+
+    def test_hard_caps(self):
+        huge = cost.Cost(cost.HARD_MAX_DICE + 1, 0, 0)
+        self.assertEqual(cost.admit("test", huge, 10**9, cost.SUMMARY),
+                         cost.REJECT)
+        too_many = cost.Cost(cost.D20_MAX_ROLLS + 1, 0, 0)
+        self.assertEqual(cost.admit("d20", too_many, 10**9, cost.SUMMARY),
+                         cost.REJECT)
+
+
+if __name__ == "__main__":
+    unittest.main()
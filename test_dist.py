@@ -0,0 +1,162 @@
+import itertools
+import unittest
+from collections import Counter
+
+import dist
+
+
+# Minimal stand-ins for the d20.diceast classes ``dist.to_key`` reads;
+# only the class names and attributes matter.
+class Expression:
+    def __init__(self, roll, comment=None):
+        self.roll = roll
+        self.comment = comment
+
+
+class Literal:
+    def __init__(self, value):
+        self.value = value
+
+
+class BinOp:
+    def __init__(self, left, op, right):
+        self.left, self.op, self.right = left, op, right
+
+
+class Dice:
+    def __init__(self, num, size):
+        self.num, self.size = num, size
+
+
+class OperatedDice:
+    def __init__(self, the_dice, *operations):
+        self.value = the_dice
+        self.operations = list(operations)
+
+
+class SetOperator:
+    def __init__(self, op, sels):
+        self.op, self.sels = op, sels
+
+
+class SetSelector:
+    def __init__(self, cat, num):
+        self.cat, self.num = cat, num
+
+
+def dice(num, size, *ops):
+    return OperatedDice(Dice(num, size), *(
+        SetOperator(op, [SetSelector(cat, n)]) for op, cat, n in ops
+    ))
+
+
+def brute_keep(num, size, kept, highest=True):
+    totals = Counter()
+    for roll in itertools.product(range(1, size + 1), repeat=num):
+        ordered = sorted(roll, reverse=highest)
+        totals[sum(ordered[:kept])] += 1
+    count = size ** num
+    return {total: ways / count for total, ways in totals.items()}
+
+
+def as_mapping(d: dist.Dist) -> dict:
+    return {
+        d.offset + i: p for i, p in enumerate(d.probs) if p
+    }
+
+
+class DistCase(unittest.TestCase):
+    def assertDistEqual(self, actual: dist.Dist, expected: dict):
+        got = as_mapping(actual)
+        self.assertEqual(set(got), set(expected))
+        for value, prob in expected.items():
+            self.assertAlmostEqual(got[value], prob, places=12)
+
+    def test_keep_highest_matches_enumeration(self):
+        for num, size, kept in [(4, 6, 3), (5, 6, 2), (2, 20, 1), (3, 4, 3)]:
+            key = dist.to_key(dice(num, size, ("k", "h", kept)))
+            self.assertDistEqual(
+                dist.solve(key), brute_keep(num, size, kept)
+            )
+
+    def test_keep_lowest_and_drop(self):
+        self.assertDistEqual(
+            dist.solve(dist.to_key(dice(2, 20, ("k", "l", 1)))),
+            brute_keep(2, 20, 1, highest=False),
+        )
+        # Dropping the lowest die is keeping the highest three.
+        self.assertEqual(
+            dist.solve(dist.to_key(dice(4, 6, ("p", "l", 1)))),
+            dist.solve(dist.to_key(dice(4, 6, ("k", "h", 3)))),
+        )
+
+    def test_arithmetic(self):
+        expr = BinOp(BinOp(dice(2, 6), "*", Literal(2)), "-", Literal(1))
+        expected = Counter()
+        for a, b in itertools.product(range(1, 7), repeat=2):
+            expected[(a + b) * 2 - 1] += 1 / 36
+        self.assertDistEqual(dist.solve(dist.to_key(expr)), expected)
+
+    def test_per_die_operators(self):
+        # ro1: a 1 is rerolled once, so P(1) = 1/36.
+        rerolled = dist.solve(dist.to_key(dice(1, 6, ("ro", None, 1))))
+        self.assertAlmostEqual(dist.probability(rerolled, 1), 1 / 36)
+        # rr1: 1 never shows, the rest are equally likely.
+        self.assertDistEqual(
+            dist.solve(dist.to_key(dice(1, 6, ("rr", None, 1)))),
+            {face: 1 / 5 for face in range(2, 7)},
+        )
+        self.assertDistEqual(
+            dist.solve(dist.to_key(dice(1, 6, ("mi", None, 3)))),
+            {3: 3 / 6, 4: 1 / 6, 5: 1 / 6, 6: 1 / 6},
+        )
+
+    def test_analysis_summary(self):
+        result = dist.analyze(Expression(BinOp(dice(1, 20), "+", Literal(5))))
+        self.assertAlmostEqual(result.mean, 15.5)
+        self.assertEqual((result.minimum, result.maximum), (6, 25))
+        self.assertEqual(result.percentiles[50], 15)
+        self.assertAlmostEqual(result.crit, 0.05)
+        self.assertAlmostEqual(result.fumble, 0.05)
+
+    def test_advantage_crit_chance(self):
+        result = dist.analyze(Expression(dice(2, 20, ("k", "h", 1))))
+        self.assertAlmostEqual(result.crit, 39 / 400)
+        self.assertAlmostEqual(result.fumble, 1 / 400)
+
+    def test_no_crit_without_single_kept_d20(self):
+        self.assertIsNone(dist.analyze(Expression(dice(2, 20))).crit)
+        self.assertIsNone(dist.analyze(Expression(dice(1, 6))).crit)
+
+    def test_refusals(self):
+        with self.assertRaises(dist.Unsupported):
+            dist.analyze(Expression(dice(1, 6, ("e", None, 6))))
+        with self.assertRaises(dist.TooComplex):
+            dist.analyze(Expression(dice(dist.MAX_DICE + 1, 6)))
+        with self.assertRaises(dist.TooComplex):
+            dist.analyze(Expression(
+                BinOp(dice(1000, 1000), "*", dice(1000, 1000))
+            ))
+        # Keep/drop pools use the pure-Python budget even with NumPy.
+        with self.assertRaises(dist.TooComplex):
+            dist.analyze(Expression(dice(90, 20, ("k", "h", 45))))
+
+    def test_keeping_every_die_is_a_plain_sum(self):
+        # Budgeted like 200d6, not like a 200-dice order statistic.
+        analysis = dist.analyze(Expression(dice(200, 6, ("k", "h", 200))))
+        self.assertAlmostEqual(analysis.mean, 700)
+        self.assertEqual(
+            dist._plan(dist.to_key(dice(200, 6, ("k", "h", 200)))),
+            dist._plan(dist.to_key(dice(200, 6))),
+        )
+
+    def test_subexpressions_are_memoised(self):
+        dist.solve.cache_clear()
+        dist.solve(dist.to_key(BinOp(dice(1, 20), "+", dice(1, 20))))
+        misses = dist.solve.cache_info().misses
+        dist.solve(dist.to_key(dice(1, 20)))
+        self.assertEqual(dist.solve.cache_info().misses, misses)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import asyncio
+import unittest
+
+from dumps import DumpCoalescer
+
+
+class FakeChannel:
+    def __init__(self, channel_id=1, fail=False):
+        self.id = channel_id
+        self.fail = fail
+        self.sent = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def send(self, content):
+        await self.gate.wait()
+        if self.fail:
+            raise RuntimeError("send failed")
+        self.sent.append(content)
+        return f"message-{len(self.sent)}"
+
+
+class DumpCoalescerCase(unittest.IsolatedAsyncioTestCase):
+    async def test_idle_channel_sends_at_once(self):
+        coalescer = DumpCoalescer()
+        channel = FakeChannel()
+        self.assertEqual(await coalescer.post(channel, "a"), "message-1")
+        self.assertEqual(await coalescer.post(channel, "b"), "message-2")
+        self.assertEqual(channel.sent, ["a", "b"])
+
+    async def test_burst_during_send_is_combined(self):
+        coalescer = DumpCoalescer()
+        channel = FakeChannel()
+        channel.gate.clear()
+        first = asyncio.create_task(coalescer.post(channel, "a"))
+        await asyncio.sleep(0)  # "a" is now in flight
+        rest = [asyncio.create_task(coalescer.post(channel, text))
+                for text in "bcd"]
+        await asyncio.sleep(0)
+        channel.gate.set()
+        self.assertEqual(await first, "message-1")
+        self.assertEqual(await asyncio.gather(*rest), ["message-2"] * 3)
+        self.assertEqual(channel.sent, ["a", "b\nc\nd"])
+        self.assertEqual(coalescer.stats(), {"posts": 4, "sends": 2})
+
+    async def test_batches_respect_the_limit(self):
+        coalescer = DumpCoalescer(limit=5)
+        channel = FakeChannel()
+        channel.gate.clear()
+        posts = [asyncio.create_task(coalescer.post(channel, text))
+                 for text in ["a", "bb", "cc", "dddddd", "e"]]
+        await asyncio.sleep(0)
+        channel.gate.set()
+        await asyncio.gather(*posts)
+        self.assertEqual(channel.sent, ["a\nbb", "cc", "dddddd", "e"])
+
+    async def test_channels_are_independent(self):
+        coalescer = DumpCoalescer()
+        busy, idle = FakeChannel(1), FakeChannel(2)
+        busy.gate.clear()
+        blocked = asyncio.create_task(coalescer.post(busy, "a"))
+        await asyncio.sleep(0)
+        self.assertEqual(await coalescer.post(idle, "b"), "message-1")
+        busy.gate.set()
+        await blocked
+
+    async def test_send_errors_reach_every_waiter(self):
+        coalescer = DumpCoalescer()
+        channel = FakeChannel(fail=True)
+        results = await asyncio.gather(
+            coalescer.post(channel, "a"), coalescer.post(channel, "b"),
+            return_exceptions=True,
+        )
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(coalescer._pending, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from history import HistoryRecord, HistorySink, parse_history_query
+from repository import Database, RollHistoryRepository
+
+
+def record(n: int) -> HistoryRecord:
+    return HistoryRecord(
+        guild_id=1, character_name=f"char{n}", dice_roll="1d20",
+        result=str(n), expression="1d20", crit=0, room_name="tavern",
+        channel_id=10, message_id=n, created_at=1000 + n,
+    )
+
+
+class HistorySinkCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, "test.db"))
+        self.repo = RollHistoryRepository(self.db)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    async def test_flushes_by_size(self):
+        sink = HistorySink(self.repo, batch_size=5, flush_interval=60)
+        sink.start()
+        for n in range(10):
+            await sink.submit(record(n))
+        for _ in range(100):
+            if sink.written == 10:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(sink.written, 10)
+        self.assertEqual(sink.batches, 2)
+        await sink.close()
+
+    async def test_flushes_by_time(self):
+        sink = HistorySink(self.repo, batch_size=100, flush_interval=0.05)
+        sink.start()
+        await sink.submit(record(1))
+        await asyncio.sleep(0.3)
+        self.assertEqual(len(self.repo.get_history(1)), 1)
+        await sink.close()
+
+    async def test_close_flushes_everything_queued(self):
+        sink = HistorySink(self.repo, batch_size=1000, flush_interval=60)
+        sink.start()
+        for n in range(25):
+            await sink.submit(record(n))
+        await sink.close()
+        self.assertEqual(len(self.repo.get_history(1)), 25)
+        self.assertEqual(sink.stats()["written"], 25)
+
+    async def test_close_writes_the_batch_being_collected(self):
+        sink = HistorySink(self.repo, batch_size=100, flush_interval=5)
+        sink.start()
+        for n in range(3):
+            await sink.submit(record(n))
+        await asyncio.sleep(0)  # the writer dequeues and waits for more
+        await sink.close()
+        self.assertEqual(len(self.repo.get_history(1)), 3)
+        self.assertEqual(sink.written, 3)
+
+    async def test_full_queue_counts_blocked_submits(self):
+        sink = HistorySink(self.repo, maxsize=1)
+        sink.queue = asyncio.Queue(maxsize=1)  # no writer draining it
+        await sink.submit(record(1))
+        waiter = asyncio.create_task(sink.submit(record(2)))
+        await asyncio.sleep(0)
+        self.assertEqual(sink.blocked, 1)
+        sink.queue.get_nowait()
+        await waiter
+        self.assertEqual(sink.high_water, 1)
+
+
+class ParseHistoryQueryCase(unittest.TestCase):
+    NOW = 1_700_000_000
+
+    def test_empty_query_has_no_filters(self):
+        self.assertEqual(parse_history_query("", now=self.NOW), {
+            "character_name": None, "channel_id": None,
+            "since": None, "until": None,
+        })
+
+    def test_all_filters(self):
+        self.assertEqual(
+            parse_history_query(
+                "Ayla Stone <#42> since:2d until:2024-05-01", now=self.NOW
+            ),
+            {
+                "character_name": "Ayla Stone",
+                "channel_id": 42,
+                "since": self.NOW - 2 * 86400,
+                "until": 1714521600 + 86399,  # end of that UTC day
+            },
+        )
+
+    def test_bad_time_raises(self):
+        with self.assertRaises(ValueError):
+            parse_history_query("since:soon", now=self.NOW)
+        with self.assertRaises(ValueError):
+            parse_history_query("until:2024-02-30", now=self.NOW)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+import inline
+
+
+def expressions(content):
+    return inline.find_inline_roll(content)
+
+
+class ScanCase(unittest.TestCase):
+    def test_spans_cover_brackets(self):
+        content = "hit [[1d20+5]] for [[2d6]]"
+        rolls = inline.scan(content)
+        self.assertEqual([r.expression for r in rolls], ["1d20+5", "2d6"])
+        self.assertEqual(
+            [content[r.start:r.end] for r in rolls], ["[[1d20+5]]", "[[2d6]]"]
+        )
+
+    def test_nested_open_uses_innermost(self):
+        self.assertEqual(expressions("[[a [[1d6]]"), ["1d6"])
+        self.assertEqual(expressions("[[[1d6]]]"), ["1d6"])
+
+    def test_unterminated_and_stray_brackets(self):
+        self.assertEqual(expressions("[[1d6"), [])
+        self.assertEqual(expressions("1d6]] [[2d6]]"), ["2d6"])
+        self.assertEqual(expressions("[[1d6]] [[2d6"), ["1d6"])
+
+    def test_blank_and_multiline_are_not_rolls(self):
+        self.assertEqual(expressions("[[]] [[  ]] [[1d\n6]]"), [])
+        self.assertEqual(expressions("[[1d4\n[[1d6]]"), ["1d6"])
+
+
+class SpliceCase(unittest.TestCase):
+    def test_replaces_by_position(self):
+        content = "[[1d6]] then [[1d6]]!"
+        rolls = inline.scan(content)
+        self.assertEqual(
+            inline.splice(content, rolls, ["【 2 】", "【 5 】"]),
+            "【 2 】 then 【 5 】!",
+        )
+
+    def test_untouched_text_is_kept(self):
+        content = "[[oops [[1d6]] ]] tail"
+        rolls = inline.scan(content)
+        self.assertEqual(inline.splice(content, rolls, ["X"]),
+                         "[[oops X ]] tail")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import logging
+import os
+import tempfile
+import unittest
+import urllib.request
+
+import metrics
+
+
+class HistogramCase(unittest.TestCase):
+    def test_quantiles_interpolate_within_buckets(self):
+        histogram = metrics.Histogram(buckets=(1.0, 2.0, 4.0))
+        for value in [0.5] * 50 + [1.5] * 40 + [3.0] * 10:
+            histogram.observe(value)
+        self.assertAlmostEqual(histogram.quantile(0.5), 1.0)
+        self.assertAlmostEqual(histogram.quantile(0.7), 1.5)
+        self.assertAlmostEqual(histogram.quantile(0.95), 3.0)
+        self.assertEqual(histogram.count, 100)
+
+    def test_overflow_reports_last_bound(self):
+        histogram = metrics.Histogram(buckets=(1.0,))
+        histogram.observe(30.0)
+        self.assertEqual(histogram.quantile(0.99), 1.0)
+        self.assertEqual(metrics.Histogram().quantile(0.5), 0.0)
+
+
+class RegistryCase(unittest.TestCase):
+    def setUp(self):
+        metrics.registry.clear()
+
+    def test_timed_records_even_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with metrics.timed("stage.a"):
+                raise RuntimeError
+        self.assertEqual(metrics.registry.histograms["stage.a"].count, 1)
+
+    def test_timed_decorates_functions(self):
+        @metrics.timed("stage.b")
+        def work():
+            return 42
+
+        self.assertEqual(work(), 42)
+        self.assertEqual(work(), 42)
+        self.assertEqual(metrics.registry.histograms["stage.b"].count, 2)
+
+    def test_render_prometheus_text(self):
+        metrics.observe("message.roll", 0.003)
+        metrics.inc("rolls_total", kind="d20")
+        metrics.inc("rolls_total", 2, kind="d20")
+        text = metrics.render()
+        self.assertIn(
+            'inline_roller_stage_seconds_bucket'
+            '{stage="message.roll",le="0.005"} 1', text
+        )
+        self.assertIn(
+            'inline_roller_stage_seconds_count{stage="message.roll"} 1', text
+        )
+        self.assertIn('inline_roller_rolls_total{kind="d20"} 3', text)
+        self.assertEqual(metrics.counter_values(),
+                         {'rolls_total{kind="d20"}': 3})
+
+    def test_sub_millisecond_buckets(self):
+        metrics.observe("message.scan", 0.00003)
+        text = metrics.render()
+        self.assertIn(
+            'inline_roller_stage_seconds_bucket'
+            '{stage="message.scan",le="2.5e-05"} 0', text
+        )
+        self.assertIn(
+            'inline_roller_stage_seconds_bucket'
+            '{stage="message.scan",le="5e-05"} 1', text
+        )
+
+    def test_rate_limit_filter_counts_429s(self):
+        logger = logging.getLogger("test_metrics.http")
+        logger.propagate = False
+        metrics.install_rate_limit_counter(logger.name)
+        metrics.install_rate_limit_counter(logger.name)  # idempotent
+        logger.warning("We are being rate limited. %s %s responded with "
+                       "429. Retrying in %.2f seconds.", "POST", "/x", 1.0)
+        logger.warning("Global rate limit has been hit. Retrying in %.2f "
+                       "seconds.", 1.0)  # same 429, not counted twice
+        logger.warning("Something else")
+        self.assertEqual(metrics.counter_values(), {"rate_limits_total": 1})
+
+    def test_exposition(self):
+        metrics.inc("errors_total", event="on_message")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.prom")
+            metrics.write_file(path)
+            with open(path) as file:
+                self.assertIn("errors_total", file.read())
+        server = metrics.serve(0)
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(
+                    f"http://127.0.0.1:{port}/metrics") as response:
+                self.assertIn(b"errors_total", response.read())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+@unittest.skipIf(metrics.resource is None and
+                 not os.path.exists("/proc/self/status"),
+                 "no way to read RSS on this platform")
+class ResidentMemoryCase(unittest.TestCase):
+    def test_reports_a_plausible_size(self):
+        rss = metrics.resident_memory()
+        self.assertGreater(rss, 1 << 20)
+        self.assertLess(rss, 1 << 40)
+
+
+if __name__ == "__main__":
+    unittest.main()
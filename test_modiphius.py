@@ -1,4 +1,6 @@
+import random
 import unittest
+from unittest import mock
 
 import modiphius
 
@@ -96,6 +98,21 @@ class ParseChallengeCase(unittest.TestCase):
         self.assertIsNone(modiphius.parse_challenge("cd6"))
 
 
+class ClassifyCase(unittest.TestCase):
+    def test_kinds(self):
+        self.assertEqual(
+            modiphius.classify(" 3d20t9f2 "),
+            ("test", {"count": 3, "focus": 2, "target": 9, "comp": 20}),
+        )
+        self.assertEqual(modiphius.classify("4cd"),
+                         ("challenge", {"count": 4}))
+
+    def test_other_expressions(self):
+        for expr in ["1d20+5", "2d20", "2d20t12 attack", "cd", "4cdx",
+                     "2d20t1\nt2", "", "2d20t12t3", "d20t12"]:
+            self.assertIsNone(modiphius.classify(expr), expr)
+
+
 class EvaluateTestCase(unittest.TestCase):
     def test_focus_die_yields_two_successes(self):
         # 3 <= focus(3) and <= target(12) -> 2 successes; 15 is a miss.
@@ -206,10 +223,88 @@ class RollCase(unittest.TestCase):
         out = modiphius.roll("6cd")
         self.assertTrue(out["full_text"].startswith("🎲 Rolling `6cd`"))
 
+    def test_summary_roll_leaves_out_dice(self):
+        out = modiphius.roll_test(
+            "300d20t10", modiphius.parse_test("300d20t10"), summary=True
+        )
+        self.assertIn("Dice: *300 rolled, not shown*", out["full_text"])
+        self.assertEqual(out["expression"], "[300 dice]")
+        out = modiphius.roll_challenge("40cd", {"count": 40}, summary=True)
+        self.assertIn("40 Challenge Dice", out["full_text"])
+
     def test_non_modiphius_returns_none(self):
         self.assertIsNone(modiphius.roll("2d20"))
         self.assertIsNone(modiphius.roll("1d6+3"))
 
 
+class BatchCase(unittest.TestCase):
+    PARAMS = [(1, 12, 20), (3, 12, 19), (5, 8, 17), (20, 20, 1), (0, 0, 21)]
+
+    def _check_tests_match_loop(self):
+        rng = random.Random(7)
+        rows = [[rng.randint(1, 20) for _ in range(5)] for _ in range(200)]
+        for focus, target, comp in self.PARAMS:
+            successes, complications = modiphius.evaluate_tests(
+                rows, focus, target, comp
+            )
+            for row, s, c in zip(rows, successes, complications):
+                self.assertEqual(
+                    (int(s), int(c)),
+                    modiphius.evaluate_test(row, focus, target, comp),
+                )
+
+    def _check_challenges_match_loop(self):
+        rows = [[1, 2, 3, 4, 5, 6], [3, 3, 4, 4, 3, 4], [6, 6, 6, 5, 5, 1]]
+        results, effects = modiphius.evaluate_challenges(rows)
+        self.assertEqual(
+            [(int(r), int(e)) for r, e in zip(results, effects)],
+            [(5, 2), (0, 0), (6, 5)],
+        )
+
+    def test_pure_python_batch_matches_per_test_scoring(self):
+        with mock.patch.object(modiphius, "numpy", None):
+            self._check_tests_match_loop()
+            self._check_challenges_match_loop()
+
+    @unittest.skipIf(modiphius.numpy is None, "NumPy not installed")
+    def test_numpy_batch_matches_per_test_scoring(self):
+        self._check_tests_match_loop()
+        self._check_challenges_match_loop()
+
+    def test_face_tables_agree_with_loops(self):
+        # The NumPy path scores through these tables, so check them even
+        # where NumPy itself isn't installed.
+        with mock.patch.object(modiphius, "numpy", None):
+            for focus, target, comp in self.PARAMS:
+                table = modiphius.test_table(focus, target, comp)
+                for face in range(1, 21):
+                    self.assertEqual(
+                        modiphius._unpack(table[face]),
+                        modiphius.evaluate_test([face], focus, target, comp),
+                    )
+            for face in range(1, 7):
+                self.assertEqual(
+                    modiphius._unpack(modiphius.CHALLENGE_TABLE[face]),
+                    modiphius.evaluate_challenge([face]),
+                )
+
+    def test_large_pool_scores_like_small_ones(self):
+        dice = [1, 20, 12, 13] * 100
+        self.assertEqual(
+            modiphius.evaluate_test(dice, focus=1, target=12, comp=20),
+            (300, 100),
+        )
+
+    def test_roll_tests_shape(self):
+        with mock.patch.object(modiphius, "numpy", None):
+            rows, successes, complications = modiphius.roll_tests(
+                10, 3, focus=1, target=12, comp=20
+            )
+        self.assertEqual(len(rows), 10)
+        self.assertTrue(all(len(row) == 3 for row in rows))
+        self.assertTrue(all(0 <= s <= 6 for s in successes))
+        self.assertTrue(all(0 <= c <= 3 for c in complications))
+
+
 if __name__ == "__main__":
     unittest.main()
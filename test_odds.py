@@ -0,0 +1,61 @@
+import itertools
+import unittest
+from collections import Counter
+
+import modiphius
+import odds
+
+
+def brute_force(count, focus, target, comp):
+    successes = Counter()
+    complications = Counter()
+    for dice in itertools.product(range(1, 21), repeat=count):
+        s, c = modiphius.evaluate_test(dice, focus, target, comp)
+        successes[s] += 1
+        complications[c] += 1
+    return successes, complications
+
+
+class TestOddsCase(unittest.TestCase):
+    def test_matches_enumeration(self):
+        for params in [(1, 1, 12, 20), (2, 3, 12, 19), (3, 5, 8, 17)]:
+            result = odds.test_odds(*params)
+            successes, complications = brute_force(*params)
+            self.assertEqual(result.total, 20 ** params[0])
+            self.assertEqual(
+                dict(enumerate(result.successes)),
+                {k: successes[k] for k in range(len(result.successes))},
+            )
+            self.assertEqual(sum(result.successes), result.total)
+            self.assertEqual(
+                dict(enumerate(result.complications)),
+                {k: complications[k] for k in range(len(result.complications))},
+            )
+
+    def test_at_least_and_mean(self):
+        # One die, TN 10, focus 1: 1 face -> 2, 9 faces -> 1, 10 faces -> 0.
+        result = odds.test_odds(1, 1, 10, 20)
+        self.assertEqual(result.successes, (10, 9, 1))
+        self.assertEqual(
+            odds.at_least(result.successes, result.total), [1.0, 0.5, 0.05]
+        )
+        self.assertAlmostEqual(odds.mean(result.successes, result.total), 0.55)
+
+    def test_large_pool_is_memoised(self):
+        odds.test_odds.cache_clear()
+        first = odds.test_odds(100, 2, 12, 19)
+        self.assertIs(odds.test_odds(100, 2, 12, 19), first)
+        self.assertEqual(sum(first.successes), first.total)
+
+    def test_oversized_pool_refused(self):
+        with self.assertRaises(ValueError):
+            odds.test_odds(odds.MAX_ODDS_DICE + 1, 1, 12, 20)
+
+    def test_format_odds(self):
+        fields = dict(odds.format_odds(odds.test_odds(2, 1, 10, 20)))
+        self.assertIn("**1+** 75.0%", fields["✨ Successes"])
+        self.assertIn("**None** 90.2%", fields["⚠️ Complications"])
+
+
+if __name__ == "__main__":
+    unittest.main()
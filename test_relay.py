@@ -0,0 +1,61 @@
+import unittest
+
+import launcher
+import relay
+from sessions import EditSessionManager
+
+TOKEN = "secret"
+
+
+class RelayCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # Two workers that don't run shard 0, so never see DMs themselves.
+        self.managers = [EditSessionManager(timeout=5) for _ in range(2)]
+        self.servers = [
+            await relay.serve(0, manager.route, TOKEN)
+            for manager in self.managers
+        ]
+        self.ports = [
+            server.sockets[0].getsockname()[1] for server in self.servers
+        ]
+
+    async def asyncTearDown(self):
+        for manager in self.managers:
+            manager.cancel_all()
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+
+    async def test_reply_reaches_the_worker_with_the_session(self):
+        session = self.managers[1].open(42)
+        self.assertTrue(await relay.forward(self.ports, TOKEN, 42, "new"))
+        reply = await session
+        self.assertEqual((reply.author_id, reply.content), (42, "new"))
+
+    async def test_no_session_anywhere(self):
+        self.assertFalse(await relay.forward(self.ports, TOKEN, 42, "hi"))
+
+    async def test_wrong_token_is_refused(self):
+        session = self.managers[0].open(42)
+        self.assertFalse(await relay.forward(self.ports, "guess", 42, "x"))
+        self.assertFalse(session.done())
+
+    async def test_unreachable_worker_is_skipped(self):
+        self.servers[0].close()
+        await self.servers[0].wait_closed()
+        session = self.managers[1].open(42)
+        self.assertTrue(await relay.forward(self.ports, TOKEN, 42, "new"))
+        self.assertEqual((await session).content, "new")
+
+
+class LauncherRelayCase(unittest.TestCase):
+    def test_workers_get_their_port_and_their_peers(self):
+        ports = [47800, 47801, 47802]
+        env = launcher.Worker(1, [2, 3], 6, "run", ports, TOKEN).environment()
+        self.assertEqual(env["EDIT_RELAY_PORT"], "47801")
+        self.assertEqual(env["EDIT_RELAY_PEERS"], "47800,47802")
+        self.assertEqual(env["EDIT_RELAY_TOKEN"], TOKEN)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from repository import (
+    ConfigRepository, Database, RollHistoryRepository, RollStatsRepository
+)
+
+
+class RepositoryTestCase(unittest.TestCase):
+    """Base case giving each test its own throwaway database file."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, "test.db"))
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+
+class DatabaseCase(RepositoryTestCase):
+    def test_connection_is_shared_and_uses_wal(self):
+        connection = self.db.connect()
+        self.assertIs(self.db.connect(), connection)
+        mode = connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_schema_created_on_connect(self):
+        tables = {
+            row[0] for row in self.db.connect().execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )
+        }
+        self.assertIn("server_config", tables)
+        self.assertIn("history_dice", tables)
+
+    def test_configure_switches_file(self):
+        other = os.path.join(self.tmp.name, "other.db")
+        self.db.configure(other)
+        self.db.connect()
+        self.assertTrue(os.path.exists(other))
+
+    def test_failed_query_rolls_back_and_releases(self):
+        repo = ConfigRepository(self.db)
+        with self.assertRaises(Exception):
+            with repo as db:
+                db.cursor.execute("SELECT * FROM no_such_table")
+        # The lock was released, so the next query still works.
+        self.assertIsNone(repo.get_config(1))
+
+
+class ConfigRepositoryCase(RepositoryTestCase):
+    def test_set_then_get(self):
+        repo = ConfigRepository(self.db)
+        repo.set_config(
+            1, {"dump_channel_id": 42, "thread_dump_target": "parent_channel"}
+        )
+        repo.set_config(  # upsert
+            1, {"dump_channel_id": 43, "thread_dump_target": "dump_channel"}
+        )
+        self.assertEqual(
+            json.loads(repo.get_config(1)[0]),
+            {"dump_channel_id": 43, "thread_dump_target": "dump_channel"},
+        )
+        self.assertEqual(len(repo.get_all_configs()), 1)
+
+
+class RollHistoryRepositoryCase(RepositoryTestCase):
+    def test_add_and_get(self):
+        repo = RollHistoryRepository(self.db)
+        repo.add_history(
+            guild_id=1, character_name="Ayla", dice_roll="1d20",
+            result="1d20 (20) = `20`", expression="1d20", crit=1,
+            room_name="tavern",
+        )
+        self.assertEqual(
+            repo.get_history(1),
+            [("Ayla", "1d20", "1d20 (20) = `20`", "1d20", 1, "1", "tavern")],
+        )
+
+    def _add_rolls(self, repo, count):
+        repo.add_histories([
+            (1, "Ayla" if n % 2 else "Bram", "1d20", str(n), "1d20", 0,
+             "tavern", 10 + n % 3, n, 1000 + n)
+            for n in range(count)
+        ])
+
+    def test_pages_are_newest_first_and_contiguous(self):
+        repo = RollHistoryRepository(self.db)
+        self._add_rolls(repo, 25)
+        seen = []
+        before = None
+        while True:
+            page = repo.get_history_page(1, before=before, limit=10)
+            if not page:
+                break
+            seen.extend(row[1] for row in page)
+            before = (page[-1][1], page[-1][0])
+        self.assertEqual(seen, [1000 + n for n in reversed(range(25))])
+
+    def test_filters(self):
+        repo = RollHistoryRepository(self.db)
+        self._add_rolls(repo, 30)
+        rows = repo.get_history_page(
+            1, character_name="ayla", channel_id=11, since=1010, until=1020,
+            limit=100,
+        )
+        self.assertEqual([row[4] for row in rows], ["19", "13"])
+
+    def test_old_table_gains_new_columns(self):
+        # A database file written before the extra columns existed.
+        connection = sqlite3.connect(self.db.path)
+        connection.execute("""CREATE TABLE history_dice (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            character_name VARCHAR(255) NOT NULL,
+            dice_roll VARCHAR(255) NOT NULL,
+            result VARCHAR(255) NOT NULL,
+            expression TEXT NOT NULL,
+            crit INTEGER NOT NULL,
+            guild_id VARCHAR(255) NOT NULL,
+            room_name VARCHAR(255) NOT NULL
+        )""")
+        connection.execute(
+            "INSERT INTO history_dice VALUES "
+            "(1, 'Ayla', '1d20', '5', '1d20', 0, '1', 'tavern')"
+        )
+        connection.commit()
+        connection.close()
+        rows = RollHistoryRepository(self.db).get_history_page(1)
+        self.assertEqual(rows, [(1, 0, "Ayla", "1d20", "5", "tavern", None)])
+
+
+class RollStatsRepositoryCase(RepositoryTestCase):
+    ROWS = [
+        (1, "Ayla", "1d20", "20", "1d20", 1, "tavern", 10, 1, 1000),
+        (1, "ayla", "2d20t12", "2 Successes | 1 Complication", "[1, 20]", 0,
+         "tavern", 10, 2, 1001),
+        (1, "Bram", "3cd", "3 Result | 1 Effects", "[1, 2, 5]", 0,
+         "tavern", 10, 3, 1002),
+        (1, "Ayla", "2d6+3", "2d6 (4, 5) + 3 = `12`", "2d6+3", 0, "tavern",
+         10, 4, 1003),
+    ]
+
+    def test_history_writes_update_totals(self):
+        RollHistoryRepository(self.db).add_histories(self.ROWS)
+        repo = RollStatsRepository(self.db)
+        ayla = repo.get_stats(1, "AYLA")
+        self.assertEqual(
+            (ayla["rolls"], ayla["crits"], ayla["tests"], ayla["successes"]),
+            (3, 1, 1, 2),
+        )
+        # The damage roll is a d20-library roll that can't crit.
+        self.assertEqual((ayla["d20_rolls"], ayla["crit_rolls"]), (2, 1))
+        guild = repo.get_stats(1)
+        self.assertEqual((guild["rolls"], guild["challenges"]), (4, 1))
+        self.assertIsNone(repo.get_stats(1, "Nobody"))
+
+    def test_rebuild_matches_incremental(self):
+        RollHistoryRepository(self.db).add_histories(self.ROWS)
+        repo = RollStatsRepository(self.db)
+        incremental = repo.get_stats(1)
+        with repo as db:
+            db.cursor.execute("DELETE FROM roll_stats")
+            db.connection.commit()
+        self.assertEqual(repo.rebuild_stats(), 4)
+        self.assertEqual(repo.get_stats(1), incremental)
+
+    def test_totals_are_recounted_when_they_gain_a_column(self):
+        RollHistoryRepository(self.db).add_histories(self.ROWS)
+        self.db.close()
+        # Put the totals back as they were before crit_rolls existed.
+        connection = sqlite3.connect(self.db.path)
+        connection.execute("ALTER TABLE roll_stats DROP COLUMN crit_rolls")
+        connection.commit()
+        connection.close()
+        ayla = RollStatsRepository(self.db).get_stats(1, "Ayla")
+        self.assertEqual((ayla["rolls"], ayla["crit_rolls"]), (3, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+try:
+    import roller
+except ImportError:  # d20 is not installed
+    roller = None
+
+
+@unittest.skipIf(roller is None, "d20 is not installed")
+class ParseCacheCase(unittest.TestCase):
+    def setUp(self):
+        roller.parse_cache.clear()
+        roller.parse_cache.hits = roller.parse_cache.misses = 0
+
+    def test_classifies_expressions(self):
+        self.assertEqual(roller.parse("2d20t12").kind, "test")
+        self.assertEqual(roller.parse("3cd").kind, "challenge")
+        self.assertEqual(roller.parse("1d20+5 attack").kind, "d20")
+
+    def test_repeat_parses_hit_the_cache(self):
+        first = roller.parse("1d20+5")
+        self.assertIs(roller.parse(" 1d20+5 "), first)
+        self.assertEqual((roller.parse_cache.hits,
+                          roller.parse_cache.misses), (1, 1))
+
+    def test_syntax_errors_are_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(roller.d20.RollSyntaxError):
+                roller.parse("1d20+")
+        self.assertEqual(len(roller.parse_cache), 0)
+
+    def test_rolls_from_cached_parse(self):
+        parsed = roller.parse("2d6 damage")
+        result = roller.roll_d20(parsed)
+        self.assertTrue(2 <= result.total <= 12)
+        self.assertEqual(result.comment, "damage")
+        test = roller.roll_modiphius("2d20t12", roller.parse("2d20t12"))
+        self.assertIn("2d20t12", test["full_text"])
+
+    def test_cost_is_cached_with_the_parse(self):
+        self.assertEqual(roller.parse("40d6").cost.dice, 40)
+
+    def test_summary_roll_skips_the_breakdown(self):
+        result = roller.roll_d20(roller.parse("300d6"), summary=True)
+        self.assertEqual(result.result, "")
+        self.assertTrue(300 <= result.total <= 1800)
+
+
+if __name__ == "__main__":
+    unittest.main()
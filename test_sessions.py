@@ -0,0 +1,80 @@
+import asyncio
+import unittest
+
+from sessions import EditSessionManager
+
+
+class EditSessionManagerCase(unittest.IsolatedAsyncioTestCase):
+    async def test_reply_goes_to_the_session(self):
+        manager = EditSessionManager(timeout=5)
+        future = manager.open(1)
+        self.assertTrue(manager.route(1, "new text"))
+        self.assertEqual(await future, "new text")
+        self.assertEqual(len(manager), 0)
+
+    async def test_other_users_are_not_routed(self):
+        manager = EditSessionManager(timeout=5)
+        future = manager.open(1)
+        self.assertFalse(manager.route(2, "hello"))
+        self.assertFalse(future.done())
+        manager.cancel_all()
+
+    async def test_replies_fill_sessions_oldest_first(self):
+        manager = EditSessionManager(timeout=5)
+        first, second = manager.open(1), manager.open(1)
+        manager.route(1, "a")
+        manager.route(1, "b")
+        self.assertEqual((await first, await second), ("a", "b"))
+
+    async def test_per_user_cap(self):
+        manager = EditSessionManager(timeout=5, max_per_user=2)
+        self.assertIsNotNone(manager.open(1))
+        self.assertIsNotNone(manager.open(1))
+        self.assertIsNone(manager.open(1))
+        self.assertIsNotNone(manager.open(2))
+        self.assertEqual(manager.open_count(1), 2)
+        manager.cancel_all()
+
+    async def test_sessions_time_out_in_deadline_order(self):
+        manager = EditSessionManager(timeout=5)
+        slow = manager.open(1, timeout=0.05)
+        fast = manager.open(2, timeout=0.01)
+        self.assertIsNone(await fast)
+        self.assertFalse(slow.done())
+        self.assertIsNone(await slow)
+        self.assertEqual(len(manager), 0)
+        self.assertFalse(manager.route(1, "late"))
+
+    async def test_answered_session_does_not_time_out(self):
+        manager = EditSessionManager(timeout=0.01)
+        future = manager.open(1)
+        manager.route(1, "done")
+        later = manager.open(1)
+        self.assertIsNone(await later)
+        self.assertEqual(future.result(), "done")
+
+    async def test_cancelled_waiter_is_skipped(self):
+        manager = EditSessionManager(timeout=5)
+        abandoned = manager.open(1)
+        waiting = manager.open(1)
+        abandoned.cancel()
+        self.assertTrue(manager.route(1, "text"))
+        self.assertEqual(await waiting, "text")
+        self.assertEqual(manager.open_count(1), 0)
+
+    async def test_cancelled_session_frees_its_slot(self):
+        manager = EditSessionManager(timeout=5, max_per_user=1)
+        manager.open(1).cancel()
+        self.assertIsNotNone(manager.open(1))
+        manager.cancel_all()
+
+    async def test_cancel_all(self):
+        manager = EditSessionManager(timeout=5)
+        future = manager.open(1)
+        manager.cancel_all()
+        with self.assertRaises(asyncio.CancelledError):
+            await future
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import time
+import unittest
+
+import shards
+
+
+class ShardRangesCase(unittest.TestCase):
+    def test_even_split(self):
+        self.assertEqual(shards.shard_ranges(4, 2), [[0, 1], [2, 3]])
+
+    def test_remainder_goes_to_the_first_ranges(self):
+        self.assertEqual(shards.shard_ranges(5, 3), [[0, 1], [2, 3], [4]])
+
+    def test_more_workers_than_shards(self):
+        self.assertEqual(shards.shard_ranges(2, 4), [[0], [1]])
+
+    def test_rejects_zero(self):
+        with self.assertRaises(ValueError):
+            shards.shard_ranges(0, 1)
+
+    def test_ids_round_trip(self):
+        text = shards.format_shard_ids([4, 5, 6])
+        self.assertEqual(shards.parse_shard_ids(text), [4, 5, 6])
+        self.assertEqual(shards.parse_shard_ids("0-2, 7"), [0, 1, 2, 7])
+
+
+class HeartbeatCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "worker-0.json")
+
+    def test_write_and_read(self):
+        shards.write_heartbeat(
+            self.path, True, 12, [(0, 0.0415, True), (1, float("nan"), True)],
+            rss=50 << 20,
+        )
+        heartbeat = shards.read_heartbeat(self.path)
+        self.assertEqual(heartbeat["pid"], os.getpid())
+        self.assertEqual(heartbeat["guilds"], 12)
+        self.assertEqual(heartbeat["shards"][0]["latency"], 0.0415)
+        self.assertIsNone(heartbeat["shards"][1]["latency"])
+        self.assertTrue(shards.is_healthy(heartbeat, pid=os.getpid()))
+        self.assertEqual(shards.describe(heartbeat),
+                         "ready, 12 guilds, 50 MiB, 0: 42 ms, 1: ?")
+
+    def test_missing_file(self):
+        self.assertIsNone(shards.read_heartbeat(self.path))
+        self.assertFalse(shards.is_healthy(None))
+        self.assertEqual(shards.describe(None), "no heartbeat")
+
+    def test_unhealthy_heartbeats(self):
+        shards.write_heartbeat(self.path, True, 1, [(0, 0.05, True)])
+        heartbeat = shards.read_heartbeat(self.path)
+        self.assertFalse(shards.is_healthy(heartbeat, pid=os.getpid() + 1))
+        self.assertFalse(shards.is_healthy(
+            heartbeat, now=time.time() + shards.HEARTBEAT_TIMEOUT + 1
+        ))
+        shards.write_heartbeat(self.path, True, 1, [(0, 0.05, False)])
+        self.assertFalse(shards.is_healthy(shards.read_heartbeat(self.path)))
+        shards.write_heartbeat(self.path, False, 0, [(0, None, True)])
+        self.assertFalse(shards.is_healthy(shards.read_heartbeat(self.path)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import unittest
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import simulate
+except ImportError:  # d20 is not installed
+    simulate = None
+
+
+def main_script():
+    """What a pool worker ran as its ``__main__``."""
+    return os.path.basename(sys.modules["__main__"].__file__)
+
+
+@unittest.skipIf(simulate is None, "d20 is not installed")
+class SimulateCase(unittest.TestCase):
+    def test_split_sim_args(self):
+        self.assertEqual(simulate.split_sim_args("8d6e6 5000"),
+                         ("8d6e6", 5000))
+        self.assertEqual(simulate.split_sim_args("1d20 + 5"),
+                         ("1d20 + 5", simulate.DEFAULT_SAMPLES))
+        self.assertEqual(simulate.split_sim_args(" 2d20t12 "),
+                         ("2d20t12", simulate.DEFAULT_SAMPLES))
+
+    def test_shard_seeds_are_reproducible_and_distinct(self):
+        first = simulate.run_shard("2d20t12", "test", 2000, "7:0", 1e12)
+        again = simulate.run_shard("2d20t12", "test", 2000, "7:0", 1e12)
+        other = simulate.run_shard("2d20t12", "test", 2000, "7:1", 1e12)
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other)
+        self.assertEqual(first[1], 2000)
+
+    def test_deadline_stops_shard(self):
+        histogram, rolled = simulate.run_shard("1d20", "d20", 1000, "1", 0)
+        self.assertEqual((histogram, rolled), ({}, 0))
+
+    def test_merges_shard_histograms(self):
+        with ThreadPoolExecutor(2) as executor:
+            result = simulate.simulate(
+                "1d6", 120_000, seed=3, executor=executor
+            )
+        self.assertTrue(result.complete)
+        self.assertEqual(result.kind, "d20")
+        self.assertEqual(sum(result.histogram.values()), 120_000)
+        self.assertEqual(set(result.histogram), set(range(1, 7)))
+
+    def test_modiphius_kinds(self):
+        self.assertEqual(simulate.classify("2d20t12"), "test")
+        self.assertEqual(simulate.classify("4cd"), "challenge")
+        histogram, _ = simulate.run_shard("4cd", "challenge", 500, "1", 1e12)
+        self.assertTrue(all(0 <= r <= 8 and 0 <= e <= 4
+                            for r, e in histogram))
+
+    def test_rejects_huge_pools(self):
+        with self.assertRaises(ValueError):
+            simulate.classify("100000000d20t10")
+        with self.assertRaises(ValueError):
+            simulate.classify("2000d6")
+
+    def test_rejects_sample_counts(self):
+        with self.assertRaises(ValueError):
+            simulate.simulate("1d6", simulate.MAX_SAMPLES + 1)
+
+    def test_format_result(self):
+        result = simulate.SimResult(
+            "1d4", "d20", 4, Counter({1: 1, 2: 1, 3: 1, 4: 1}), 0.5, True
+        )
+        fields = dict(simulate.format_result(result))
+        self.assertEqual(fields["Average"], "2.50 ± 1.12")
+        self.assertEqual(fields["Range"], "1 – 4")
+
+    def test_workers_do_not_rerun_the_main_script(self):
+        executor = simulate.get_executor()
+        self.addCleanup(simulate.shutdown)
+        self.assertEqual(executor.submit(main_script).result(timeout=60),
+                         "simulate.py")
+        histogram, rolled = executor.submit(
+            simulate.run_shard, "2d6", "d20", 100, "1", 1e12
+        ).result(timeout=60)
+        self.assertEqual(rolled, 100)
+        self.assertTrue(set(histogram) <= set(range(2, 13)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+import stats
+
+
+class RowStatsCase(unittest.TestCase):
+    def test_d20_crit_and_fumble(self):
+        self.assertEqual(
+            stats.row_stats("1d20+5", "1d20 (20) + 5 = `25`", 1),
+            (1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0),
+        )
+        self.assertEqual(
+            stats.row_stats("1d20", "1d20 (1) = `1`", 2),
+            (1, 1, 1, 0, 1, 0, 0, 0, 0, 0, 0),
+        )
+
+    def test_only_rolls_that_can_crit_count_towards_rates(self):
+        self.assertEqual(
+            stats.row_stats("2d20kh1 + 3", "…", 0),
+            (1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0),
+        )
+        # Damage and plain d20 pools are rolls, but never crit.
+        for dice_roll in ("8d6 + 4", "2d20", "4 + 1d20", "not a roll"):
+            self.assertEqual(stats.row_stats(dice_roll, "…", 0)[:3],
+                             (1, 1, 0), dice_roll)
+
+    def test_modiphius_test_summary(self):
+        self.assertEqual(
+            stats.row_stats("2d20f3t12c1", "3 Successes | 1 Complication", 0),
+            (1, 0, 0, 0, 0, 1, 3, 1, 0, 0, 0),
+        )
+        self.assertEqual(
+            stats.row_stats("2d20t12", "Failure", 0),
+            (1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0),
+        )
+
+    def test_challenge_summary(self):
+        self.assertEqual(
+            stats.row_stats("6cd", "4 Result | 2 Effects", 0),
+            (1, 0, 0, 0, 0, 0, 0, 0, 1, 4, 2),
+        )
+
+    def test_accumulate_adds_to_character_and_guild(self):
+        totals = {}
+        stats.accumulate(totals, 1, "Ayla", (1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0))
+        stats.accumulate(totals, 1, "Bram", (1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0))
+        self.assertEqual(totals[("1", "Ayla")][:3], [1, 1, 1])
+        self.assertEqual(totals[("1", stats.GUILD_TOTAL)][:3], [2, 2, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()